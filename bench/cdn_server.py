@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""本地 CDN 替身：离线、可复现地测试下载 / seek / 缓冲路径
+
+提供的资源：
+    GET/HEAD /media/<文件名>   媒体目录中的文件（默认自动生成一段合成视频 synth.mp4）
+    GET/HEAD /blob/<字节数>    按偏移确定的伪随机字节，客户端可逐字节校验
+    GET      /stats            请求数、发送字节数、断开次数等统计
+模拟的 CDN 行为：
+    Range（单区间，206 / 416）、Referer / User-Agent 校验（403）、签名 URL 过期（403）、
+    限速、首字节延迟与抖动、传输中途断开
+
+用法：python bench/cdn_server.py [--port 8800] [--rate 2M] [--latency-ms 80] [--jitter-ms 40]
+                                 [--disconnect-prob 0.05] [--require-referer https://example.com/]
+                                 [--secret s3cret] [--media-dir DIR]
+在其他脚本中使用：server = CdnServer(CdnConfig(...)); server.start_background(); ... server.shutdown()
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================== 常量配置 ============================== #
+CDN_HOST = "127.0.0.1"
+CDN_PORT = 8800
+CHUNK_SIZE = 16 * 1024  # 每次写出的字节数，也是限速的粒度
+DEFAULT_MEDIA_DIR = os.path.join(tempfile.gettempdir(), "roi_cdn_media")
+BLOB_MAX_BYTES = 16 * 1024 ** 3
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+_MIME = {".mp4": "video/mp4", ".m4a": "audio/mp4", ".webm": "video/webm", ".avi": "video/x-msvideo"}
+
+
+def parse_rate(text: str) -> float:
+    """'512K' / '2M' / '1500000' → 字节/秒"""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def sign_path(path: str, secret: str, ttl: float = 3600, now: float | None = None) -> str:
+    """为路径生成带过期时间的签名查询串：path?expires=…&sig=…"""
+    expires = int((now or time.time()) + ttl)
+    sig = hmac.new(secret.encode(), f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{path}?expires={expires}&sig={sig}"
+
+
+def blob_bytes(offset: int, length: int) -> bytes:
+    """/blob 的内容：每 32 字节块为 sha256(块序号)，任意区间均可独立计算与校验"""
+    first, last = offset // 32, (offset + length - 1) // 32
+    data = b"".join(hashlib.sha256(i.to_bytes(8, "big")).digest() for i in range(first, last + 1))
+    start = offset - first * 32
+    return data[start:start + length]
+
+
+@dataclass
+class CdnConfig:
+    host: str = CDN_HOST
+    port: int = CDN_PORT
+    media_dir: str = DEFAULT_MEDIA_DIR
+    rate: float = 0.0  # 每连接限速（字节/秒），0 为不限
+    latency_ms: float = 0.0  # 首字节前的固定延迟
+    jitter_ms: float = 0.0  # 延迟与每块发送间隔的随机抖动上限
+    disconnect_prob: float = 0.0  # 每个响应在中途断开的概率
+    require_referer: str | None = None  # 请求的 Referer 须以此开头
+    require_user_agent: str | None = None  # 请求的 User-Agent 须包含此串
+    secret: str | None = None  # 设置后所有资源都需要有效签名
+    seed: int | None = None
+    quiet: bool = True
+
+
+@dataclass
+class CdnStats:
+    requests: int = 0
+    range_requests: int = 0
+    bytes_sent: int = 0
+    disconnects: int = 0
+    rejected: dict = field(default_factory=dict)  # 状态码 → 次数
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **deltas) -> None:
+        with self.lock:
+            for k, v in deltas.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def reject(self, status: int) -> None:
+        with self.lock:
+            self.rejected[status] = self.rejected.get(status, 0) + 1
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "range_requests": self.range_requests,
+                    "bytes_sent": self.bytes_sent, "disconnects": self.disconnects,
+                    "rejected": {str(k): v for k, v in self.rejected.items()}}
+
+
+# ============================== 服务端 ============================== #
+class _CdnHandler(BaseHTTPRequestHandler):
+    server: "CdnServer"
+    protocol_version = "HTTP/1.1"  # 支持长连接，贴近真实 CDN 与 requests 连接池的行为
+
+    def send_response(self, code: int, message: str | None = None) -> None:
+        super().send_response(code, message)
+        # 客户端要求关闭时须明确回应，否则 FFmpeg 会按 HTTP/1.1 尝试复用已关闭的连接
+        if (self.headers.get("Connection") or "").lower() == "close":
+            self.send_header("Connection", "close")
+
+    def do_HEAD(self) -> None:
+        self._serve(head=True)
+
+    def do_GET(self) -> None:
+        self._serve(head=False)
+
+    # ---------------- 请求处理 ---------------- #
+    def _serve(self, head: bool) -> None:
+        cfg, stats = self.server.config, self.server.stats
+        stats.add(requests=1)
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/stats":
+            self._send_simple(200, json.dumps(stats.to_dict()).encode(), "application/json")
+            return
+
+        problem = self._check_access(url)
+        if problem:
+            status, message = problem
+            stats.reject(status)
+            self._send_simple(status, message.encode())
+            return
+
+        resource = self._resolve(url.path)
+        if resource is None:
+            stats.reject(404)
+            self._send_simple(404, b"not found")
+            return
+        size, reader, mime = resource
+
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header:
+            parsed = self._parse_range(range_header, size)
+            if parsed is None:
+                stats.reject(416)
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = parsed
+            status = 206
+            stats.add(range_requests=1)
+
+        self._delay(cfg.latency_ms)
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if head:
+            return
+        self._send_body(reader, start, length)
+
+    def _check_access(self, url) -> tuple[int, str] | None:
+        cfg = self.server.config
+        if cfg.require_referer and not (self.headers.get("Referer") or "").startswith(cfg.require_referer):
+            return 403, "referer rejected"
+        if cfg.require_user_agent and cfg.require_user_agent not in (self.headers.get("User-Agent") or ""):
+            return 403, "user-agent rejected"
+        if cfg.secret:
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                expires = int(query["expires"][0])
+                sig = query["sig"][0]
+            except (KeyError, ValueError):
+                return 403, "missing signature"
+            expected = hmac.new(cfg.secret.encode(), f"{url.path}:{expires}".encode(),
+                                hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(sig, expected):
+                return 403, "bad signature"
+            if time.time() > expires:
+                return 403, "signature expired"
+        return None
+
+    def _resolve(self, path: str):
+        """→ (大小, reader(offset, length) → bytes, MIME)；不存在时返回 None"""
+        if path.startswith("/blob/"):
+            try:
+                size = int(path[len("/blob/"):])
+            except ValueError:
+                return None
+            if not 0 < size <= BLOB_MAX_BYTES:
+                return None
+            return size, blob_bytes, "application/octet-stream"
+        if path.startswith("/media/"):
+            name = os.path.basename(urllib.parse.unquote(path[len("/media/"):]))
+            full = os.path.join(self.server.config.media_dir, name)
+            if not name or not os.path.isfile(full):
+                return None
+
+            def read_file(offset: int, length: int, _path=full) -> bytes:
+                with open(_path, "rb") as f:
+                    f.seek(offset)
+                    return f.read(length)
+
+            mime = _MIME.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+            return os.path.getsize(full), read_file, mime
+        return None
+
+    @staticmethod
+    def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+        m = _RANGE_RE.match(header.strip())
+        if not m or (not m.group(1) and not m.group(2)):
+            return None
+        if not m.group(1):  # bytes=-N：最后 N 字节
+            n = int(m.group(2))
+            return (max(0, size - n), size - 1) if n > 0 else None
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+        if start >= size or end < start:
+            return None
+        return start, min(end, size - 1)
+
+    def _send_body(self, reader, start: int, length: int) -> None:
+        cfg, stats, rng = self.server.config, self.server.stats, self.server.rng
+        cut_at = None
+        if cfg.disconnect_prob and rng.random() < cfg.disconnect_prob:
+            cut_at = int(length * rng.random())
+        sent = 0
+        t0 = time.monotonic()
+        try:
+            while sent < length:
+                n = min(CHUNK_SIZE, length - sent)
+                if cut_at is not None and sent + n > cut_at:
+                    n = cut_at - sent
+                    if n > 0:
+                        self.wfile.write(reader(start + sent, n))
+                        sent += n
+                    stats.add(disconnects=1, bytes_sent=sent)
+                    self.close_connection = True
+                    self.connection.shutdown(2)  # 模拟中途断流
+                    return
+                self.wfile.write(reader(start + sent, n))
+                sent += n
+                if cfg.rate:
+                    # 按累计字节数与限速计算应到达的时刻，误差不会逐块累积
+                    ahead = sent / cfg.rate - (time.monotonic() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+                if cfg.jitter_ms:
+                    time.sleep(rng.random() * cfg.jitter_ms / 1000 / 10)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # 客户端主动断开（如 seek 时关闭旧连接）
+        stats.add(bytes_sent=sent)
+
+    def _delay(self, base_ms: float) -> None:
+        cfg, rng = self.server.config, self.server.rng
+        delay = base_ms + (rng.uniform(-cfg.jitter_ms, cfg.jitter_ms) if cfg.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _send_simple(self, status: int, body: bytes, mime: str = "text/plain; charset=utf-8") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args) -> None:
+        if not self.server.config.quiet:
+            print(f"[cdn] {fmt % args}", file=sys.stderr)
+
+
+class CdnServer(ThreadingHTTPServer):
+    """多线程服务；config 的限速、延迟、断开概率等可在运行中直接修改"""
+
+    daemon_threads = True
+
+    def __init__(self, config: CdnConfig | None = None) -> None:
+        self.config = config or CdnConfig()
+        self.stats = CdnStats()
+        self.rng = random.Random(self.config.seed)
+        super().__init__((self.config.host, self.config.port), _CdnHandler)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, path: str, ttl: float = 3600) -> str:
+        """完整 URL；启用签名时自动附加签名"""
+        if self.config.secret:
+            path = sign_path(path, self.config.secret, ttl)
+        return self.base_url + path
+
+    def start_background(self) -> "CdnServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="cdn-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self.server_close()
+
+
+def ensure_media(media_dir: str) -> list[str]:
+    """媒体目录为空时生成一段合成视频（需要 OpenCV）"""
+    os.makedirs(media_dir, exist_ok=True)
+    names = sorted(n for n in os.listdir(media_dir) if not n.startswith("."))
+    if names:
+        return names
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from frame_pipeline import generate_video
+
+    video = generate_video(media_dir, "1280x720", "mp4v", 12)
+    if video is None:
+        return []
+    os.replace(video["path"], os.path.join(media_dir, "synth.mp4"))
+    return ["synth.mp4"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 CDN 替身（Range / 校验 / 签名 / 限速 / 抖动 / 断流）")
+    parser.add_argument("--host", default=CDN_HOST)
+    parser.add_argument("--port", type=int, default=CDN_PORT)
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR)
+    parser.add_argument("--rate", type=parse_rate, default=0.0, help="每连接限速，如 512K、2M")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--disconnect-prob", type=float, default=0.0)
+    parser.add_argument("--require-referer", default=None)
+    parser.add_argument("--require-user-agent", default=None)
+    parser.add_argument("--secret", default=None, help="启用签名 URL")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = CdnConfig(
+        host=args.host, port=args.port, media_dir=args.media_dir, rate=args.rate,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, disconnect_prob=args.disconnect_prob,
+        require_referer=args.require_referer, require_user_agent=args.require_user_agent,
+        secret=args.secret, seed=args.seed, quiet=not args.verbose,
+    )
+    names = ensure_media(config.media_dir)
+    server = CdnServer(config)
+    print(f"CDN 替身已启动：{server.base_url}", file=sys.stderr)
+    for name in names:
+        print(f"  {server.url_for('/media/' + name)}", file=sys.stderr)
+    print(f"  {server.url_for('/blob/104857600')}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""帧管线基准：用 cv2.VideoWriter 生成合成测试视频，在 QT_QPA_PLATFORM=offscreen 下驱动两个 VideoPlayer
+
+覆盖 分辨率 × 编码 × GOP × 播放器（local/yaj.py、stream/player.py）× 变换（无 / ROI+旋转），
+报告持续帧率、单帧耗时分位数、seek 耗时、峰值 RSS 与每帧分配字节数。
+
+用法：python bench/frame_pipeline.py [--players local,stream] [--resolutions 640x360,1920x1080]
+                                      [--frames 240] [--json out.json] [--baseline base.json] [--tolerance 0.1]
+每个用例在独立子进程中运行，峰值 RSS 互不影响；指定 --baseline 时出现回归以非零状态退出。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+# ============================== 常量配置 ============================== #
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYER_DIRS = {"local": os.path.join(REPO_ROOT, "local"), "stream": os.path.join(REPO_ROOT, "stream")}
+DEFAULT_MEDIA_DIR = os.path.join(tempfile.gettempdir(), "roi_bench_media")
+RESOLUTIONS = ("640x360", "1280x720", "1920x1080")
+# 编码 → (fourcc, 扩展名, GOP 列表)；MJPG 为纯帧内编码，GOP 恒为 1
+CODECS = {
+    "mp4v": ("mp4v", ".mp4", (12, 250)),
+    "mjpg": ("MJPG", ".avi", (1,)),
+}
+VIDEO_FPS = 30
+VIDEO_FRAMES = 300
+WINDOW_SIZE = (1280, 720)
+WARMUP_FRAMES = 10
+SEEK_COUNT = 10
+ALLOC_FRAMES = 30
+CASE_TIMEOUT = 300
+# 对比基线的指标：名称 → 越大越好为 True
+COMPARED_METRICS = {
+    "fps": True,
+    "frame_p99_ms": False,
+    "seek_p50_ms": False,
+    "peak_rss_mb": False,
+    "alloc_bytes_per_frame": False,
+}
+
+
+# ============================== 测试视频 ============================== #
+def _mp4_keyframes(path: str) -> int | None:
+    """读取 mp4 的 stss（同步样本表）条目数；无该表时所有帧都是关键帧"""
+    with open(path, "rb") as f:
+        data = f.read()
+    i = data.find(b"stss")
+    if i < 0:
+        return None
+    return struct.unpack(">I", data[i + 8:i + 12])[0]
+
+
+def generate_video(media_dir: str, resolution: str, codec: str, gop: int) -> dict | None:
+    """生成（或复用已生成的）合成视频：平移渐变背景 + 运动圆形 + 少量噪声，返回视频描述"""
+    import cv2
+    import numpy as np
+
+    fourcc, ext, _ = CODECS[codec]
+    w, h = (int(v) for v in resolution.split("x"))
+    path = os.path.join(media_dir, f"synth_{resolution}_{codec}_g{gop}{ext}")
+    if not os.path.exists(path):
+        os.makedirs(media_dir, exist_ok=True)
+        writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), VIDEO_FPS, (w, h),
+                                 [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+        if not writer.isOpened():
+            return None
+        rng = np.random.default_rng(0)
+        xs = np.linspace(0, 255, w, dtype=np.float32)[None, :]
+        ys = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+        for i in range(VIDEO_FRAMES):
+            base = np.stack([(xs + i * 4) % 256 + ys * 0, (ys + i * 2) % 256 + xs * 0,
+                             np.full((h, w), (i * 3) % 256, np.float32)], axis=2).astype(np.uint8)
+            noise = rng.integers(0, 16, (h // 8, w // 8, 1), dtype=np.uint8)
+            base += cv2.resize(noise, (w, h), interpolation=cv2.INTER_NEAREST)[..., None]
+            cx = int((i / VIDEO_FRAMES) * w)
+            cv2.circle(base, (cx, h // 2), h // 6, (255, 255, 255), -1)
+            writer.write(base)
+        writer.release()
+
+    # 本构建的 FFmpeg 写入端未必支持设置关键帧间隔，以实际文件为准
+    keyframes = _mp4_keyframes(path) if ext == ".mp4" else None
+    measured = round(VIDEO_FRAMES / keyframes) if keyframes else 1
+    return {"path": path, "resolution": resolution, "codec": codec, "gop": gop, "gop_measured": measured}
+
+
+def build_videos(media_dir: str, resolutions, codecs) -> list[dict]:
+    videos, seen = [], set()
+    for res in resolutions:
+        for codec in codecs:
+            for gop in CODECS[codec][2]:
+                video = generate_video(media_dir, res, codec, gop)
+                if video is None:
+                    print(f"跳过：当前 OpenCV 无法写入 {codec}", file=sys.stderr)
+                    continue
+                key = (res, codec, video["gop_measured"])
+                if key in seen:
+                    print(f"跳过：{res} {codec} 请求 GOP {gop}，实际 GOP {video['gop_measured']} 与已有用例重复",
+                          file=sys.stderr)
+                    continue
+                seen.add(key)
+                videos.append(video)
+    return videos
+
+
+# ============================== 子进程：单个用例 ============================== #
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _quiesce(player) -> None:
+    """停止播放器自带的驱动源（帧定时器、音频时钟、后台索引），改由基准循环逐帧驱动"""
+    from PyQt5 import QtMultimedia
+
+    player._paused = True  # 阻止显示事件重新启动帧定时器，seek 时也不触碰音频
+    for name in ("_timer", "_release_timer", "_clock_timer"):
+        timer = getattr(player, name, None)
+        if timer is not None:
+            timer.stop()
+    media_player = getattr(player, "_media_player", None)  # local：QMediaPlayer 时钟
+    if media_player is not None:
+        try:
+            media_player.positionChanged.disconnect()
+        except TypeError:
+            pass
+        media_player.stop()
+        media_player.setMedia(QtMultimedia.QMediaContent())
+    audio = getattr(player, "_audio", None)  # stream：按样本计时的音频引擎
+    if audio is not None:
+        audio.close()
+    indexer = getattr(player, "_scene_indexer", None)
+    if indexer is not None:
+        indexer.stop()
+    # offscreen 平台未必报告窗口已暴露，基准中视为始终可见
+    player._video_visible = lambda: True
+
+
+def run_case(case: dict, frames: int) -> dict:
+    import tracemalloc
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, PLAYER_DIRS[case["player"]])
+    os.chdir(PLAYER_DIRS[case["player"]])
+    from PyQt5 import QtCore, QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    module = __import__("yaj" if case["player"] == "local" else "player")
+    player = module.VideoPlayer(case["video"]["path"])
+    player.resize(*WINDOW_SIZE)
+    player.show()
+    app.processEvents()
+    _quiesce(player)
+
+    if case["transform"] == "roi_rot":
+        player._rotation = 90
+        w, h = player._label.width(), player._label.height()
+        player._roi = QtCore.QRect(w // 4, h // 4, w // 2, h // 2)
+
+    if case["player"] == "local":
+        step, seek_unit = player._next_frame, VIDEO_FRAMES - 1
+    else:
+        step, seek_unit = player._render_frame, int((VIDEO_FRAMES - 1) * 1000 / VIDEO_FPS)
+    frames = min(frames, VIDEO_FRAMES - WARMUP_FRAMES - 1)
+
+    for _ in range(WARMUP_FRAMES):
+        step()
+        app.processEvents()
+
+    # ---- 持续帧率与单帧耗时（含事件处理即绘制在内的总吞吐） ---- #
+    latencies = []
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        t = time.perf_counter()
+        step()
+        latencies.append((time.perf_counter() - t) * 1000)
+        app.processEvents()
+    elapsed = time.perf_counter() - t0
+
+    # ---- seek 耗时（跳转 + 解码显示目标帧） ---- #
+    rng = random.Random(0)
+    seeks = []
+    for _ in range(SEEK_COUNT):
+        target = int(rng.random() * seek_unit * 0.9)
+        t = time.perf_counter()
+        player._on_slider_moved(target)
+        seeks.append((time.perf_counter() - t) * 1000)
+        app.processEvents()
+
+    # ---- 每帧分配：tracemalloc 单独一轮，不影响上面的计时 ---- #
+    player._on_slider_moved(0)
+    tracemalloc.start()
+    allocs = []
+    for _ in range(ALLOC_FRAMES):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        step()
+        allocs.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    player.close()
+    return {
+        "fps": round(frames / elapsed, 2),
+        "frame_p50_ms": round(_percentile(latencies, 0.50), 3),
+        "frame_p95_ms": round(_percentile(latencies, 0.95), 3),
+        "frame_p99_ms": round(_percentile(latencies, 0.99), 3),
+        "seek_p50_ms": round(_percentile(seeks, 0.50), 3),
+        "seek_max_ms": round(max(seeks), 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "alloc_bytes_per_frame": int(statistics.median(allocs)),
+    }
+
+
+# ============================== 父进程：调度与对比 ============================== #
+def case_id(case: dict) -> str:
+    v = case["video"]
+    return f"{case['player']}/{v['resolution']}/{v['codec']}/gop{v['gop_measured']}/{case['transform']}"
+
+
+def run_all(cases: list[dict], frames: int) -> list[dict]:
+    results = []
+    for case in cases:
+        cid = case_id(case)
+        print(f"运行 {cid} ...", file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case), "--frames", str(frames)],
+            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"),
+            capture_output=True, text=True, timeout=CASE_TIMEOUT,
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"  失败：\n{proc.stderr[-2000:]}", file=sys.stderr)
+            results.append({"id": cid, "error": proc.stderr[-500:]})
+            continue
+        metrics = json.loads(lines[-1])
+        print(f"  {metrics['fps']} fps，p99 {metrics['frame_p99_ms']} ms", file=sys.stderr)
+        results.append({"id": cid, **metrics})
+    return results
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """与基线逐项比较，返回回归描述"""
+    base = {r["id"]: r for r in baseline.get("results", []) if "error" not in r}
+    regressions = []
+    for r in results:
+        old = base.get(r["id"])
+        if old is None or "error" in r:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            new_v, old_v = r.get(metric), old.get(metric)
+            if new_v is None or not old_v:
+                continue
+            change = (new_v - old_v) / old_v
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append(f"{r['id']} {metric}: {old_v} → {new_v}（{change:+.1%}）")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="播放器帧管线基准")
+    parser.add_argument("--players", default="local,stream")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument("--codecs", default=",".join(CODECS))
+    parser.add_argument("--frames", type=int, default=240, help="每个用例计时的帧数")
+    parser.add_argument("--media-dir", default=DEFAULT_MEDIA_DIR, help="合成视频缓存目录")
+    parser.add_argument("--json", default=None, help="结果写入该文件（默认输出到标准输出）")
+    parser.add_argument("--baseline", default=None, help="与该基线 JSON 对比")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许的相对退化比例")
+    parser.add_argument("--case", default=None, help=argparse.SUPPRESS)  # 子进程内部使用
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case), args.frames)))
+        return
+
+    videos = build_videos(args.media_dir, args.resolutions.split(","), args.codecs.split(","))
+    cases = [
+        {"player": p, "video": v, "transform": t}
+        for p in args.players.split(",") for v in videos for t in ("plain", "roi_rot")
+    ]
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "frames": args.frames,
+        "results": run_all(cases, args.frames),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = [r["id"] for r in report["results"] if "error" in r]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"回归：{line}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
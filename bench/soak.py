@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""长时间稳定性测试：对本地 CDN 替身反复播放 / seek / 暂停 / 重新打开网络流，监测资源增长
+
+每隔 --sample-s 秒采样 RSS、打开的文件描述符、线程数与 Qt 对象数；预热期结束时记下基线，
+之后任何一项增长超过预算即判定泄漏并以非零状态退出。采样写入 JSON Lines 供离线分析。
+
+用法：QT_QPA_PLATFORM=offscreen python bench/soak.py [--duration 2h] [--action-s 3]
+                                                     [--rss-mb 64] [--fds 16] [--threads 8] [--qobjects 200]
+CDN 替身在子进程中运行，其连接线程不计入被测进程。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+# ============================== 常量配置 ============================== #
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, "bench")
+STREAM_DIR = os.path.join(REPO_ROOT, "stream")
+SOAK_PORT = 8811
+WARMUP_S = 120  # 预热时长：缓存、连接池、线程池在此期间长到稳态
+SERVER_START_TIMEOUT = 60
+# 默认增长预算（相对预热结束时）
+BUDGETS = {"rss_mb": 64, "fds": 16, "threads": 8, "qobjects": 200}
+# 操作及其权重
+ACTIONS = {"seek": 5, "pause": 2, "reopen": 1, "scheduler": 1, "audio_only": 1}
+SCHEDULER_SEEKS = 4  # 每次下载器操作中随机 seek 读取的次数
+SCHEDULER_CLOSE_BUDGET_S = 3.0  # DownloadScheduler.close() 的返回时限（读取中的连接须被及时打断）
+STREAM_HEADERS = {"Referer": "https://soak.local/", "User-Agent": "roi-soak"}
+
+
+def parse_duration(text: str) -> float:
+    """'90s' / '30m' / '2h' / '600' → 秒"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+# ============================== 资源采样 ============================== #
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _fd_count() -> int | None:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+
+def _os_threads() -> int:
+    """操作系统线程数（含 Qt / FFmpeg 的原生线程）；不可用时退回 Python 线程数"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+def sample(app, player) -> dict:
+    from PyQt5 import QtCore
+
+    return {
+        "t": round(time.monotonic(), 1),
+        "rss_mb": _rss_mb(),
+        "fds": _fd_count(),
+        "threads": _os_threads(),
+        "py_threads": threading.active_count(),
+        "qobjects": len(player.findChildren(QtCore.QObject)) + len(app.topLevelWidgets()),
+    }
+
+
+def over_budget(base: dict, now: dict, budgets: dict) -> list[str]:
+    return [
+        f"{key} 增长 {now[key] - base[key]:.1f}（预算 {limit}）"
+        for key, limit in budgets.items()
+        if base.get(key) is not None and now.get(key) is not None and now[key] - base[key] > limit
+    ]
+
+
+# ============================== CDN 替身子进程 ============================== #
+def start_server(port: int, media_dir: str | None) -> subprocess.Popen:
+    # 不开启 Referer 校验：cv2.VideoCapture 无法附带请求头
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "cdn_server.py"), "--port", str(port),
+           "--latency-ms", "30", "--jitter-ms", "20"]
+    if media_dir:
+        cmd += ["--media-dir", media_dir]
+    proc = subprocess.Popen(cmd)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT  # 首次运行需要生成测试视频
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("CDN 替身启动失败")
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError("CDN 替身启动超时")
+
+
+# ============================== 主循环 ============================== #
+class SoakRunner:
+    """在 Qt 事件循环中按随机计划驱动播放器；所有操作都经由播放器自身的方法"""
+
+    def __init__(self, app, player, base_url: str, args):
+        from PyQt5 import QtCore
+
+        self.app, self.player, self.args = app, player, args
+        self.video_url = f"{base_url}/media/synth.mp4"
+        self.blob_url = f"{base_url}/blob/67108864"
+        self.rng = random.Random(args.seed)
+        self.t0 = time.monotonic()
+        self.baseline = None
+        self.failures: list[str] = []
+        self.counts = {name: 0 for name in ACTIONS}
+        self.scheduler_close_slow = 0
+        self._scheduler_busy = threading.Event()  # 上一次下载器操作尚未结束时跳过
+        self._log = open(args.log, "w", encoding="utf-8") if args.log else None
+
+        self._action_timer = QtCore.QTimer()
+        self._action_timer.timeout.connect(self._act)
+        self._action_timer.start(int(args.action_s * 1000))
+        self._sample_timer = QtCore.QTimer()
+        self._sample_timer.timeout.connect(self._sample)
+        self._sample_timer.start(int(args.sample_s * 1000))
+
+    def _act(self):
+        if self.failures:  # 后台下载器操作记录的失败
+            self.app.quit()
+            return
+        action = self.rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        self.counts[action] += 1
+        p = self.player
+        try:
+            if action == "seek":
+                p._on_slider_moved(int(self.rng.random() * p._duration_ms * 0.9))
+            elif action == "pause":
+                p._toggle_pause()
+            elif action == "reopen":
+                p.load_stream(self.video_url, {"video": STREAM_HEADERS}, self.video_url)
+            elif action == "audio_only":
+                p._toggle_audio_only()
+            elif action == "scheduler":
+                self._exercise_scheduler()
+        except Exception as exc:
+            self.failures.append(f"操作 {action} 异常：{exc}")
+            self.app.quit()
+
+    def _exercise_scheduler(self):
+        """在后台线程中让独立的 DownloadScheduler 随机 seek 读取后关闭，不占用 GUI 线程"""
+        if self._scheduler_busy.is_set():
+            return
+        self._scheduler_busy.set()
+        offsets = [int(self.rng.random() * 60 * 1024 * 1024) for _ in range(SCHEDULER_SEEKS)]
+        threading.Thread(target=self._scheduler_job, args=(offsets,), name="soak-scheduler", daemon=True).start()
+
+    def _scheduler_job(self, offsets):
+        from download_scheduler import DownloadScheduler
+
+        scheduler = DownloadScheduler({"video": (self.blob_url, STREAM_HEADERS)})
+        reader = object()  # 一个读取方，依次 seek
+        try:
+            if not scheduler.wait_ready():
+                self.failures.append(f"下载器未就绪：{scheduler.errors() or '超时'}")
+                return
+            for offset in offsets:
+                scheduler.read("video", offset, 64 * 1024, reader=reader)
+        except IOError as exc:
+            self.failures.append(f"下载器读取失败：{exc}")
+        finally:
+            scheduler.release_reader(reader)
+            t = time.monotonic()
+            scheduler.close()  # 关闭时仍有预读分块在下载
+            if time.monotonic() - t > SCHEDULER_CLOSE_BUDGET_S:
+                self.scheduler_close_slow += 1
+            self._scheduler_busy.clear()
+
+    def _sample(self):
+        now = sample(self.app, self.player)
+        elapsed = now["t"] - self.t0
+        now["elapsed_s"] = round(elapsed, 1)
+        if self._log:
+            self._log.write(json.dumps(now) + "\n")
+            self._log.flush()
+        if self.baseline is None:
+            if elapsed >= self.args.warmup_s:
+                self.baseline = now
+                print(f"预热结束，基线：{json.dumps(now)}", file=sys.stderr)
+            elif elapsed >= self.args.duration:
+                self.app.quit()  # 总时长短于预热期：只记录采样，不做判定
+            return
+        problems = over_budget(self.baseline, now, self.args.budgets)
+        print(f"[{elapsed / 60:6.1f} min] rss {now['rss_mb']} MB  fds {now['fds']}  "
+              f"threads {now['threads']}  qobjects {now['qobjects']}", file=sys.stderr)
+        if problems:
+            self.failures.extend(problems)
+            self.app.quit()
+        elif elapsed >= self.args.duration:
+            self.app.quit()
+
+    def report(self) -> dict:
+        if self._log:
+            self._log.close()
+        return {
+            "duration_s": round(time.monotonic() - self.t0, 1),
+            "baseline": self.baseline,
+            "final": sample(self.app, self.player),
+            "actions": self.counts,
+            "scheduler_close_slow": self.scheduler_close_slow,
+            "failures": self.failures,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="网络流播放长时间稳定性测试")
+    parser.add_argument("--duration", type=parse_duration, default=3600.0, help="如 90m、2h")
+    parser.add_argument("--warmup-s", type=float, default=WARMUP_S)
+    parser.add_argument("--action-s", type=float, default=3.0, help="两次操作的间隔")
+    parser.add_argument("--sample-s", type=float, default=30.0, help="采样间隔")
+    parser.add_argument("--port", type=int, default=SOAK_PORT)
+    parser.add_argument("--media-dir", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default="soak_samples.jsonl", help="采样记录（JSON Lines）")
+    for key, limit in BUDGETS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=limit, help=f"{key} 增长预算")
+    args = parser.parse_args()
+    args.budgets = {key: getattr(args, key) for key in BUDGETS}
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, STREAM_DIR)
+    server = start_server(args.port, args.media_dir)
+    try:
+        from PyQt5 import QtWidgets
+        from player import VideoPlayer
+
+        app = QtWidgets.QApplication(sys.argv)
+        base_url = f"http://127.0.0.1:{args.port}"
+        url = f"{base_url}/media/synth.mp4"
+        player = VideoPlayer(url, {"video": STREAM_HEADERS}, url)
+        player._audio.set_volume(0.0)
+        # 渲染由播放器自身的音频样本时钟驱动（无音频设备时为墙钟）；offscreen 平台未必报告窗口已暴露
+        player._video_visible = lambda: True
+        player.resize(960, 540)
+        player.show()
+        runner = SoakRunner(app, player, base_url, args)
+        app.exec()
+        result = runner.report()
+        player.close()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if result["failures"] or result["scheduler_close_slow"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
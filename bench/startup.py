@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""启动耗时基准：用 `python -X importtime` 测量入口模块的导入开销，并检查预算
+
+用法：python bench/startup.py [--module stream_player] [--budget-ms 600] [--runs 5] [--json]
+超出预算或启动阶段加载了禁止的重模块时以非零状态退出。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# ============================== 常量配置 ============================== #
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STREAM_DIR = os.path.join(REPO_ROOT, "stream")
+DEFAULT_MODULE = "stream_player"
+DEFAULT_BUDGET_MS = 600.0  # 入口模块导入总耗时预算（毫秒）
+# 这些模块只应在真正需要时才加载，出现在启动导入链中即视为回归
+FORBIDDEN_AT_STARTUP = ("yt_dlp", "vlc", "cv2", "tkinter", "requests")
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def measure_once(module: str) -> tuple[float, dict[str, float]]:
+    """运行一次 -X importtime，返回 (入口模块累计毫秒, {模块: 累计毫秒})"""
+    env = dict(os.environ, PYTHONPATH=STREAM_DIR)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=STREAM_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{proc.stderr[-2000:]}")
+
+    cumulative: dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        cumulative.setdefault(m.group(3), int(m.group(2)) / 1000)
+    return cumulative.get(module, 0.0), cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="入口模块启动耗时基准")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="输出机器可读结果")
+    args = parser.parse_args()
+
+    # 第一次运行用于预热字节码缓存，不计入结果
+    measure_once(args.module)
+    totals, last = [], {}
+    for _ in range(args.runs):
+        total, last = measure_once(args.module)
+        totals.append(total)
+
+    median = statistics.median(totals)
+    loaded_forbidden = sorted(
+        name for name in last if name.split(".")[0] in FORBIDDEN_AT_STARTUP
+    )
+    top = sorted(last.items(), key=lambda kv: kv[1], reverse=True)[:10]
+    result = {
+        "module": args.module,
+        "median_ms": round(median, 2),
+        "runs_ms": [round(t, 2) for t in totals],
+        "budget_ms": args.budget_ms,
+        "forbidden_loaded": loaded_forbidden,
+        "top_modules_ms": {k: round(v, 2) for k, v in top},
+    }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"{args.module}: 中位数 {median:.1f} ms（预算 {args.budget_ms:.0f} ms）")
+        for name, ms in top:
+            print(f"  {ms:8.1f} ms  {name}")
+        if loaded_forbidden:
+            print(f"启动阶段加载了重模块：{', '.join(loaded_forbidden)}")
+
+    if median > args.budget_ms or loaded_forbidden:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
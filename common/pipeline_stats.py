@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""帧管线分阶段计时：单调时钟打点，最近若干帧保存在定长环形缓冲区中
+
+每帧开销只有几次 perf_counter_ns() 与一个小字典，可常驻开启；
+汇总（fps、丢帧、各阶段 p50/p99）只在显示叠加层或导出时计算。
+"""
+
+import json
+import sys
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from PyQt5 import QtCore, QtWidgets
+
+# ============================== 常量配置 ============================== #
+STATS_CAPACITY = 600  # 保留最近的帧数
+OVERLAY_REFRESH_MS = 500  # 叠加层刷新间隔（仅显示时运行）
+LATE_FACTOR = 1.5  # 帧间隔超过期望间隔的倍数即视为丢帧
+
+
+def _percentile(ordered, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _read_bytes() -> Optional[int]:
+    """进程累计读取字节数（Linux /proc/self/io，含本地文件读取）；其他平台返回 None"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class PipelineStats:
+    """begin() → mark(阶段)… → end()；未渲染的帧调用 cancel()"""
+
+    def __init__(self, expected_interval_ms: Optional[float] = None, capacity: int = STATS_CAPACITY):
+        self._frames = deque(maxlen=capacity)  # (结束时刻 ns, {阶段: ns})
+        self._expected_ns = expected_interval_ms * 1e6 if expected_interval_ms else None
+        self._current = None
+        self._t0 = self._last = 0
+        self._prev_end = None
+        self.dropped = 0
+        # 播放器可提供附加指标（缓冲秒数、下载速率等），返回 {名称: 文本}
+        self.extra_provider: Optional[Callable[[], Dict[str, str]]] = None
+        self._io_sample = None  # (时刻, 累计读取字节)
+
+    # ---------------- 打点 ---------------- #
+    def begin(self) -> None:
+        self._t0 = self._last = time.perf_counter_ns()
+        self._current = {}
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter_ns()
+        if self._current is not None:
+            self._current[stage] = now - self._last
+        self._last = now
+
+    def end(self) -> None:
+        if self._current is None:
+            return
+        now = time.perf_counter_ns()
+        self._current["total"] = now - self._t0
+        self._frames.append((now, self._current))
+        self._current = None
+        if self._expected_ns and self._prev_end is not None:
+            gap = now - self._prev_end
+            if gap > self._expected_ns * LATE_FACTOR:
+                self.dropped += int(gap / self._expected_ns) - 1
+        self._prev_end = now
+
+    def cancel(self) -> None:
+        self._current = None
+        self._prev_end = None  # seek / 暂停后的间隔不计入丢帧
+
+    def drop(self, n: int = 1) -> None:
+        self.dropped += n
+
+    # ---------------- 汇总 ---------------- #
+    def fps(self) -> float:
+        if len(self._frames) < 2:
+            return 0.0
+        horizon = self._frames[-1][0] - 1_000_000_000
+        recent = [t for t, _ in self._frames if t >= horizon]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) * 1e9 / (recent[-1] - recent[0])
+
+    def summary(self) -> dict:
+        per_stage: Dict[str, list] = {}
+        for _, stages in self._frames:
+            for name, ns in stages.items():
+                per_stage.setdefault(name, []).append(ns / 1e6)
+        result = {"fps": round(self.fps(), 1), "dropped": self.dropped, "stages": {}}
+        for name, values in per_stage.items():
+            values.sort()
+            result["stages"][name] = {"p50_ms": round(_percentile(values, 0.5), 3),
+                                      "p99_ms": round(_percentile(values, 0.99), 3)}
+        return result
+
+    def io_rate(self) -> Optional[float]:
+        """两次调用之间的进程读取速率（字节/秒）"""
+        total = _read_bytes()
+        if total is None:
+            return None
+        now = time.monotonic()
+        prev, self._io_sample = self._io_sample, (now, total)
+        if prev is None or now <= prev[0]:
+            return None
+        return (total - prev[1]) / (now - prev[0])
+
+    def overlay_text(self) -> str:
+        s = self.summary()
+        lines = [f"{s['fps']:.1f} fps   丢帧 {s['dropped']}"]
+        for name, v in s["stages"].items():
+            lines.append(f"{name:<10}{v['p50_ms']:7.2f} /{v['p99_ms']:7.2f} ms")
+        rate = self.io_rate()
+        if rate is not None:
+            lines.append(f"读取速率  {rate / 1024 / 1024:6.2f} MB/s")
+        if self.extra_provider is not None:
+            lines.extend(f"{k}  {v}" for k, v in self.extra_provider().items())
+        return "\n".join(lines)
+
+    def export_jsonl(self, path: str) -> int:
+        """每帧一行：结束时刻（ns，单调时钟）与各阶段毫秒数；返回写入行数"""
+        frames = list(self._frames)
+        with open(path, "a", encoding="utf-8") as f:
+            for end_ns, stages in frames:
+                f.write(json.dumps({"t_ns": end_ns,
+                                    "stages_ms": {k: round(v / 1e6, 4) for k, v in stages.items()}}) + "\n")
+        print(f"已导出 {len(frames)} 帧计时到 {path}", file=sys.stderr)
+        return len(frames)
+
+
+class StatsOverlay(QtWidgets.QLabel):
+    """叠加在视频区域左上角的半透明统计面板；隐藏时不刷新"""
+
+    def __init__(self, stats: PipelineStats, parent=None):
+        super().__init__(parent)
+        self._stats = stats
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: #7CFC00;"
+            "font-family: monospace; font-size: 11px; padding: 6px;"
+        )
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(OVERLAY_REFRESH_MS)
+        self._timer.timeout.connect(self._refresh)
+        self.hide()
+
+    def toggle(self) -> None:
+        if self.isVisible():
+            self._timer.stop()
+            self.hide()
+        else:
+            self._refresh()
+            self.show()
+            self.raise_()
+            self._timer.start()
+
+    def _refresh(self) -> None:
+        self.setText(self._stats.overlay_text())
+        self.adjustSize()
+        self.move(8, 8)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""运行中按需诊断：热键或 SIGUSR1 开始 / 结束一次采集，结果写入带时间戳的目录
+
+一次采集包含：
+    profile.pstats / profile.txt   GUI 线程的 cProfile（解码与渲染都在 GUI 线程）
+    tracemalloc_diff.txt           与上一次快照的内存分配差异（首次为本次窗口开始时）
+    tracemalloc_top.txt            当前存活分配的前若干位置
+    stacks.folded                  所有线程的采样栈（flamegraph 折叠格式，首段为线程名）
+    threads.txt                    结束时刻各线程完整调用栈
+    summary.json                   时长、采样数、峰值 RSS
+
+tracemalloc 在首次采集时开启并保持，之后每次采集都能看到两次之间的增长；
+需要从启动就开始跟踪时设置环境变量 PYTHONTRACEMALLOC=10。
+"""
+
+import collections
+import cProfile
+import io
+import json
+import os
+import pstats
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from typing import Callable, Optional
+
+from PyQt5 import QtCore
+
+# ============================== 常量配置 ============================== #
+PROFILE_DIR = "profiles"
+PROFILE_WINDOW_S = 30  # 采集窗口，到时自动结束
+STACK_SAMPLE_INTERVAL = 0.01  # 线程栈采样间隔（秒）
+TRACEMALLOC_FRAMES = 10
+TOP_N = 40
+
+
+class ProfileSession:
+    """start() / stop() 须在 GUI 线程调用（cProfile 只作用于调用线程）"""
+
+    def __init__(self, base_dir: str = PROFILE_DIR):
+        self.base_dir = base_dir
+        self._profiler = None
+        self._dir = None
+        self._started = 0.0
+        self._sampler = None
+        self._sampling = threading.Event()
+        self._stacks = collections.Counter()
+        self._samples = 0
+        self._prev_snapshot = None
+
+    @property
+    def active(self) -> bool:
+        return self._profiler is not None
+
+    def toggle(self) -> None:
+        self.stop() if self.active else self.start()
+
+    def start(self) -> None:
+        if self.active:
+            return
+        self._dir = os.path.join(self.base_dir, time.strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self._dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        if self._prev_snapshot is None:
+            self._prev_snapshot = tracemalloc.take_snapshot()
+
+        self._stacks.clear()
+        self._samples = 0
+        self._sampling.set()
+        self._sampler = threading.Thread(target=self._sample_stacks, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+        self._started = time.monotonic()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        print(f"诊断采集开始 → {self._dir}", file=sys.stderr)
+
+    def stop(self) -> Optional[str]:
+        if not self.active:
+            return None
+        self._profiler.disable()
+        profiler, self._profiler = self._profiler, None
+        self._sampling.clear()
+        self._sampler.join(timeout=1.0)
+        duration = time.monotonic() - self._started
+
+        profiler.dump_stats(os.path.join(self._dir, "profile.pstats"))
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(TOP_N)
+        self._write("profile.txt", text.getvalue())
+
+        snapshot = tracemalloc.take_snapshot()
+        diff = snapshot.compare_to(self._prev_snapshot, "lineno")
+        self._write("tracemalloc_diff.txt", "\n".join(str(s) for s in diff[:TOP_N]))
+        self._write("tracemalloc_top.txt", "\n".join(str(s) for s in snapshot.statistics("lineno")[:TOP_N]))
+        self._prev_snapshot = snapshot
+
+        self._write("stacks.folded", "\n".join(f"{k} {v}" for k, v in self._stacks.most_common()))
+        self._write("threads.txt", self._format_threads())
+        self._write("summary.json", json.dumps({
+            "duration_s": round(duration, 2),
+            "stack_samples": self._samples,
+            "threads": [t.name for t in threading.enumerate()],
+            "traced_memory_bytes": tracemalloc.get_traced_memory()[0],
+            "peak_rss_mb": _peak_rss_mb(),
+        }, ensure_ascii=False, indent=2))
+        print(f"诊断采集结束（{duration:.1f} s）→ {self._dir}", file=sys.stderr)
+        return self._dir
+
+    # ---------------- 内部 ---------------- #
+    def _write(self, name: str, text: str) -> None:
+        with open(os.path.join(self._dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _sample_stacks(self) -> None:
+        """定时抓取所有线程的当前栈，按 线程名;函数;… 折叠计数"""
+        me = threading.get_ident()
+        while self._sampling.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                # 直接遍历帧对象，不读取源码行（避免 linecache 分配污染内存对比）
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                parts.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(parts))
+                self._stacks[key] += 1
+            self._samples += 1
+            time.sleep(STACK_SAMPLE_INTERVAL)
+
+    @staticmethod
+    def _format_threads() -> str:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        out = []
+        for ident, frame in sys._current_frames().items():
+            out.append(f"--- {names.get(ident, ident)} ---")
+            out.extend(line.rstrip() for line in traceback.format_stack(frame))
+        return "\n".join(out)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+_signal_callbacks = []  # SIGUSR1 到达时依次调用（仅在 GUI 线程增删）
+_signal_notifier = None
+
+
+def install_signal_toggle(parent: QtCore.QObject, callback: Callable[[], None]) -> None:
+    """SIGUSR1 → 在 GUI 线程调用 callback；parent 销毁时注销
+
+    Qt 事件循环运行期间 Python 不会及时执行信号处理函数，这里借助 set_wakeup_fd
+    把信号写入 socketpair，由 QSocketNotifier 唤醒事件循环，无需定时轮询。
+    set_wakeup_fd 是进程级的，因此只在首次调用时安装，之后的窗口只登记回调，
+    一次 SIGUSR1 分发给所有已登记的窗口。
+    """
+    global _signal_notifier
+    if not hasattr(signal, "SIGUSR1"):
+        return  # Windows 无 SIGUSR1，仅热键可用
+    if _signal_notifier is None:
+        rsock, wsock = socket.socketpair()
+        rsock.setblocking(False)
+        wsock.setblocking(False)
+        signal.set_wakeup_fd(wsock.fileno())
+        signal.signal(signal.SIGUSR1, lambda *_: None)  # 真正的处理在下面的 notifier 中
+
+        # 不设 parent：与进程同生命周期，不随某个窗口销毁
+        _signal_notifier = QtCore.QSocketNotifier(rsock.fileno(), QtCore.QSocketNotifier.Read)
+
+        def _on_wakeup():
+            try:
+                data = rsock.recv(64)
+            except BlockingIOError:
+                return
+            if signal.SIGUSR1 in data:
+                for cb in list(_signal_callbacks):
+                    cb()
+
+        _signal_notifier.activated.connect(_on_wakeup)
+        # 保持引用，避免套接字被回收
+        _signal_notifier._sockets = (rsock, wsock)
+
+    _signal_callbacks.append(callback)
+
+    def _unregister(*_):
+        if callback in _signal_callbacks:
+            _signal_callbacks.remove(callback)
+
+    parent.destroyed.connect(_unregister)
+
+
+def attach(widget, hotkey: str = "Ctrl+P") -> ProfileSession:
+    """给播放器窗口挂上热键与 SIGUSR1；采集到达窗口时长后自动结束"""
+    from PyQt5 import QtGui, QtWidgets
+
+    session = ProfileSession()
+    timer = QtCore.QTimer(widget)
+    timer.setSingleShot(True)
+    timer.timeout.connect(session.stop)
+
+    def toggle():
+        session.toggle()
+        if session.active:
+            timer.start(PROFILE_WINDOW_S * 1000)
+        else:
+            timer.stop()
+
+    QtWidgets.QShortcut(QtGui.QKeySequence(hotkey), widget, activated=toggle)
+    install_signal_toggle(widget, toggle)
+    return session
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""旋转与 ROI 裁剪：本地 / 网络播放器、多路网格与无界面导出共用的帧变换（不依赖 Qt）
+
+ROI 统一用归一化矩形 (x, y, w, h) 表示，取值 0~1，坐标系为旋转之后的画面。
+播放器中 QLabel 上框选的区域按标签宽高归一化，与原先按像素比例映射的结果一致。
+"""
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+NormRoi = Tuple[float, float, float, float]
+
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def rotate_frame(frame: np.ndarray, rotation: int) -> np.ndarray:
+    """按 0/90/180/270 度顺时针旋转"""
+    code = ROTATE_CODES.get(rotation % 360)
+    return frame if code is None else cv2.rotate(frame, code)
+
+
+def roi_from_label(left: int, top: int, right: int, bottom: int,
+                   label_w: int, label_h: int) -> NormRoi:
+    """QLabel 上的 ROI（像素边界）→ 归一化 ROI"""
+    return (
+        left / label_w,
+        top / label_h,
+        (right - left) / label_w,
+        (bottom - top) / label_h,
+    )
+
+
+def roi_pixels(roi: NormRoi, frame_w: int, frame_h: int) -> Tuple[int, int, int, int]:
+    """归一化 ROI → 画面像素边界 (x1, y1, x2, y2)"""
+    x, y, w, h = roi
+    return (
+        int(x * frame_w),
+        int(y * frame_h),
+        int((x + w) * frame_w),
+        int((y + h) * frame_h),
+    )
+
+
+def crop_roi(frame: np.ndarray, roi: Optional[NormRoi]) -> np.ndarray:
+    """按归一化 ROI 裁剪（返回视图，不复制）"""
+    if roi is None:
+        return frame
+    x1, y1, x2, y2 = roi_pixels(roi, frame.shape[1], frame.shape[0])
+    return frame[y1:y2, x1:x2]
+
+
+def apply_transform(frame: np.ndarray, rotation: int, roi: Optional[NormRoi]) -> np.ndarray:
+    """先旋转、再裁剪，与播放器显示顺序一致"""
+    return crop_roi(rotate_frame(frame, rotation), roi)
+
+
+def output_size(src_w: int, src_h: int, rotation: int, roi: Optional[NormRoi]) -> Tuple[int, int]:
+    """计算变换后画面尺寸 (w, h)"""
+    if rotation % 180 == 90:
+        src_w, src_h = src_h, src_w
+    if roi is None:
+        return src_w, src_h
+    x1, y1, x2, y2 = roi_pixels(roi, src_w, src_h)
+    return x2 - x1, y2 - y1
+
+
+def parse_roi(text: str) -> NormRoi:
+    """解析命令行 / 清单中的 "x,y,w,h"（归一化）"""
+    parts = [float(p) for p in text.split(",")]
+    if len(parts) != 4:
+        raise ValueError(f"ROI 需要 4 个数值 x,y,w,h：{text!r}")
+    x, y, w, h = parts
+    if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > 1.0001 or y + h > 1.0001:
+        raise ValueError(f"ROI 超出 0~1 范围：{text!r}")
+    return x, y, w, h
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""ROI 快照：从源分辨率帧按当前旋转 / ROI 截图，在线程池中编码为 PNG / JPEG / WebP
+
+GUI 线程只提交帧的引用；旋转、裁剪、编码、写盘都在后台完成。
+在途任务数有上限，超出时直接丢弃本次请求，连拍不会拖慢播放，也不会无限占用内存。
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from roi_transform import NormRoi, apply_transform
+
+# ============================== 常量配置 ============================== #
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_FORMAT = "png"  # png / jpg / webp
+SNAPSHOT_QUALITY = 95  # JPEG / WebP 质量
+PNG_COMPRESSION = 3  # 0~9，越大越慢
+SNAPSHOT_WORKERS = 2
+MAX_IN_FLIGHT = 4  # 同时在途的快照数（每张持有一整帧源分辨率数据）
+BURST_FPS = 5  # 连拍帧率
+
+_ENCODE_PARAMS = {
+    "png": [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION],
+    "jpg": [cv2.IMWRITE_JPEG_QUALITY, SNAPSHOT_QUALITY],
+    "webp": [cv2.IMWRITE_WEBP_QUALITY, SNAPSHOT_QUALITY],
+}
+
+
+class SnapshotWriter:
+    """submit() 在 GUI 线程调用，永不阻塞"""
+
+    def __init__(self, out_dir: str = SNAPSHOT_DIR, fmt: str = SNAPSHOT_FORMAT,
+                 workers: int = SNAPSHOT_WORKERS, max_in_flight: int = MAX_IN_FLIGHT):
+        fmt = fmt.lower().replace("jpeg", "jpg")
+        if fmt not in _ENCODE_PARAMS:
+            raise ValueError(f"不支持的快照格式: {fmt}")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot")
+        self._seq = 0
+        self.dropped = 0
+
+    def submit(self, frame_bgr: np.ndarray, rotation: int, roi: Optional[NormRoi],
+               stem: str, pts_ms: float) -> bool:
+        """提交一帧（cv2 解码得到的 BGR 源帧）；在途任务已满时丢弃并返回 False"""
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return False
+        self._seq += 1
+        name = f"{stem}_{int(pts_ms):09d}ms_{self._seq:04d}.{self.fmt}"
+        self._pool.submit(self._encode, frame_bgr, rotation, roi, os.path.join(self.out_dir, name))
+        return True
+
+    def _encode(self, frame_bgr, rotation, roi, path) -> None:
+        try:
+            image = apply_transform(frame_bgr, rotation, roi)
+            ok, data = cv2.imencode("." + self.fmt, image, _ENCODE_PARAMS[self.fmt])
+            if not ok:
+                raise RuntimeError("编码失败")
+            os.makedirs(self.out_dir, exist_ok=True)
+            # imencode + 普通文件写入，避免 imwrite 在 Windows 上不支持中文路径
+            with open(path, "wb") as f:
+                f.write(data.tobytes())
+            print(f"快照已保存: {path}")
+        except Exception as exc:
+            print(f"快照保存失败 {path}: {exc}", file=sys.stderr)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        """等待已提交的快照写完"""
+        self._pool.shutdown(wait=True)
+
+
+class BurstClock:
+    """按视频时间戳节流的连拍计时：每 1/fps 秒放行一帧"""
+
+    def __init__(self, fps: float = BURST_FPS):
+        self.interval_ms = 1000.0 / fps
+        self.active = False
+        self._next_ms = None
+
+    def toggle(self) -> bool:
+        self.active = not self.active
+        self._next_ms = None
+        return self.active
+
+    def due(self, pts_ms: float) -> bool:
+        if not self.active:
+            return False
+        if self._next_ms is None or pts_ms >= self._next_ms or pts_ms < self._next_ms - 2 * self.interval_ms:
+            # 首帧、到期或向后跳转后重新计时
+            self._next_ms = pts_ms + self.interval_ms
+            return True
+        return False
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""多文件批量 ROI 处理：按清单把同一套 ROI / 旋转应用到大量文件，无需 QApplication
+
+清单为 JSON Lines（.jsonl）或 CSV（.csv），每条记录：
+    input     源文件路径（必填）
+    output    输出路径（可选，默认 <out_dir>/<文件名>_roi.mp4；不同目录下的同名文件
+              改为 <文件名>_<目录哈希>_roi.mp4）。两个条目输出到同一文件时拒绝运行
+    roi       归一化 "x,y,w,h" 或 [x, y, w, h]（可选，缺省为整幅画面）
+    rotation  0/90/180/270（可选）
+
+用法：python roi_batch.py manifest.jsonl --out-dir out/ [--workers 8] [--roi ...] [--rotation 90]
+已完成的条目记录在 <manifest>.state.jsonl 中，重新运行时自动跳过（断点续跑）；
+记录中的输入、ROI 或旋转与本次清单不同时重新处理。
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Optional
+
+# local/ 与 stream/ 共用的模块（帧变换、快照等）位于仓库根目录的 common/
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+from roi_export import export_roi
+from roi_transform import parse_roi
+
+STATUS_INTERVAL = 1.0  # 进度刷新间隔（秒）
+
+
+# ============================== 清单 ============================== #
+def load_manifest(path: str, out_dir: str, default_roi=None, default_rotation: int = 0) -> List[dict]:
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs = []
+    for row in rows:
+        src = row["input"]
+        roi = row.get("roi") or default_roi
+        if isinstance(roi, str):
+            roi = parse_roi(roi)
+        elif roi is not None:
+            roi = tuple(float(v) for v in roi)
+        jobs.append({
+            "input": src,
+            "output": row.get("output") or None,
+            "roi": roi,
+            "rotation": int(row.get("rotation") or default_rotation),
+        })
+
+    # 同名文件的默认输出加上所在目录的短哈希，否则会互相覆盖，断点续跑也会误判为已完成
+    stems = Counter(_stem(job["input"]) for job in jobs if job["output"] is None)
+    for job in jobs:
+        if job["output"] is None:
+            stem = _stem(job["input"])
+            if stems[stem] > 1:
+                parent = os.path.dirname(os.path.abspath(job["input"]))
+                stem = f"{stem}_{hashlib.sha1(parent.encode('utf-8')).hexdigest()[:8]}"
+            job["output"] = os.path.join(out_dir, f"{stem}_roi.mp4")
+
+    outputs = Counter(os.path.abspath(job["output"]) for job in jobs)
+    duplicates = [path for path, count in outputs.items() if count > 1]
+    if duplicates:
+        raise ValueError(f"多个条目输出到同一文件：{', '.join(duplicates)}")
+    return jobs
+
+
+def _stem(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def load_done(state_path: str) -> dict:
+    """读取断点记录：output → 完成时的统计"""
+    done = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    done[rec["output"]] = rec
+    return done
+
+
+def _roi_record(roi) -> Optional[list]:
+    """ROI 在断点记录中的形式（JSON 中元组会变成列表）"""
+    return list(roi) if roi is not None else None
+
+
+def _is_done(job: dict, done: dict) -> bool:
+    rec = done.get(job["output"])
+    if not rec or rec.get("input", job["input"]) != job["input"]:
+        return False
+    if rec.get("roi") != _roi_record(job["roi"]) or rec.get("rotation") != job["rotation"]:
+        return False  # 同一输出换了裁剪参数，旧文件已过期
+    return os.path.exists(job["output"]) and os.path.getsize(job["output"]) == rec.get("bytes_out")
+
+
+# ============================== 子进程 ============================== #
+def _run_job(index: int, job: dict, progress_queue) -> dict:
+    os.makedirs(os.path.dirname(os.path.abspath(job["output"])), exist_ok=True)
+    tmp_out = job["output"] + ".part.mp4"
+    try:
+        stats = export_roi(
+            job["input"], tmp_out, roi=job["roi"], rotation=job["rotation"], workers=1,
+            on_frames=lambda n: progress_queue.put((index, n)),
+        )
+        os.replace(tmp_out, job["output"])  # 写完再改名，中断时不会留下看似完整的输出
+    except BaseException:
+        try:
+            os.remove(tmp_out)  # 失败时不留下半成品
+        except OSError:
+            pass
+        raise
+    stats.update(
+        input=job["input"], output=job["output"],
+        roi=_roi_record(job["roi"]), rotation=job["rotation"],
+        bytes_in=os.path.getsize(job["input"]), bytes_out=os.path.getsize(job["output"]),
+    )
+    return stats
+
+
+# ============================== 调度 ============================== #
+def run_batch(jobs: List[dict], state_path: str, workers: Optional[int] = None) -> dict:
+    done = load_done(state_path)
+    pending = [(i, j) for i, j in enumerate(jobs) if not _is_done(j, done)]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        print(f"跳过已完成 {skipped} 个文件", file=sys.stderr)
+
+    workers = workers or os.cpu_count() or 1
+    t0 = time.monotonic()
+    frames_live = {}
+    total_frames = bytes_in = bytes_out = 0
+    failed = []
+
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(state_path, "a", encoding="utf-8") as state:
+        progress_queue = manager.Queue()
+        futures = {pool.submit(_run_job, i, j, progress_queue): (i, j) for i, j in pending}
+        remaining = set(futures)
+        while remaining:
+            finished, remaining = wait(remaining, timeout=STATUS_INTERVAL, return_when=FIRST_COMPLETED)
+            while True:
+                try:
+                    idx, n = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                frames_live[idx] = n
+            for fut in finished:
+                idx, job = futures[fut]
+                frames_live.pop(idx, None)
+                try:
+                    stats = fut.result()
+                except Exception as exc:
+                    failed.append(job["input"])
+                    print(f"\n失败：{job['input']}：{exc}", file=sys.stderr)
+                    continue
+                total_frames += stats["frames"]
+                bytes_in += stats["bytes_in"]
+                bytes_out += stats["bytes_out"]
+                state.write(json.dumps(stats, ensure_ascii=False) + "\n")
+                state.flush()
+                print(f"\n完成：{job['input']}（{stats['frames']} 帧，{stats['fps']} fps）", file=sys.stderr)
+
+            elapsed = time.monotonic() - t0
+            running = sum(frames_live.values())
+            print(
+                f"\r进度 {len(pending) - len(remaining)}/{len(pending)}，"
+                f"进行中 {len(frames_live)} 个（{running} 帧），"
+                f"{(total_frames + running) / max(elapsed, 1e-6):.1f} fps",
+                end="", file=sys.stderr,
+            )
+    print(file=sys.stderr)
+
+    elapsed = time.monotonic() - t0
+    return {
+        "files": len(pending) - len(failed),
+        "skipped": skipped,
+        "failed": failed,
+        "frames": total_frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(total_frames / elapsed, 2) if elapsed else 0.0,
+        "bytes_in_per_sec": round(bytes_in / elapsed) if elapsed else 0,
+        "bytes_out_per_sec": round(bytes_out / elapsed) if elapsed else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="多文件批量 ROI 裁剪/旋转")
+    parser.add_argument("manifest", help=".jsonl 或 .csv 清单")
+    parser.add_argument("--out-dir", default="roi_out")
+    parser.add_argument("--roi", type=parse_roi, default=None, help="清单未指定时使用的归一化 x,y,w,h")
+    parser.add_argument("--rotation", type=int, choices=(0, 90, 180, 270), default=0)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--state", default=None, help="断点记录文件，默认 <manifest>.state.jsonl")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_manifest(args.manifest, args.out_dir, args.roi, args.rotation)
+    except ValueError as exc:
+        print(f"清单错误：{exc}", file=sys.stderr)
+        sys.exit(1)
+    summary = run_batch(jobs, args.state or args.manifest + ".state.jsonl", args.workers)
+    print(json.dumps(summary, ensure_ascii=False))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
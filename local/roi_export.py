@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""无界面 ROI 导出：按关键帧切分时间段，多进程并行裁剪/旋转/编码，最后无损拼接
+
+用法：
+    python roi_export.py input.mp4 output.mp4 --roi 0.25,0.1,0.5,0.5 --rotation 90
+依赖系统中的 ffmpeg / ffprobe。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+
+# local/ 与 stream/ 共用的模块（帧变换、快照等）位于仓库根目录的 common/
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+from roi_transform import NormRoi, apply_transform, output_size, parse_roi
+
+# ============================== 常量配置 ============================== #
+DEFAULT_CRF = 18
+DEFAULT_PRESET = "veryfast"
+CHUNKS_PER_WORKER = 2  # 每个进程分到的时间段数，便于负载均衡
+MIN_CHUNK_SECONDS = 2.0
+PROGRESS_EVERY_FRAMES = 50
+
+
+# ============================== 探测 ============================== #
+def probe_video(path: str) -> dict:
+    """返回 {width, height, fps, duration, start_time}
+
+    宽高取 OpenCV 解码出的第一帧：OpenCV 会按 rotate 元数据自动旋转，与编码宽高可能互换。
+    """
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,avg_frame_rate:format=duration,start_time",
+         "-of", "json", path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    info = json.loads(out)
+    stream = info["streams"][0]
+    num, _, den = stream.get("avg_frame_rate", "25/1").partition("/")
+    fps = float(num) / float(den or 1) if float(num or 0) else 25.0
+    width, height = int(stream["width"]), int(stream["height"])
+    cap = cv2.VideoCapture(path)
+    ret, frame = cap.read()
+    cap.release()
+    if ret:
+        height, width = frame.shape[:2]
+    return {
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "duration": float(info["format"]["duration"]),
+        "start_time": float(info["format"].get("start_time") or 0.0),
+    }
+
+
+def probe_keyframes(path: str, start_time: float = 0.0) -> List[float]:
+    """只读取数据包标志，不解码，返回关键帧时间戳（秒）
+
+    ffprobe 的 pts_time 是绝对时间，OpenCV 的 POS_MSEC 从 start_time 起算；
+    传入 probe_video() 的 start_time，返回与 POS_MSEC 同一基准的时间。
+    """
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    keyframes = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(max(0.0, float(pts) - start_time))
+    return sorted(set(keyframes)) or [0.0]
+
+
+def plan_chunks(keyframes: List[float], duration: float, n_chunks: int) -> List[Tuple[float, float]]:
+    """在关键帧处切分，使各段时长尽量接近 duration / n_chunks"""
+    target = max(duration / max(n_chunks, 1), MIN_CHUNK_SECONDS)
+    bounds = [0.0]
+    for kf in keyframes:
+        if kf - bounds[-1] >= target and duration - kf >= MIN_CHUNK_SECONDS / 2:
+            bounds.append(kf)
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# ============================== 分段编码（子进程） ============================== #
+def _encode_chunk(src: str, dst: str, start: float, end: float, rotation: int,
+                  roi: Optional[NormRoi], size: Tuple[int, int], fps: float,
+                  crf: int, preset: str,
+                  on_frames: Optional[Callable[[int], None]] = None) -> Tuple[str, int]:
+    cv2.setNumThreads(1)  # 并行度由进程池提供，避免线程过度订阅
+    w, h = size
+    cap = cv2.VideoCapture(src)
+    cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+    enc = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-y",
+         "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", f"{fps:.6f}", "-i", "-",
+         "-an", "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p", dst],
+        stdin=subprocess.PIPE,
+    )
+    half_frame = 0.5 / fps
+    frames = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # read() 之后 POS_MSEC 为刚解码帧的时间戳
+            if cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 >= end - half_frame:
+                break
+            out = apply_transform(frame, rotation, roi)[:h, :w]
+            enc.stdin.write(out.tobytes())
+            frames += 1
+            if on_frames and frames % PROGRESS_EVERY_FRAMES == 0:
+                on_frames(frames)
+    finally:
+        cap.release()
+        enc.stdin.close()
+        if enc.wait() != 0:
+            raise RuntimeError(f"ffmpeg 编码失败：{dst}")
+    return dst, frames
+
+
+# ============================== 对外接口 ============================== #
+def export_roi(src: str, dst: str, roi: Optional[NormRoi] = None, rotation: int = 0,
+               workers: Optional[int] = None, keep_audio: bool = True,
+               crf: int = DEFAULT_CRF, preset: str = DEFAULT_PRESET,
+               progress: Optional[Callable[[int, int], None]] = None,
+               on_frames: Optional[Callable[[int], None]] = None) -> dict:
+    """导出 src 的 ROI/旋转结果到 dst，返回统计信息
+
+    workers=1 时在当前进程内整段编码（供批处理在进程池内调用），此时 on_frames 会收到已编码帧数。
+    """
+    t0 = time.monotonic()
+    info = probe_video(src)
+    w, h = output_size(info["width"], info["height"], rotation, roi)
+    size = (w - w % 2, h - h % 2)  # yuv420p 需要偶数宽高
+    if size[0] <= 0 or size[1] <= 0:
+        raise ValueError("ROI 过小")
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        chunks = [(0.0, info["duration"])]
+    else:
+        chunks = plan_chunks(probe_keyframes(src, info["start_time"]), info["duration"],
+                             workers * CHUNKS_PER_WORKER)
+    tmpdir = tempfile.mkdtemp(prefix="roi_export_")
+    try:
+        parts = [os.path.join(tmpdir, f"chunk_{i:05d}.mp4") for i in range(len(chunks))]
+        total_frames = 0
+        if len(chunks) == 1:
+            total_frames = _encode_chunk(src, parts[0], *chunks[0], rotation, roi, size,
+                                         info["fps"], crf, preset, on_frames)[1]
+            if progress:
+                progress(1, 1)
+        else:
+            total_frames = _encode_parallel(src, parts, chunks, rotation, roi, size, info["fps"],
+                                            crf, preset, workers, progress)
+        _concat(parts, src if keep_audio else None, dst, tmpdir)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    elapsed = time.monotonic() - t0
+    return {
+        "frames": total_frames,
+        "duration": info["duration"],
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 3),
+        "fps": round(total_frames / elapsed, 2) if elapsed else 0.0,
+        "speed": round(info["duration"] / elapsed, 2) if elapsed else 0.0,
+        "size": list(size),
+    }
+
+
+def _encode_parallel(src, parts, chunks, rotation, roi, size, fps, crf, preset, workers, progress) -> int:
+    total_frames = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [
+            pool.submit(_encode_chunk, src, part, start, end, rotation, roi, size, fps, crf, preset)
+            for part, (start, end) in zip(parts, chunks)
+        ]
+        for done, fut in enumerate(as_completed(futures), 1):
+            total_frames += fut.result()[1]
+            if progress:
+                progress(done, len(futures))
+    return total_frames
+
+
+def _concat(parts: List[str], audio_src: Optional[str], dst: str, tmpdir: str) -> None:
+    """concat demuxer 直接拼接各段码流，不重新编码；可选复制源文件音轨"""
+    list_path = os.path.join(tmpdir, "parts.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for part in parts:
+            f.write(f"file '{part}'\n")
+    cmd = ["ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_src:
+        cmd += ["-i", audio_src, "-map", "0:v", "-map", "1:a?", "-shortest"]
+    cmd += ["-c", "copy", dst]
+    subprocess.run(cmd, check=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="无界面 ROI 裁剪/旋转导出")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--roi", type=parse_roi, default=None, help="归一化 x,y,w,h（旋转后的画面坐标）")
+    parser.add_argument("--rotation", type=int, choices=(0, 90, 180, 270), default=0)
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--no-audio", action="store_true")
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF)
+    parser.add_argument("--preset", default=DEFAULT_PRESET)
+    args = parser.parse_args()
+
+    stats = export_roi(
+        args.input, args.output, roi=args.roi, rotation=args.rotation, workers=args.workers,
+        keep_audio=not args.no_audio, crf=args.crf, preset=args.preset,
+        progress=lambda done, total: print(f"\r已完成 {done}/{total} 段", end="", file=sys.stderr),
+    )
+    print(file=sys.stderr)
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""后台场景切换索引：低分辨率抽样 + numpy 向量化的帧差 / 直方图评分，结果按文件持久化并支持断点续扫
+
+抽样由 ffmpeg 完成：解码后只保留抽样帧，在 ffmpeg 内缩放为 64×36 灰度，经 rawvideo 管道读取，
+Python 侧不接触全分辨率画面（解码本身仍是全分辨率）。没有 ffmpeg 时退回 cv2 逐帧 grab，
+抽样帧再用 cv2 缩放。
+索引保存在视频旁的 <video>.scenes.json；文件大小或修改时间变化后索引自动作废。
+可单独运行：python scene_index.py <video_file>
+"""
+
+import bisect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ============================== 常量配置 ============================== #
+INDEX_VERSION = 2  # 2：关键帧按 start_time 校正
+SAMPLE_SIZE = (64, 36)  # 评分用缩略图尺寸
+SAMPLES_PER_SECOND = 6  # 每秒抽样次数，其余帧解码后直接丢弃
+BATCH_SIZE = 256  # 每批向量化计算的样本数
+HIST_BINS = 32
+DIFF_THRESHOLD = 20.0  # 平均像素差（0~255）
+HIST_THRESHOLD = 0.4  # 直方图 L1 距离（0~2）
+MIN_SCENE_SECONDS = 0.5  # 两次切换的最小间隔
+SAVE_INTERVAL = 5.0  # 断点保存间隔（秒）
+FFMPEG_BIN = "ffmpeg"
+
+
+def index_path(video_path: str) -> str:
+    return video_path + ".scenes.json"
+
+
+def _file_stamp(video_path: str) -> dict:
+    st = os.stat(video_path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def load_index(video_path: str) -> Optional[dict]:
+    """读取持久化索引；视频文件已变化时返回 None"""
+    try:
+        with open(index_path(video_path), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != INDEX_VERSION or data.get("file") != _file_stamp(video_path):
+        return None
+    return data
+
+
+def save_index(video_path: str, data: dict) -> None:
+    tmp = index_path(video_path) + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, index_path(video_path))
+    except OSError as exc:
+        print(f"场景索引保存失败：{exc}", file=sys.stderr)
+
+
+def score_batch(samples: np.ndarray, prev: Optional[np.ndarray]) -> np.ndarray:
+    """samples: (N, h, w) uint8 → 每个样本相对前一个样本是否为切换点 (N,) bool"""
+    if prev is not None:
+        samples = np.concatenate([prev[None], samples])
+    flat = samples.reshape(len(samples), -1)
+    # 平均绝对帧差
+    diff = np.abs(np.diff(flat.astype(np.int16), axis=0)).mean(axis=1)
+    # 归一化直方图的 L1 距离（一次性对整批计算）
+    bins = (flat >> (8 - int(np.log2(HIST_BINS)))).astype(np.intp)
+    offsets = np.arange(len(flat))[:, None] * HIST_BINS
+    hist = np.bincount((bins + offsets).ravel(), minlength=len(flat) * HIST_BINS)
+    hist = hist.reshape(len(flat), HIST_BINS) / flat.shape[1]
+    hist_dist = np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    cuts = (diff > DIFF_THRESHOLD) & (hist_dist > HIST_THRESHOLD)
+    return cuts if prev is not None else np.concatenate([[False], cuts])
+
+
+class SceneIndexer(threading.Thread):
+    """后台扫描线程；cuts 为已发现的切换帧号（读取时加锁复制）"""
+
+    def __init__(self, video_path: str, on_update: Optional[Callable[[List[int]], None]] = None):
+        super().__init__(name="scene-indexer", daemon=True)
+        self.video_path = video_path
+        self._on_update = on_update
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        existing = load_index(video_path)
+        self._data = existing or {
+            "version": INDEX_VERSION,
+            "file": _file_stamp(video_path),
+            "scanned_until": 0,
+            "complete": False,
+            "cuts": [],
+            "keyframes": None,
+        }
+
+    @property
+    def complete(self) -> bool:
+        return self._data["complete"]
+
+    def cuts(self) -> List[int]:
+        with self._lock:
+            return list(self._data["cuts"])
+
+    def keyframes(self) -> Optional[List[int]]:
+        return self._data.get("keyframes")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    # ---------------- 扫描 ---------------- #
+    def run(self) -> None:
+        if self._data["complete"]:
+            return
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        if self._data.get("keyframes") is None:
+            self._data["keyframes"] = self._probe_keyframes(fps)
+        stride = max(1, int(round(fps / SAMPLES_PER_SECOND)))
+        min_gap = int(MIN_SCENE_SECONDS * fps)
+
+        scanned_until = self._data["scanned_until"]
+        # 断点续扫从断点前最后一个抽样帧开始：它只用作 prev，断点处的切换也能与之比较
+        start = (scanned_until - 1) // stride * stride if scanned_until else 0
+        if shutil.which(FFMPEG_BIN) is not None:
+            cap.release()
+            samples = self._ffmpeg_samples(start, stride, fps)
+        else:
+            samples = self._cv2_samples(cap, start, stride)
+        prev = None
+        batch, batch_idx = [], []
+        last_save = time.monotonic()
+        try:
+            for frame_idx, thumb in samples:
+                if self._stop_event.is_set():
+                    return  # 被中断：已处理的批次已记录，未满的批次下次重扫
+                if frame_idx < scanned_until:
+                    prev = thumb
+                    continue
+                batch.append(thumb)
+                batch_idx.append(frame_idx)
+                if len(batch) >= BATCH_SIZE:
+                    prev = self._flush(batch, batch_idx, prev, min_gap, frame_idx + 1)
+                    batch, batch_idx = [], []
+                    if time.monotonic() - last_save > SAVE_INTERVAL:
+                        save_index(self.video_path, self._data)
+                        last_save = time.monotonic()
+            if self._stop_event.is_set():
+                return
+            if batch:
+                self._flush(batch, batch_idx, prev, min_gap, batch_idx[-1] + 1)
+            self._data["complete"] = True
+        except RuntimeError as exc:
+            print(f"场景索引中断：{exc}", file=sys.stderr)  # 未完成，下次从断点继续
+        finally:
+            samples.close()  # 结束 ffmpeg 子进程 / 释放 VideoCapture
+            save_index(self.video_path, self._data)
+
+    def _ffmpeg_samples(self, start: int, stride: int, fps: float) -> Iterator[Tuple[int, np.ndarray]]:
+        """从第 start 帧起每 stride 帧一个 64×36 灰度样本 → (帧号, 样本)；选帧与缩放都在 ffmpeg 内完成"""
+        w, h = SAMPLE_SIZE
+        cmd = [FFMPEG_BIN, "-v", "error", "-nostdin"]
+        if start:
+            cmd += ["-ss", f"{start / fps:.6f}"]  # 输入端 seek：精确到帧，之后 n 从 0 重新计数
+        cmd += ["-i", self.video_path, "-an", "-sn", "-dn",
+                "-vf", f"select=not(mod(n\\,{stride})),scale={w}:{h}:flags=area",
+                "-vsync", "0", "-pix_fmt", "gray", "-f", "rawvideo", "pipe:1"]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        try:
+            frame_idx = start
+            while True:
+                raw = proc.stdout.read(w * h)
+                if len(raw) < w * h:
+                    break
+                yield frame_idx, np.frombuffer(raw, np.uint8).reshape(h, w)
+                frame_idx += stride
+            if proc.wait() != 0:
+                raise RuntimeError(f"ffmpeg 抽样失败（退出码 {proc.returncode}）")
+        finally:
+            proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+    def _cv2_samples(self, cap, start: int, stride: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """没有 ffmpeg 时：逐帧 grab，只对抽样帧做颜色转换与缩放"""
+        try:
+            if start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            frame_idx = start
+            while cap.grab():
+                if frame_idx % stride == 0:
+                    ok, frame = cap.retrieve()
+                    if ok:
+                        yield frame_idx, self._thumbnail(frame)
+                frame_idx += 1
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _thumbnail(frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _flush(self, batch, batch_idx, prev, min_gap, scanned_until) -> np.ndarray:
+        samples = np.stack(batch)
+        flags = score_batch(samples, prev)
+        with self._lock:
+            cuts = self._data["cuts"]
+            for idx in np.asarray(batch_idx)[flags]:
+                idx = int(idx)
+                if not cuts or idx - cuts[-1] >= min_gap:
+                    cuts.append(idx)
+            self._data["scanned_until"] = scanned_until
+        if self._on_update:
+            self._on_update(self.cuts())
+        return samples[-1]
+
+    def _probe_keyframes(self, fps: float) -> Optional[List[int]]:
+        """用 ffprobe 读取关键帧位置（不解码）；没有 ffprobe 时返回 None"""
+        try:
+            from roi_export import probe_keyframes, probe_video
+            # 与 POS_FRAMES / POS_MSEC 对齐：时间戳从 start_time 起算
+            start_time = probe_video(self.video_path)["start_time"]
+            return sorted({int(round(t * fps)) for t in probe_keyframes(self.video_path, start_time)})
+        except Exception:
+            return None
+
+
+def snap_to_keyframe(frame: int, keyframes: Optional[List[int]], fps: float) -> int:
+    """切换点附近（半秒内）有关键帧时跳到关键帧，seek 无需从前一个关键帧解码"""
+    if not keyframes:
+        return frame
+    i = bisect.bisect_left(keyframes, frame)
+    near = [k for k in keyframes[max(0, i - 1):i + 1] if abs(k - frame) <= fps / 2]
+    return min(near, key=lambda k: abs(k - frame)) if near else frame
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print("用法: python scene_index.py <video_file>")
+        sys.exit(1)
+    t0 = time.monotonic()
+    indexer = SceneIndexer(sys.argv[1])
+    indexer.start()
+    indexer.join()
+    print(json.dumps({"cuts": indexer.cuts(), "seconds": round(time.monotonic() - t0, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,22 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
 import cv2
 import os
 from PyQt5 import QtCore, QtGui, QtWidgets, QtMultimedia, QtMultimediaWidgets
 
+# local/ 与 stream/ 共用的模块（帧变换、快照等）位于仓库根目录的 common/
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+from roi_transform import rotate_frame, crop_roi, roi_from_label
+from scene_index import SceneIndexer, snap_to_keyframe
+from snapshot import SnapshotWriter, BurstClock
+from pipeline_stats import PipelineStats, StatsOverlay
+import profiling
+
 
 
 
@@ -86,7 +98,28 @@ class VideoLabel(QtWidgets.QLabel):
 
 # --------- 可点击跳转的进度条 --------- #
 class VideoSlider(QtWidgets.QSlider):
-    """点击任意位置即可跳帧的水平进度条"""
+    """点击任意位置即可跳帧的水平进度条；可叠加场景切换标记"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._markers = []  # 场景切换帧号
+
+    def set_markers(self, frames):
+        self._markers = list(frames)
+        self.update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._markers or self.maximum() <= self.minimum():
+            return
+        painter = QtGui.QPainter(self)
+        painter.setPen(QtGui.QPen(QtGui.QColor(255, 200, 0, 200), 1))
+        span = self.maximum() - self.minimum()
+        for frame in self._markers:
+            x = int((frame - self.minimum()) / span * (self.width() - 1))
+            painter.drawLine(x, 0, x, 4)
+            painter.drawLine(x, self.height() - 5, x, self.height() - 1)
+        painter.end()
 
     def mousePressEvent(self, event: QtGui.QMouseEvent):
         if event.button() == QtCore.Qt.LeftButton:
@@ -107,16 +140,20 @@ class VideoSlider(QtWidgets.QSlider):
 class VideoPlayer(QtWidgets.QMainWindow):
     """主窗口：负责解码、定时刷新与 ROI 裁剪"""
 
+    _cuts_updated = QtCore.pyqtSignal(object)
+
     def __init__(self, video_path: str, parent=None):
         super().__init__(parent)
         self.setWindowTitle("视频 ROI 工具")
 
         # ---------- 视频解码 ---------- #
+        self._video_path = video_path
         self._cap = cv2.VideoCapture(video_path)
         if not self._cap.isOpened():
             raise RuntimeError(f"无法打开视频文件: {video_path}")
         fps = self._cap.get(cv2.CAP_PROP_FPS) or 25
         self._total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._fps = fps
         self._interval_ms = int(1000 / fps)
         
         # ---------- 音频处理 ---------- #
@@ -139,6 +176,8 @@ class VideoPlayer(QtWidgets.QMainWindow):
         vbox.addWidget(self._label)
         self.setCentralWidget(central)
         self._label.roiChanged.connect(self._on_roi_changed)
+        self._stats = PipelineStats(expected_interval_ms=self._interval_ms)
+        self._stats_overlay = StatsOverlay(self._stats, self._label)
 
         # ---------- 控制面板 ---------- #
         self._control_panel = ControlPanel(self)
@@ -152,28 +191,54 @@ class VideoPlayer(QtWidgets.QMainWindow):
         # 音量滑条联动
         self._control_panel._volume_slider.valueChanged.connect(self._media_player.setVolume)
 
+        # Ctrl+E：打印当前 ROI / 旋转对应的无界面导出命令
+        QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+E"), self, activated=self._print_export_command)
+        # [ / ]：跳到上一个 / 下一个场景切换点
+        QtWidgets.QShortcut(QtGui.QKeySequence("["), self, activated=lambda: self._jump_cut(-1))
+        QtWidgets.QShortcut(QtGui.QKeySequence("]"), self, activated=lambda: self._jump_cut(1))
+        # S：源分辨率 ROI 快照；Shift+S：开始 / 停止连拍
+        QtWidgets.QShortcut(QtGui.QKeySequence("S"), self, activated=self._take_snapshot)
+        QtWidgets.QShortcut(QtGui.QKeySequence("Shift+S"), self, activated=self._toggle_burst)
+        # I：显示 / 隐藏管线统计叠加层；Ctrl+J：导出各帧分阶段计时（JSON Lines）
+        QtWidgets.QShortcut(QtGui.QKeySequence("I"), self, activated=self._stats_overlay.toggle)
+        QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+J"), self, activated=self._export_stats)
+        # Ctrl+P 或 SIGUSR1：开始 / 结束一次诊断采集（cProfile、tracemalloc、线程栈）
+        self._profile = profiling.attach(self)
+        # A：仅音频模式，停止视频解码
+        QtWidgets.QShortcut(QtGui.QKeySequence("A"), self, activated=self._toggle_audio_only)
+        self._snapshots = SnapshotWriter()
+        self._burst = BurstClock()
+        self._last_frame = None  # (BGR 源帧, 毫秒)，快照用
+
+        # ---------- 场景切换索引（后台扫描，已有索引时直接加载） ---------- #
+        self._cuts = []
+        self._cuts_updated.connect(self._on_cuts_updated)
+        self._scene_indexer = SceneIndexer(video_path, on_update=self._cuts_updated.emit)
+        self._on_cuts_updated(self._scene_indexer.cuts())
+        self._scene_indexer.start()
+
         # ---------- 定时器播放 ---------- #
         self._timer = QtCore.QTimer(self)
         self._timer.timeout.connect(self._next_frame)
         self._timer.start(self._interval_ms)
 
-        # ---------- 鼠标位置检测定时器 ---------- #
-        self._mouse_check_timer = QtCore.QTimer(self)
-        self._mouse_check_timer.setInterval(100)  # 100ms = 0.1秒
-        self._mouse_check_timer.timeout.connect(self._check_mouse_position)
-        self._mouse_check_timer.start()
+        # ---------- 控制面板显隐：由进入 / 离开事件驱动，无需轮询 ---------- #
+        self._label.installEventFilter(self)
+        self._control_panel.installEventFilter(self)
 
         # ---------- 状态 ---------- #
         self._roi = None  # type: QtCore.QRect | None
         self._rotation = 0  # 当前旋转角度（0/90/180/270）
         self._paused = False  # 播放/暂停状态
+        self._audio_only = False
+        self._suspended = False  # 因窗口不可见而暂停解码，恢复时需对齐音频
         
         # 显示并定位控制面板
         self._update_control_panel_position()
 
         # 初始定位但隐藏控制面板
         self._control_panel.show()  # 先显示以便用户知道面板位置
-        QtCore.QTimer.singleShot(2000, self._control_panel.hide)  # 2秒后自动隐藏
+        QtCore.QTimer.singleShot(2000, self._update_panel_visibility)  # 2秒后按鼠标位置决定是否隐藏
 
     def resizeEvent(self, event):
         """窗口大小改变时重新定位控制面板"""
@@ -198,6 +263,54 @@ class VideoPlayer(QtWidgets.QMainWindow):
         self._roi = None
         self._label.clear_roi()
 
+    def _normalized_roi(self):
+        """当前 ROI 的归一化表示（与无界面导出共用）"""
+        if not self._roi:
+            return None
+        return roi_from_label(
+            self._roi.left(), self._roi.top(), self._roi.right(), self._roi.bottom(),
+            self._label.width(), self._label.height(),
+        )
+
+    def _print_export_command(self):
+        """输出可直接用于 roi_export.py 的参数"""
+        cmd = f'python roi_export.py "{self._video_path}" output.mp4 --rotation {self._rotation}'
+        roi = self._normalized_roi()
+        if roi:
+            cmd += " --roi " + ",".join(f"{v:.4f}" for v in roi)
+        print(cmd)
+
+    def _on_cuts_updated(self, cuts):
+        self._cuts = cuts
+        self._control_panel._slider.set_markers(cuts)
+
+    def _jump_cut(self, direction: int):
+        """跳到相邻场景切换点；附近有关键帧时落在关键帧上，seek 无需额外解码"""
+        current = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        if direction > 0:
+            targets = [c for c in self._cuts if c > current + 1]
+            target = targets[0] if targets else None
+        else:
+            targets = [c for c in self._cuts if c < current - 1]
+            target = targets[-1] if targets else None
+        if target is None:
+            return
+        target = snap_to_keyframe(target, self._scene_indexer.keyframes(), self._fps)
+        self._control_panel._slider.setValue(target)
+        self._on_slider_moved(target)
+
+    def _take_snapshot(self):
+        if self._last_frame is not None:
+            frame, pts_ms = self._last_frame
+            self._snapshots.submit(frame, self._rotation, self._normalized_roi(),
+                                   os.path.splitext(os.path.basename(self._video_path))[0], pts_ms)
+
+    def _export_stats(self):
+        self._stats.export_jsonl(time.strftime("pipeline_stats_%Y%m%d_%H%M%S.jsonl"))
+
+    def _toggle_burst(self):
+        print("连拍开始" if self._burst.toggle() else f"连拍结束（丢弃 {self._snapshots.dropped} 帧）")
+
     def _rotate_90(self):
         """顺时针旋转 90°"""
         self._rotation = (self._rotation + 90) % 360
@@ -206,13 +319,49 @@ class VideoPlayer(QtWidgets.QMainWindow):
         """暂停/继续播放"""
         self._paused = not self._paused
         if self._paused:
-            self._timer.stop()
             self._media_player.pause()
             self._control_panel._pause_btn.setText("▶")
         else:
-            self._timer.start(self._interval_ms)
             self._media_player.play()
             self._control_panel._pause_btn.setText("⏸")
+        self._update_decode_state()
+
+    # ---------------- 空闲策略：不可见 / 仅音频时停止解码 ---------------- #
+
+    def _update_decode_state(self):
+        active = not self._paused and not self._audio_only and self._video_visible()
+        if active and not self._timer.isActive():
+            if self._suspended:
+                self._sync_to_audio()
+            self._stats.cancel()  # 暂停期间的间隔不计入丢帧
+            self._timer.start(self._interval_ms)
+        elif not active and self._timer.isActive():
+            self._timer.stop()
+            self._suspended = not self._paused
+
+    def _sync_to_audio(self):
+        self._suspended = False
+        self._cap.set(cv2.CAP_PROP_POS_MSEC, self._media_player.position())
+
+    def _toggle_audio_only(self):
+        self._audio_only = not self._audio_only
+        if self._audio_only:
+            self._label.setText("仅音频")
+        print("仅音频模式" if self._audio_only else "已恢复视频")
+        self._update_decode_state()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QtCore.QEvent.WindowStateChange:
+            self._update_decode_state()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_decode_state()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._update_decode_state()
 
     def _on_slider_moved(self, value):
         """跳转到指定帧并立即刷新画面和音频"""
@@ -229,8 +378,18 @@ class VideoPlayer(QtWidgets.QMainWindow):
     # --------------------- 帧刷新 --------------------- #
 
     def _next_frame(self):
+        if not self._video_visible():
+            # 被完全遮挡（平台支持时）：跳过解码，重新可见后对齐音频
+            self._suspended = True
+            return
+        if self._suspended:
+            self._sync_to_audio()
+        stats = self._stats
+        stats.begin()
         ret, frame = self._cap.read()
+        stats.mark("decode")
         if not ret:
+            stats.cancel()
             # 到达文件末尾时重置视频和音频
             self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             self._media_player.setPosition(0)
@@ -238,27 +397,23 @@ class VideoPlayer(QtWidgets.QMainWindow):
                 self._media_player.play()
             return
 
+        # 保留源帧引用供快照使用（read() 每次返回新数组，无需复制）
+        self._last_frame = (frame, self._cap.get(cv2.CAP_PROP_POS_MSEC))
+        if self._burst.due(self._last_frame[1]):
+            self._take_snapshot()
+
+        stats.mark("snapshot")
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        stats.mark("cvtColor")
 
         # 根据当前旋转角度旋转帧
-        if self._rotation == 90:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_90_CLOCKWISE)
-        elif self._rotation == 180:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_180)
-        elif self._rotation == 270:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        frame_rgb = rotate_frame(frame_rgb, self._rotation)
+        stats.mark("rotate")
 
         if self._roi:
             # 将 QLabel 坐标映射到视频帧坐标
-            h_label, w_label = self._label.height(), self._label.width()
-            y_scale = frame_rgb.shape[0] / h_label
-            x_scale = frame_rgb.shape[1] / w_label
-            x1 = int(self._roi.left() * x_scale)
-            y1 = int(self._roi.top() * y_scale)
-            x2 = int(self._roi.right() * x_scale)
-            y2 = int(self._roi.bottom() * y_scale)
-            frame_rgb = frame_rgb[y1:y2, x1:x2]
-
+            frame_rgb = crop_roi(frame_rgb, self._normalized_roi())
+            stats.mark("roi")
 
         h, w, ch = frame_rgb.shape
         bytes_per_line = ch * w
@@ -271,43 +426,46 @@ class VideoPlayer(QtWidgets.QMainWindow):
             QtGui.QImage.Format_RGB888,
         )
         pix = QtGui.QPixmap.fromImage(qt_img)
-        self._label.setPixmap(
-            pix.scaled(
-                self._label.size(),
-                QtCore.Qt.KeepAspectRatio,
-                QtCore.Qt.SmoothTransformation,
-            )
+        stats.mark("qimage")
+        scaled = pix.scaled(
+            self._label.size(),
+            QtCore.Qt.KeepAspectRatio,
+            QtCore.Qt.SmoothTransformation,
         )
+        stats.mark("scale")
+        self._label.setPixmap(scaled)
+        stats.mark("setPixmap")
+        stats.end()
         # 同步进度条
         current_frame = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES))
         self._control_panel._slider.blockSignals(True)
         self._control_panel._slider.setValue(current_frame)
         self._control_panel._slider.blockSignals(False)
 
-    def _check_mouse_position(self):
-        """检查鼠标位置并控制控制面板的显示"""
-        cursor_pos = QtGui.QCursor.pos()
-        panel_rect = self._control_panel.geometry()
-        video_rect = self._label.geometry()
-        
-        # 将鼠标位置从全局坐标转换为窗口坐标
-        window_pos = self.mapFromGlobal(cursor_pos)
-        
-        # 检查鼠标是否在视频区域内或控制面板区域内
-        if video_rect.contains(window_pos) or panel_rect.contains(window_pos):
-            # 如果鼠标在视频区域或控制面板区域内，显示控制面板
-            if not self._control_panel.isVisible():
-                self._control_panel.show()
-        else:
-            # 如果鼠标不在这些区域内，隐藏控制面板
-            if self._control_panel.isVisible():
-                self._control_panel.hide()
+    def eventFilter(self, obj, event):
+        if event.type() in (QtCore.QEvent.Enter, QtCore.QEvent.Leave):
+            # 从视频区移入面板时 Leave / Enter 相继到达，等两者都处理完再判断
+            QtCore.QTimer.singleShot(0, self._update_panel_visibility)
+        return super().eventFilter(obj, event)
+
+    def _update_panel_visibility(self):
+        """鼠标在视频区域或控制面板上时显示控制面板"""
+        self._control_panel.setVisible(self._label.underMouse() or self._control_panel.underMouse())
+
+    def _video_visible(self) -> bool:
+        """窗口可见、未最小化且未被完全遮挡（平台支持时）"""
+        if not self.isVisible() or self.isMinimized():
+            return False
+        handle = self.windowHandle()
+        return handle is None or handle.isExposed()
 
     # -------------------- 关闭清理 -------------------- #
 
     def closeEvent(self, event: QtGui.QCloseEvent):
         """窗口关闭事件"""
-        self._mouse_check_timer.stop()
+        self._scene_indexer.stop()
+        self._snapshots.shutdown()
+        self._profile.stop()
         if self._cap.isOpened():
             self._cap.release()
             
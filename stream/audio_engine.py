@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按样本计时的音频输出：ffmpeg 在后台解码为 PCM，QAudioOutput 以拉取模式播放
+
+时钟 = 起点 + 已被声卡播放的样本数 / 采样率。
+“已播放”取设备拉走的字节数减去 QAudioOutput 缓冲中尚未播放的字节数，两次回调之间按墙钟插值。
+缓冲耗尽（网络卡顿）或暂停时时钟停止，视频随之等待，不再需要周期性地重新 seek。
+
+依赖系统中的 ffmpeg（与 local/roi_export 相同）。找不到 ffmpeg、音频设备不可用或源中没有
+音轨时退化为墙钟计时，视频照常按时间戳播放，只是没有声音。
+"""
+
+from __future__ import annotations
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from PyQt5 import QtCore, QtMultimedia
+
+from live import LIVE_CAPTURE_OPTIONS
+
+# ============================== 常量配置 ============================== #
+SAMPLE_RATE = 48000
+CHANNELS = 2
+BYTES_PER_MS = SAMPLE_RATE * CHANNELS * 2 / 1000  # s16le
+RING_MS = 2000  # 解码最多领先播放的时长
+OUTPUT_BUFFER_MS = 100  # QAudioOutput 缓冲时长（决定输出延迟）
+READ_BLOCK = 16 * 1024
+FFMPEG_BIN = "ffmpeg"
+
+
+class _PcmRing:
+    """解码线程写、音频设备读的定长缓冲；写满时阻塞解码线程"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self.eof = False
+        self.produced = 0  # 本次解码累计写入字节
+
+    def write(self, data: bytes, stop: threading.Event) -> None:
+        with self._cond:
+            while len(self._buf) >= self.capacity and not stop.is_set():
+                self._cond.wait(0.1)
+            self._buf.extend(data)
+            self.produced += len(data)
+
+    def read(self, n: int) -> bytes:
+        with self._cond:
+            data = bytes(self._buf[:n])
+            del self._buf[:n]
+            self._cond.notify_all()
+            return data
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._buf)
+
+    def finish(self) -> None:
+        with self._cond:
+            self.eof = True
+            self._cond.notify_all()
+
+
+class _PcmDevice(QtCore.QIODevice):
+    """QAudioOutput 拉取模式的数据源；统计设备已拉走的字节数"""
+
+    def __init__(self, ring: _PcmRing, parent=None):
+        super().__init__(parent)
+        self.ring = ring
+        self.pulled = 0
+
+    def readData(self, maxlen: int) -> bytes:
+        # 对齐到整帧，避免左右声道错位
+        data = self.ring.read(maxlen - maxlen % (CHANNELS * 2))
+        self.pulled += len(data)
+        return data
+
+    def writeData(self, data) -> int:
+        return -1
+
+    def bytesAvailable(self) -> int:
+        return len(self.ring) + super().bytesAvailable()
+
+    def isSequential(self) -> bool:
+        return True
+
+
+class AudioEngine(QtCore.QObject):
+    """open() → play() / pause() / seek()；position_ms() 为视频呈现所用的主时钟"""
+
+    finished = QtCore.pyqtSignal()  # 音频播放到结尾
+    error = QtCore.pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        fmt = QtMultimedia.QAudioFormat()
+        fmt.setSampleRate(SAMPLE_RATE)
+        fmt.setChannelCount(CHANNELS)
+        fmt.setSampleSize(16)
+        fmt.setCodec("audio/pcm")
+        fmt.setByteOrder(QtMultimedia.QAudioFormat.LittleEndian)
+        fmt.setSampleType(QtMultimedia.QAudioFormat.SignedInt)
+        self._output = None
+        device_info = QtMultimedia.QAudioDeviceInfo.defaultOutputDevice()
+        if device_info.isNull() or not device_info.isFormatSupported(fmt):
+            print("音频设备不可用或不支持 48 kHz 立体声，改用墙钟计时（无声）", file=sys.stderr)
+        elif shutil.which(FFMPEG_BIN) is None:
+            print("未找到 ffmpeg，改用墙钟计时（无声）", file=sys.stderr)
+        else:
+            self._output = QtMultimedia.QAudioOutput(device_info, fmt, self)
+            self._output.setBufferSize(int(OUTPUT_BUFFER_MS * BYTES_PER_MS))
+            self._output.stateChanged.connect(self._on_state_changed)
+
+        self._url = None
+        self._headers: Dict[str, str] = {}
+        self._live = False
+        self._proc = None
+        self._worker = None
+        self._stop = threading.Event()
+        self._ring = _PcmRing(int(RING_MS * BYTES_PER_MS))
+        self._device = None
+        if self._output is not None:
+            self._device = _PcmDevice(self._ring, self)
+            self._device.open(QtCore.QIODevice.ReadOnly)
+        self._playing = False
+        self._ended = False
+        self._wallclock = self._output is None  # 无声模式：时钟按墙钟推进
+        self._base_ms = 0.0
+        self._wall_anchor = None  # 墙钟模式 / 插值的起点 (monotonic, 毫秒)
+        self._last_ms = 0.0
+
+    # ---------------- 控制 ---------------- #
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None, live: bool = False) -> None:
+        """切换到新的音源，保持当前播放 / 暂停状态；点播从头开始，live 时与视频使用相同的
+        低延迟输入选项，从最新分片开始"""
+        self._url = url
+        self._headers = dict(headers or {})
+        self._live = live
+        self._wallclock = self._output is None
+        self.seek(None)
+
+    def seek(self, ms: Optional[float]) -> None:
+        """从 ms 处重新解码（None 表示源的默认起点）；清空已缓冲的样本"""
+        self._stop_decoder()
+        self._base_ms = float(ms or 0)
+        self._last_ms = self._base_ms
+        self._wall_anchor = (time.monotonic(), self._base_ms) if self._playing else None
+        self._ended = False
+        if self._url is None:
+            return
+        if self._output is not None:
+            self._output.stop()
+            self._device.pulled = 0
+        self._start_decoder(ms)
+        if self._playing and self._output is not None and not self._wallclock:
+            self._output.start(self._device)
+
+    def play(self) -> None:
+        if self._playing:
+            return
+        self._playing = True
+        self._wall_anchor = (time.monotonic(), self._last_ms)
+        if self._wallclock or self._url is None:
+            return
+        if self._output.state() == QtMultimedia.QAudio.SuspendedState:
+            self._output.resume()
+        else:
+            self._output.start(self._device)
+
+    def pause(self) -> None:
+        if not self._playing:
+            return
+        self._last_ms = self.position_ms()
+        self._playing = False
+        self._wall_anchor = None
+        if self._output is not None and not self._wallclock:
+            self._output.suspend()
+
+    def stop(self) -> None:
+        self.pause()
+        self._stop_decoder()
+        if self._output is not None:
+            self._output.stop()
+
+    def close(self) -> None:
+        self.stop()
+        self._url = None
+
+    def set_volume(self, volume: float) -> None:
+        """0.0 – 1.0"""
+        if self._output is not None:
+            self._output.setVolume(volume)
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    # ---------------- 时钟 ---------------- #
+    def position_ms(self) -> float:
+        """已播放到的媒体时间（毫秒），单调不减；暂停与缓冲耗尽时停止"""
+        if not self._playing:
+            return self._last_ms
+        now = time.monotonic()
+        if self._wallclock:
+            t0, ms0 = self._wall_anchor
+            ms = ms0 + (now - t0) * 1000
+        else:
+            queued = self._output.bufferSize() - self._output.bytesFree()
+            played_ms = self._base_ms + max(0, self._device.pulled - queued) / BYTES_PER_MS
+            if self._output.state() != QtMultimedia.QAudio.ActiveState:
+                self._check_drained()
+                ms = played_ms
+                self._wall_anchor = (now, ms)
+            else:
+                # 设备按周期拉取，两次拉取之间按墙钟插值（不超过一个输出缓冲）
+                t0, ms0 = self._wall_anchor
+                if played_ms > ms0:
+                    self._wall_anchor = (now, played_ms)
+                    ms = played_ms
+                else:
+                    ms = ms0 + min((now - t0) * 1000, OUTPUT_BUFFER_MS)
+        self._last_ms = max(self._last_ms, ms)
+        return self._last_ms
+
+    def buffered_ms(self) -> float:
+        """已解码、尚未交给设备的时长"""
+        return len(self._ring) / BYTES_PER_MS
+
+    # ---------------- 解码线程 ---------------- #
+    def _start_decoder(self, ms: Optional[float]) -> None:
+        self._ring = _PcmRing(self._ring.capacity)
+        if self._device is not None:
+            self._device.ring = self._ring
+        if self._output is None:
+            return
+        cmd = [FFMPEG_BIN, "-v", "error", "-nostdin"]
+        if self._headers:
+            cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in self._headers.items())]
+        if self._live:
+            # 与 live.open_live_capture 相同的 FFmpeg 选项，否则 HLS 默认从倒数第三个分片开始
+            for option in LIVE_CAPTURE_OPTIONS.split("|"):
+                key, value = option.split(";")
+                cmd += [f"-{key}", value]
+        elif ms:
+            cmd += ["-ss", f"{ms / 1000:.3f}"]  # 输入端 seek：先跳到关键帧再精确解码丢弃，起点对齐到样本
+        cmd += ["-i", self._url, "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE), "-"]
+        self._stop = threading.Event()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+        self._worker = threading.Thread(target=self._decode, args=(self._proc, self._ring, self._stop),
+                                        name="audio-decode", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _decode(proc: subprocess.Popen, ring: _PcmRing, stop: threading.Event) -> None:
+        try:
+            while not stop.is_set():
+                data = proc.stdout.read1(READ_BLOCK)
+                if not data:
+                    break
+                ring.write(data, stop)
+        except (OSError, ValueError):
+            pass  # _stop_decoder 关闭了管道
+        finally:
+            ring.finish()
+
+    def _stop_decoder(self) -> None:
+        self._stop.set()
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            proc.kill()  # 管道随之到达 EOF，解码线程退出
+            proc.wait()
+        if self._worker is not None:
+            self._worker.join(timeout=1.0)
+            self._worker = None
+        if proc is not None:
+            proc.stdout.close()
+
+    def _on_state_changed(self, state) -> None:
+        if state == QtMultimedia.QAudio.IdleState:
+            self._check_drained()
+
+    def _check_drained(self) -> None:
+        """解码已结束且样本已全部交给设备：源中无音轨时改用墙钟，否则报告播放结束"""
+        if self._ended or self._wallclock or not self._ring.eof or len(self._ring):
+            return  # 仅是缓冲耗尽，数据到达后设备会继续拉取
+        if self._ring.produced == 0:
+            # 源中没有音轨或解码失败：以当前位置改为墙钟计时
+            print("音频解码无输出，改用墙钟计时", file=sys.stderr)
+            self.error.emit("音频解码无输出")
+            self._wallclock = True
+            self._wall_anchor = (time.monotonic(), self._last_ms)
+            return
+        self._ended = True
+        self.finished.emit()
@@ -5,6 +5,9 @@ from threading import Lock, Thread
 import cv2
 import queue
 
+REQUEST_TIMEOUT = (5, 10)  # (连接, 读取) 超时（秒）：读取阻塞的上限，保证 stop() 不会无限等待
+STOP_TIMEOUT = 2.0  # stop() 等待下载线程退出的最长时间
+
 class StreamBuffer:
     def __init__(self, chunk_size: int = 1024*1024):
         self.chunk_size = chunk_size
@@ -31,17 +34,21 @@ class BufferManager:
         self.current_buffer = StreamBuffer()
         self.download_queue = queue.Queue()
         self.is_running = True
+        self._response = None
         
         # 启动下载线程
-        self.download_thread = Thread(target=self._download_worker, daemon=True)
+        self.download_thread = Thread(target=self._download_worker, name="buffer-download", daemon=True)
         self.download_thread.start()
     
     def _download_worker(self):
-        with requests.Session() as session:
-            response = session.get(self.url, headers=self.headers, stream=True)
-            if not response.ok:
+        session = requests.Session()
+        try:
+            response = session.get(self.url, headers=self.headers, stream=True, timeout=REQUEST_TIMEOUT)
+            self._response = response
+            if not self.is_running or not response.ok:
+                response.close()
                 return
-            
+
             for chunk in response.iter_content(chunk_size=64*1024):
                 if not self.is_running:
                     break
@@ -49,6 +56,12 @@ class BufferManager:
                     self.current_buffer.write(chunk)
                     # 通知有新数据可用
                     self.download_queue.put(len(chunk))
+        except (requests.RequestException, OSError):
+            pass  # stop() 关闭了连接或读取超时
+        finally:
+            if self._response is not None:
+                self._response.close()
+            session.close()
     
     def read_frame(self) -> Optional[np.ndarray]:
         while self.is_running:
@@ -68,7 +81,15 @@ class BufferManager:
                 continue
         return None
     
-    def stop(self):
+    def stop(self, timeout: float = STOP_TIMEOUT) -> bool:
+        """停止下载并关闭连接；下载线程在 timeout 内退出时返回 True
+
+        阻塞在读取中的线程最迟在 REQUEST_TIMEOUT 的读取超时后退出（守护线程，不阻止进程结束）。
+        """
         self.is_running = False
+        response = self._response
+        if response is not None:
+            response.close()
         if self.download_thread.is_alive():
-            self.download_thread.join()
+            self.download_thread.join(timeout)
+        return not self.download_thread.is_alive()
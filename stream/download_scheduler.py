@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""音视频统一下载：共享连接池与带宽预算，优先补充更接近断流的一路
+
+视频（cv2 / FFmpeg）与音频（AudioEngine 调用的 ffmpeg，解码为 PCM）不再各自直连 CDN，
+而是都读取本机回环地址上的缓存服务；缓存由若干下载线程按分块 Range 请求填充。
+每次挑选分块时，计算各路“播放位置之后已连续缓存的秒数”，先补最少的一路，
+因此一路卡顿时带宽会让给它，另一路也不会因对方占满带宽而断流。
+
+失败的分块按指数退避重试；连续失败时让正在等待的读取方先报错，但该路并不就此作废，
+退避结束后继续重试，网络恢复或 CDN 短暂出错之后播放可以继续。
+
+码率按消费速度估计（读取位置推进的字节 / 秒），在获得足够样本前使用各类型的默认值。
+每个回环连接是一个独立的读取方，各自记录位置与速度：音视频合一的流中 cv2 与音频解码器
+读同一路，互不打断对方的码率估计，预读窗口与淘汰保护也覆盖每个读取方。
+"""
+
+from __future__ import annotations
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+# ============================== 常量配置 ============================== #
+CHUNK_SIZE = 512 * 1024  # 每次 Range 请求的字节数
+DOWNLOAD_WORKERS = 3  # 下载线程数（不超过 prewarm.POOL_MAXSIZE，连接可全部复用）
+READAHEAD_S = 30.0  # 每路最多领先播放位置的秒数
+MAX_TRACK_CACHE_BYTES = 64 * 1024 * 1024  # 每路缓存上限，超出时淘汰预读窗口之外离读取位置最远的分块
+MAX_READAHEAD_BYTES = MAX_TRACK_CACHE_BYTES // 4  # 每个读取方预读窗口的上限，高码率时不超出缓存上限
+BANDWIDTH_LIMIT = int(os.environ.get("ROI_BANDWIDTH_LIMIT", "0"))  # 总带宽预算（字节/秒），0 为不限
+DEFAULT_BYTE_RATE = {"video": 256 * 1024, "audio": 16 * 1024}  # 尚无消费样本时的码率估计
+RATE_WINDOW_S = 5.0  # 码率估计窗口
+REQUEST_TIMEOUT = (5, 10)  # (连接, 读取) 超时（秒）
+MAX_RETRIES = 3  # 同一分块连续失败达到该次数时，向等待中的读取方报错
+RETRY_BACKOFF_S = 0.5  # 分块失败后首次重试前的等待，之后每次失败翻倍
+RETRY_BACKOFF_MAX_S = 8.0  # 重试等待的上限
+READY_TIMEOUT = 10.0  # 等待各路首个分块（得到文件大小）的时间
+READ_TIMEOUT = 30.0  # 本地读取等待分块到达的时间
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+_UNSATISFIED_RE = re.compile(r"bytes \*/(\d+)")
+
+
+class _Reader:
+    """一个读取方（回环连接）的位置与消费速度"""
+
+    def __init__(self):
+        self.pos = 0
+        self._samples = deque()  # (时刻, 读取位置)
+
+    def consume(self, pos: int) -> None:
+        now = time.monotonic()
+        if pos < self.pos or pos - self.pos > CHUNK_SIZE * 4:
+            self._samples.clear()  # seek：之前的样本不代表码率
+        self.pos = pos
+        self._samples.append((now, pos))
+        while self._samples and now - self._samples[0][0] > RATE_WINDOW_S:
+            self._samples.popleft()
+
+    def byte_rate(self) -> Optional[float]:
+        if len(self._samples) >= 2:
+            (t0, p0), (t1, p1) = self._samples[0], self._samples[-1]
+            if t1 - t0 >= 1.0 and p1 > p0:
+                return (p1 - p0) / (t1 - t0)
+        return None
+
+
+class _Track:
+    """一路媒体的分块缓存与消费进度；所有字段由 DownloadScheduler._cond 保护"""
+
+    def __init__(self, name: str, url: str, headers: Dict[str, str], head: bytes = b""):
+        self.name = name
+        self.url = url
+        self.headers = headers
+        # 预热阶段已取得的文件开头；首个分块只请求其后的部分。至少留一个字节向服务器请求以得到文件大小
+        self.head = head[:CHUNK_SIZE - 1]
+        self.size: Optional[int] = None
+        self.chunks: Dict[int, bytes] = {}
+        self.cached_bytes = 0
+        self.inflight: set = set()
+        self.retries: Dict[int, int] = {}  # 分块 → 连续失败次数
+        self.retry_at: Dict[int, float] = {}  # 分块 → 退避结束的时刻
+        self.error: Optional[str] = None
+        self.readers: Dict[object, _Reader] = {}
+        self.last_pos = 0  # 最近一次读取的位置；没有连接时据此调度
+        self.wanted: Dict[int, int] = {}  # 有读取方正在等待的分块 → 等待数
+        self._rate: Optional[float] = None  # 最近一次有效的码率估计
+
+    @property
+    def n_chunks(self) -> int:
+        return -(-self.size // CHUNK_SIZE) if self.size is not None else 1
+
+    def consume(self, reader: object, pos: int) -> None:
+        self.readers.setdefault(reader, _Reader()).consume(pos)
+        self.last_pos = pos
+
+    def release(self, reader: object) -> None:
+        self.readers.pop(reader, None)
+
+    def positions(self) -> list:
+        return [r.pos for r in self.readers.values()] or [self.last_pos]
+
+    def byte_rate(self) -> float:
+        rates = [rate for rate in (r.byte_rate() for r in self.readers.values()) if rate]
+        if rates:
+            self._rate = max(rates)
+        return self._rate or DEFAULT_BYTE_RATE.get(self.name, DEFAULT_BYTE_RATE["video"])
+
+    def _ahead_of(self, pos: int, rate: float) -> float:
+        idx = pos // CHUNK_SIZE
+        while idx in self.chunks:
+            idx += 1
+        end = min(idx * CHUNK_SIZE, self.size) if self.size is not None else idx * CHUNK_SIZE
+        return max(0, end - pos) / rate
+
+    def ahead_seconds(self) -> float:
+        """最落后的读取方之后已连续缓存的秒数；有读取方在等待时为 0（已经断流）"""
+        if self.wanted:
+            return 0.0
+        rate = self.byte_rate()
+        return min(self._ahead_of(pos, rate) for pos in self.positions())
+
+    def windows(self) -> list:
+        """各读取方的预读窗口 range(首分块, 尾分块)，按断流风险从高到低排列"""
+        rate = self.byte_rate()
+        limit = int(min(READAHEAD_S * rate, MAX_READAHEAD_BYTES)) // CHUNK_SIZE + 1
+        positions = sorted(self.positions(), key=lambda pos: self._ahead_of(pos, rate))
+        return [range(pos // CHUNK_SIZE, min(self.n_chunks, pos // CHUNK_SIZE + limit)) for pos in positions]
+
+    def next_missing(self) -> Optional[int]:
+        now = time.monotonic()
+
+        def ready(idx: int) -> bool:
+            return idx not in self.chunks and idx not in self.inflight and self.retry_at.get(idx, 0.0) <= now
+
+        for idx in self.wanted:
+            if ready(idx):
+                return idx
+        for window in self.windows():
+            for idx in window:
+                if ready(idx):
+                    return idx
+        return None
+
+    def fail(self, idx: int, error: str) -> None:
+        """分块下载失败：安排退避重试；连续失败 MAX_RETRIES 次时标记出错（成功下载任一分块后清除）"""
+        tries = self.retries.get(idx, 0) + 1
+        self.retries[idx] = tries
+        self.retry_at[idx] = time.monotonic() + min(RETRY_BACKOFF_S * 2 ** (tries - 1), RETRY_BACKOFF_MAX_S)
+        if tries % MAX_RETRIES == 0:
+            self.error = error
+            print(f"{self.name} 下载失败（分块 {idx} 已连续失败 {tries} 次，稍后重试）: {error}", file=sys.stderr)
+
+    def store(self, idx: int, data: bytes) -> None:
+        self.chunks[idx] = data
+        self.cached_bytes += len(data)
+        self.retries.pop(idx, None)
+        self.retry_at.pop(idx, None)
+        self.error = None
+        if self.cached_bytes <= MAX_TRACK_CACHE_BYTES:
+            return
+        # 预读窗口内与正在等待的分块不淘汰，否则刚下载的分块会被立即丢弃并反复重下
+        protected = set(self.wanted).union(*self.windows())
+        positions = [pos // CHUNK_SIZE for pos in self.positions()]
+        candidates = sorted((i for i in self.chunks if i not in protected),
+                            key=lambda i: min(abs(i - p) for p in positions))
+        while self.cached_bytes > MAX_TRACK_CACHE_BYTES and candidates:
+            self.cached_bytes -= len(self.chunks.pop(candidates.pop()))
+
+
+class _TokenBucket:
+    """总带宽预算；rate 为 0 时不限速"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._tokens = float(rate)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int, stop: threading.Event) -> None:
+        if self.rate <= 0:
+            return
+        while not stop.is_set():
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= n or self._tokens >= self.rate:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            stop.wait(min(wait, 0.2))
+
+
+class DownloadScheduler:
+    """按断流风险调度各路分块下载，并在回环地址上以 HTTP（支持 Range）提供缓存内容
+
+    用法：
+        scheduler = DownloadScheduler({"video": (url, headers), "audio": (url, headers)}, session,
+                                      heads={"video": PREWARMER.take_prefetched(url)})
+        if scheduler.wait_ready():
+            cv2.VideoCapture(scheduler.url_for("video"))
+    """
+
+    def __init__(self, tracks: Dict[str, Tuple[str, Dict[str, str]]], session: Optional[requests.Session] = None,
+                 workers: int = DOWNLOAD_WORKERS, bandwidth_limit: int = BANDWIDTH_LIMIT,
+                 heads: Optional[Dict[str, bytes]] = None):
+        heads = heads or {}
+        self._tracks = {name: _Track(name, url, dict(headers or {}), heads.get(name) or b"")
+                        for name, (url, headers) in tracks.items()}
+        self._session = session or requests.Session()
+        self._own_session = session is None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._bucket = _TokenBucket(bandwidth_limit)
+        self._responses = set()
+        self._tee: Optional[Callable[..., None]] = None
+
+        self._server = _CacheServer(self)
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="download-cache-server",
+                                               daemon=True)
+        self._server_thread.start()
+        self._workers = [threading.Thread(target=self._worker, name=f"download-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._workers:
+            t.start()
+
+    # ---------------- 对外接口 ---------------- #
+    def url_for(self, name: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+    @property
+    def tracks(self) -> list:
+        return list(self._tracks)
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        """各路都已得到文件大小时返回 True；任一路出错、超时或已 close() 返回 False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                tracks = self._tracks.values()
+                if self._stop.is_set() or any(t.error for t in tracks):
+                    return False
+                if all(t.size is not None for t in tracks):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+
+    def errors(self) -> Dict[str, str]:
+        with self._cond:
+            return {name: t.error for name, t in self._tracks.items() if t.error}
+
+    def buffered_seconds(self) -> Dict[str, float]:
+        with self._cond:
+            return {name: t.ahead_seconds() for name, t in self._tracks.items()}
+
+    def set_tee(self, tee: Optional[Callable[..., None]]) -> None:
+        """旁路接收每个下载完成的分块 tee(路名, 偏移, 数据)，录制用
+
+        设置时在后台线程补送已缓存的分块，以 tee(..., block=True) 调用，接收方应等待而不是丢弃；
+        已被淘汰的文件头（首个分块）先重新下载再补送，封装时不会缺少容器头。
+        """
+        self._tee = tee
+        if tee is None:
+            return
+        with self._cond:
+            cached = [(t.name, idx, data) for t in self._tracks.values() for idx, data in sorted(t.chunks.items())]
+            missing_head = [t for t in self._tracks.values() if 0 not in t.chunks]
+
+        def _replay():
+            for track in missing_head:
+                for _ in range(MAX_RETRIES):
+                    data, _size, error = self._fetch(track, 0)
+                    if data is not None:
+                        tee(track.name, 0, data, block=True)
+                        break
+                    if error is None:
+                        return  # 已 close()
+                else:
+                    print(f"{track.name} 文件头重新下载失败，录制可能无法封装: {error}", file=sys.stderr)
+            for name, idx, data in cached:
+                tee(name, idx * CHUNK_SIZE, data, block=True)
+
+        threading.Thread(target=_replay, name="download-tee-replay", daemon=True).start()
+
+    def size(self, name: str) -> Optional[int]:
+        with self._cond:
+            return self._tracks[name].size
+
+    def read(self, name: str, offset: int, max_bytes: int, timeout: float = READ_TIMEOUT,
+             reader: object = None) -> bytes:
+        """读取 offset 处最多 max_bytes 字节（不跨分块）；文件末尾返回 b""，超时或下载失败抛出 IOError
+
+        reader 标识读取方（同一读取方顺序读取），用于分别估计位置与码率；结束后调用 release_reader()
+        """
+        track = self._tracks[name]
+        idx = offset // CHUNK_SIZE
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            track.consume(reader, offset)
+            self._cond.notify_all()  # 播放位置变化，可能改变调度顺序
+            track.wanted[idx] = track.wanted.get(idx, 0) + 1
+            try:
+                while idx not in track.chunks:
+                    if track.size is not None and offset >= track.size:
+                        return b""
+                    if track.error:
+                        raise IOError(track.error)
+                    remaining = deadline - time.monotonic()
+                    if self._stop.is_set() or remaining <= 0:
+                        raise IOError(f"{name} 分块 {idx} 等待超时")
+                    self._cond.wait(min(remaining, 0.5))
+                data = track.chunks[idx]
+            finally:
+                track.wanted[idx] -= 1
+                if not track.wanted[idx]:
+                    del track.wanted[idx]
+        start = offset - idx * CHUNK_SIZE
+        return data[start:start + max_bytes]
+
+    def release_reader(self, reader: object) -> None:
+        """读取方断开：不再为其位置预读或保留分块"""
+        with self._cond:
+            for track in self._tracks.values():
+                track.release(reader)
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+            responses = list(self._responses)
+        for response in responses:
+            response.close()  # 打断阻塞中的读取
+        self._server.shutdown()
+        self._server.server_close()
+        for t in self._workers:
+            t.join(timeout=1.0)
+        if self._own_session:
+            self._session.close()
+
+    # ---------------- 调度 ---------------- #
+    def _pick(self) -> Optional[Tuple[_Track, int]]:
+        """断流风险最高（连续缓存秒数最少）的一路的下一个缺失分块"""
+        best = None
+        for track in self._tracks.values():
+            if track.size is None and track.inflight:
+                continue  # 首个分块尚未返回大小
+            idx = track.next_missing()
+            if idx is None:
+                continue
+            ahead = track.ahead_seconds()
+            if best is None or ahead < best[0]:
+                best = (ahead, track, idx)
+        return best[1:] if best else None
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                job = self._pick()
+                if job is None:
+                    self._cond.wait(0.5)
+                    continue
+                track, idx = job
+                track.inflight.add(idx)
+            data, size, error = self._fetch(track, idx)
+            with self._cond:
+                track.inflight.discard(idx)
+                if data is not None:
+                    if track.size is None:
+                        track.size = size
+                    track.store(idx, data)
+                elif error:
+                    track.fail(idx, error)
+                self._cond.notify_all()
+            tee = self._tee
+            if data is not None and tee is not None:
+                tee(track.name, idx * CHUNK_SIZE, data)
+
+    def _fetch(self, track: _Track, idx: int):
+        """→ (数据, 文件大小, 错误)"""
+        start = idx * CHUNK_SIZE
+        head = track.head if idx == 0 else b""
+        headers = dict(track.headers)
+        headers["Range"] = f"bytes={start + len(head)}-{start + CHUNK_SIZE - 1}"
+        try:
+            response = self._session.get(track.url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+            with self._cond:
+                self._responses.add(response)
+            try:
+                if head and response.status_code == 416:
+                    # 预取的头部已是整个文件
+                    total = _UNSATISFIED_RE.match(response.headers.get("Content-Range", ""))
+                    if total is not None and int(total.group(1)) <= len(head):
+                        return head[:int(total.group(1))], int(total.group(1)), None
+                match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+                if response.status_code != 206 or match is None:
+                    return None, None, f"服务器不支持 Range（HTTP {response.status_code}）"
+                parts = []
+                for piece in response.iter_content(chunk_size=64 * 1024):
+                    if self._stop.is_set():
+                        return None, None, None
+                    self._bucket.consume(len(piece), self._stop)
+                    parts.append(piece)
+                data = b"".join(parts)
+                expected = int(match.group(2)) - int(match.group(1)) + 1
+                if len(data) != expected:
+                    # 连接中途断开时 urllib3 不一定抛出异常，残缺分块不能进入缓存
+                    return None, None, f"分块不完整（{len(data)}/{expected} 字节）"
+                return head + data, int(match.group(3)), None
+            finally:
+                with self._cond:
+                    self._responses.discard(response)
+                response.close()
+        except (requests.RequestException, OSError) as exc:
+            return None, None, None if self._stop.is_set() else str(exc)
+
+
+# ============================== 回环缓存服务 ============================== #
+class _CacheHandler(BaseHTTPRequestHandler):
+    server: "_CacheServer"
+    protocol_version = "HTTP/1.1"
+
+    def send_response(self, code: int, message: str | None = None) -> None:
+        super().send_response(code, message)
+        # 客户端要求关闭时须明确回应，否则 FFmpeg 会按 HTTP/1.1 尝试复用已关闭的连接
+        if (self.headers.get("Connection") or "").lower() == "close":
+            self.send_header("Connection", "close")
+
+    def do_HEAD(self) -> None:
+        self._serve(head=True)
+
+    def do_GET(self) -> None:
+        self._serve(head=False)
+
+    def _serve(self, head: bool) -> None:
+        scheduler = self.server.scheduler
+        name = self.path.strip("/").split("?")[0]
+        if name not in scheduler._tracks:
+            self._send_empty(404)
+            return
+        size = scheduler.size(name)
+        if size is None:
+            self._send_empty(503)
+            return
+
+        start, end, status = 0, size - 1, 200
+        match = _RANGE_RE.match(self.headers.get("Range") or "")
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(0, size - int(match.group(2)))  # 后缀范围：最后 n 字节
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if head:
+            return
+        pos = start
+        try:
+            while pos <= end:
+                data = scheduler.read(name, pos, end - pos + 1, reader=self)
+                if not data:
+                    break
+                self.wfile.write(data)
+                pos += len(data)
+        except (IOError, ConnectionError):
+            self.close_connection = True  # 下载失败或客户端断开（seek 时常见）
+
+    def finish(self) -> None:
+        try:
+            super().finish()
+        finally:
+            self.server.scheduler.release_reader(self)
+
+    def _send_empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class _CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, scheduler: DownloadScheduler):
+        super().__init__(("127.0.0.1", 0), _CacheHandler)
+        self.scheduler = scheduler
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""常驻提取服务：保持 yt-dlp 提取器与 Cookie 缓存常驻，经本地 HTTP 返回 StreamInfo JSON
+
+启动：python extract_daemon.py [--host 127.0.0.1] [--port 8765]
+请求：POST /extract  {"url": "...", "proxy": "..."}  →  {"ok": true, "stream": {...}}
+
+提取会用到本机浏览器的 Cookie，因此服务只监听回环地址，且每个请求须满足：
+Host 为回环地址（防 DNS 重绑定）、Content-Type 为 application/json（浏览器跨站表单无法伪造）、
+携带启动时写入 TOKEN_PATH 的令牌（文件权限 0600，同一用户的客户端读取后放在 X-Extract-Token 中）。
+"""
+
+from __future__ import annotations
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ============================== 常量配置 ============================== #
+DAEMON_HOST = "127.0.0.1"  # 仅监听本机
+DAEMON_PORT = int(os.environ.get("ROI_EXTRACT_PORT", "8765"))
+# 每次启动生成的访问令牌，仅当前用户可读
+TOKEN_PATH = os.environ.get("ROI_EXTRACT_TOKEN",
+                            os.path.join(os.path.expanduser("~"), ".cache", "roi-player", "extract-token"))
+TOKEN_HEADER = "X-Extract-Token"
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}  # 允许的监听地址与 Host 请求头
+CLIENT_CONNECT_TIMEOUT = 0.3  # 探测服务是否在线的超时（秒）
+CLIENT_EXTRACT_TIMEOUT = 120.0
+
+
+def _is_loopback(host: str) -> bool:
+    if host in LOOPBACK_HOSTS:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _read_token() -> str | None:
+    try:
+        with open(TOKEN_PATH, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_token(token: str) -> None:
+    """以 0600 权限写入令牌文件（先写临时文件再替换，已有文件的宽松权限不会沿用）"""
+    os.makedirs(os.path.dirname(TOKEN_PATH), mode=0o700, exist_ok=True)
+    tmp = f"{TOKEN_PATH}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.replace(tmp, TOKEN_PATH)
+
+
+# ============================== 服务端 ============================== #
+class _ExtractHandler(BaseHTTPRequestHandler):
+    server: "ExtractDaemon"
+
+    def _host_allowed(self) -> bool:
+        host = (self.headers.get("Host") or "").strip()
+        if host.startswith("["):
+            host = host[1:].split("]", 1)[0]  # [::1]:8765
+        else:
+            host = host.rsplit(":", 1)[0]
+        return _is_loopback(host)
+
+    def do_GET(self) -> None:
+        if not self._host_allowed():
+            self._send_json(403, {"ok": False, "error": "forbidden"})
+        elif self.path == "/health":
+            self._send_json(200, {"ok": True})
+        else:
+            self._send_json(404, {"ok": False, "error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/extract":
+            self._send_json(404, {"ok": False, "error": "not found"})
+            return
+        if not self._host_allowed():
+            self._send_json(403, {"ok": False, "error": "forbidden"})
+            return
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER) or "", self.server.token):
+            self._send_json(401, {"ok": False, "error": "令牌无效"})
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json(415, {"ok": False, "error": "需要 application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+            url = req["url"]
+        except Exception as exc:
+            self._send_json(400, {"ok": False, "error": f"请求格式错误：{exc}"})
+            return
+        try:
+            stream = self.server.extractor.extract(url, req.get("proxy") or None)
+        except Exception as exc:
+            self._send_json(502, {"ok": False, "error": str(exc)})
+            return
+        self._send_json(200, {"ok": True, "stream": stream.to_dict()})
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args) -> None:
+        print(f"[extract-daemon] {fmt % args}", file=sys.stderr)
+
+
+class ExtractDaemon(ThreadingHTTPServer):
+    """多线程 HTTP 服务，所有请求共享同一个 StreamExtractor（含站点偏好与 Cookie 缓存）"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT) -> None:
+        from extractor import StreamExtractor
+        if not _is_loopback(host):
+            raise ValueError(f"提取服务只能监听回环地址：{host}")
+        super().__init__((host, port), _ExtractHandler)
+        self.extractor = StreamExtractor()
+        self.token = secrets.token_urlsafe(32)
+        _write_token(self.token)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if _read_token() == self.token:
+            try:
+                os.remove(TOKEN_PATH)
+            except OSError:
+                pass
+
+    def warm_up(self) -> None:
+        """预先加载 yt-dlp 提取器模块，首个请求无需再付冷启动代价"""
+        from yt_dlp import YoutubeDL
+        with YoutubeDL({"quiet": True}) as ydl:
+            ydl.get_info_extractor("Generic")
+
+
+# ============================== 客户端 ============================== #
+def request_stream(page_url: str, proxy: str | None = None,
+                   host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                   timeout: float = CLIENT_EXTRACT_TIMEOUT):
+    """向常驻服务请求提取；服务未运行、令牌不可用或响应无法解析时返回 None，由调用方退回本进程提取"""
+    from extractor import StreamInfo
+
+    token = _read_token()
+    if token is None:
+        return None
+    base = f"http://{host}:{port}"
+    try:
+        urllib.request.urlopen(f"{base}/health", timeout=CLIENT_CONNECT_TIMEOUT).close()
+    except (urllib.error.URLError, OSError):
+        return None
+
+    body = json.dumps({"url": page_url, "proxy": proxy}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{base}/extract", data=body, headers={"Content-Type": "application/json", TOKEN_HEADER: token},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            payload = json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        if exc.code in (401, 403):
+            return None  # 令牌过期（服务已重启）或端口被其他程序占用
+        try:
+            payload = json.loads(exc.read() or b"{}")
+        except ValueError:
+            return None
+    except ValueError:
+        return None
+    if not payload.get("ok"):
+        raise RuntimeError(payload.get("error") or "提取服务返回错误")
+    return StreamInfo.from_dict(payload["stream"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="常驻视频流提取服务")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    args = parser.parse_args()
+    if not _is_loopback(args.host):
+        parser.error(f"--host 只能是回环地址（如 127.0.0.1），收到 {args.host}")
+
+    server = ExtractDaemon(args.host, args.port)
+    threading.Thread(target=server.warm_up, daemon=True).start()
+    print(f"提取服务已启动：http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""与界面无关的流提取逻辑：yt-dlp 调用、浏览器 Cookie 缓存与格式选择"""
+
+from __future__ import annotations
+import copy
+import glob
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field, asdict
+from typing import Callable
+
+# ============================== 常量配置 ============================== #
+BROWSER_CANDIDATES: list[str | None] = ["chrome", "edge", "safari", "firefox", None]
+EXTRACT_MAX_WORKERS = 3  # 并发提取的最大线程数
+YDL_FORMAT_FILTER = "(bv*+ba/b)[vcodec!*=av01][vcodec!*=hev1][vcodec!*=hvc]"  # 略去 AV1 / HEVC
+PROXY_DEFAULT_SCHEME = "socks5://"
+COOKIE_CACHE_PERSIST = False  # 是否将解密后的 Cookie 落盘（明文，默认关闭）
+COOKIE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "roi-player", "cookies")
+COOKIE_CACHE_TTL_S = 600  # 找不到浏览器数据库（无法按 mtime 判断）时缓存的有效期
+
+# ============================== 数据结构 ============================== #
+@dataclass
+class StreamInfo:
+    video_url: str
+    audio_url: str | None = None 
+    video_headers: dict[str, str] = field(default_factory=dict)
+    audio_headers: dict[str, str] | None = None
+    is_live: bool = False  # 直播：播放器按目标延迟跟随直播边缘
+
+    def get_playback_info(self) -> tuple[str, str | None, dict]:
+        """返回播放器需要的信息"""
+        return (
+            self.video_url,
+            self.audio_url,
+            {
+                "video": self.video_headers,
+                "audio": self.audio_headers if self.audio_headers else {}
+            }
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StreamInfo":
+        return cls(
+            video_url=data["video_url"],
+            audio_url=data.get("audio_url"),
+            video_headers=data.get("video_headers") or {},
+            audio_headers=data.get("audio_headers"),
+            is_live=bool(data.get("is_live")),
+        )
+
+# ============================== Cookie 缓存 ============================== #
+def _cookie_db_path(browser: str) -> str | None:
+    """返回浏览器 Cookie 数据库路径（用于检测 mtime 变化），找不到时返回 None"""
+    home = os.path.expanduser("~")
+    sys_platform = platform.system()
+    if sys_platform == "Windows":
+        local = os.environ.get("LOCALAPPDATA", "")
+        roaming = os.environ.get("APPDATA", "")
+        patterns = {
+            "chrome": [os.path.join(local, "Google", "Chrome", "User Data", "Default", "Network", "Cookies"),
+                       os.path.join(local, "Google", "Chrome", "User Data", "Default", "Cookies")],
+            "edge": [os.path.join(local, "Microsoft", "Edge", "User Data", "Default", "Network", "Cookies"),
+                     os.path.join(local, "Microsoft", "Edge", "User Data", "Default", "Cookies")],
+            "firefox": [os.path.join(roaming, "Mozilla", "Firefox", "Profiles", "*", "cookies.sqlite")],
+        }
+    elif sys_platform == "Darwin":
+        support = os.path.join(home, "Library", "Application Support")
+        patterns = {
+            "chrome": [os.path.join(support, "Google", "Chrome", "Default", "Cookies")],
+            "edge": [os.path.join(support, "Microsoft Edge", "Default", "Cookies")],
+            "firefox": [os.path.join(support, "Firefox", "Profiles", "*", "cookies.sqlite")],
+            "safari": [os.path.join(home, "Library", "Containers", "com.apple.Safari", "Data", "Library",
+                                    "Cookies", "Cookies.binarycookies"),
+                       os.path.join(home, "Library", "Cookies", "Cookies.binarycookies")],
+        }
+    else:
+        config = os.environ.get("XDG_CONFIG_HOME", os.path.join(home, ".config"))
+        patterns = {
+            "chrome": [os.path.join(config, "google-chrome", "Default", "Cookies")],
+            "edge": [os.path.join(config, "microsoft-edge", "Default", "Cookies")],
+            "firefox": [os.path.join(home, ".mozilla", "firefox", "*", "cookies.sqlite")],
+        }
+    found = [p for pattern in patterns.get(browser, []) for p in glob.glob(pattern)]
+    # 多个 Firefox profile 时取最近使用的那个
+    return max(found, key=os.path.getmtime) if found else None
+
+
+class CookieJarCache:
+    """按浏览器缓存解密后的 Cookie Jar，浏览器数据库 mtime 变化时失效；
+    找不到数据库路径（Linux 上的 Chromium / Brave、非 Default 配置、非 macOS 的 Safari 等）时按 TTL 失效"""
+
+    def __init__(self, persist: bool = COOKIE_CACHE_PERSIST, cache_dir: str = COOKIE_CACHE_DIR) -> None:
+        self._persist = persist
+        self._cache_dir = cache_dir
+        self._jars: dict[str, tuple[float | None, float, object]] = {}  # (mtime, 解密时刻, Jar)
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, browser: str):
+        """返回缓存的 YoutubeDLCookieJar（只读共享，使用方应复制其中的 Cookie）；首次或失效后才重新解密"""
+        with self._guard:
+            lock = self._locks.setdefault(browser, threading.Lock())
+        with lock:  # 同一浏览器只解密一次，并发请求等待结果
+            db = _cookie_db_path(browser)
+            mtime = os.path.getmtime(db) if db else None
+            cached = self._jars.get(browser)
+            if cached:
+                if mtime is not None and cached[0] == mtime:
+                    return cached[2]
+                if mtime is None and cached[0] is None and time.monotonic() - cached[1] < COOKIE_CACHE_TTL_S:
+                    return cached[2]
+
+            jar = self._load_persisted(browser, mtime)
+            if jar is None:
+                from yt_dlp.cookies import extract_cookies_from_browser
+                jar = extract_cookies_from_browser(browser)
+                self._save_persisted(browser, mtime, jar)
+            self._jars[browser] = (mtime, time.monotonic(), jar)
+            return jar
+
+    def invalidate(self, browser: str | None = None) -> None:
+        with self._guard:
+            if browser is None:
+                self._jars.clear()
+            else:
+                self._jars.pop(browser, None)
+
+    # ---------------- 可选落盘 ---------------- #
+    def _persist_path(self, browser: str, mtime: float | None) -> str | None:
+        if not self._persist or mtime is None:
+            return None
+        return os.path.join(self._cache_dir, f"{browser}-{int(mtime)}.txt")
+
+    def _load_persisted(self, browser: str, mtime: float | None):
+        path = self._persist_path(browser, mtime)
+        if not path or not os.path.exists(path):
+            return None
+        from yt_dlp.cookies import YoutubeDLCookieJar
+        jar = YoutubeDLCookieJar(path)
+        try:
+            jar.load(ignore_discard=True, ignore_expires=True)
+        except Exception:
+            return None
+        return jar
+
+    def _save_persisted(self, browser: str, mtime: float | None, jar) -> None:
+        path = self._persist_path(browser, mtime)
+        if not path:
+            return
+        try:
+            os.makedirs(self._cache_dir, mode=0o700, exist_ok=True)
+            # 清理该浏览器的旧快照
+            for old in glob.glob(os.path.join(self._cache_dir, f"{browser}-*.txt")):
+                os.remove(old)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.close(fd)
+            jar.save(path, ignore_discard=True, ignore_expires=True)
+        except Exception as exc:
+            print(f"Cookie 缓存写入失败：{exc}", file=sys.stderr)
+
+
+COOKIE_CACHE = CookieJarCache()
+
+# ============================== 输入校验 ============================== #
+def valid_page_url(text: str) -> bool:
+    if not text:
+        return False
+    try:
+        parsed = urlparse.urlparse(text)
+        return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
+    except Exception:
+        return False
+
+
+def normalize_proxy(proxy: str) -> str | None:
+    """补全代理协议头；空字符串视为不使用代理"""
+    proxy = proxy.strip()
+    if proxy and "://" not in proxy:
+        proxy = PROXY_DEFAULT_SCHEME + proxy
+    return proxy or None
+
+
+# ============================== 提取器 ============================== #
+class StreamExtractor:
+    """页面 URL → StreamInfo；可被 GUI、守护进程等多处复用"""
+
+    def __init__(self, log: Callable[[str], None] | None = None, prewarm: bool = False) -> None:
+        self._log = log or (lambda msg: print(msg, file=sys.stderr))
+        # 为 True 时在选定格式后立即预热媒体主机连接（仅对在本进程内下载的播放路径有意义）
+        self._prewarm = prewarm
+        # 各站点上次成功的浏览器
+        self._preferred_browser: dict[str, str | None] = {}
+        self._preferred_lock = threading.Lock()
+
+    def extract(self, page_url: str, proxy: str | None) -> StreamInfo:
+        """并发尝试各浏览器 Cookie，首个成功的结果胜出，其余取消"""
+        site = urlparse.urlparse(page_url).netloc.lower()
+        candidates = self._ordered_candidates(site)
+        cancel = threading.Event()
+
+        def attempt(browser: str | None) -> tuple[str | None, StreamInfo]:
+            if cancel.is_set():
+                raise RuntimeError("已取消")
+            self._log(f"尝试 {browser or '无 Cookie'} …")
+            info = self._ydl_extract(page_url, proxy, browser)
+            return browser, self.select_best(info)
+
+        last_err: Exception | None = None
+        pool = ThreadPoolExecutor(max_workers=EXTRACT_MAX_WORKERS, thread_name_prefix="extract")
+        try:
+            pending = {pool.submit(attempt, b) for b in candidates}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        browser, stream = fut.result()
+                    except Exception as e:
+                        last_err = e
+                        self._log(f"提取失败：{e}")
+                        continue
+                    # 首个成功：取消尚未开始的任务，已在运行的任务结果将被丢弃
+                    cancel.set()
+                    if self._prewarm:
+                        from prewarm import PREWARMER
+                        PREWARMER.warm_stream(stream, proxy)
+                    for other in pending:
+                        other.cancel()
+                    with self._preferred_lock:
+                        self._preferred_browser[site] = browser
+                    self._log(f"使用 {browser or '无 Cookie'} 提取成功")
+                    return stream
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise RuntimeError(f"全部提取方式失败：{last_err}") from last_err
+
+    def _ordered_candidates(self, site: str) -> list[str | None]:
+        """将该站点上次成功的浏览器排在最前"""
+        with self._preferred_lock:
+            if site not in self._preferred_browser:
+                return list(BROWSER_CANDIDATES)
+            preferred = self._preferred_browser[site]
+        return [preferred] + [b for b in BROWSER_CANDIDATES if b != preferred]
+
+    # ---------------- yt-dlp ---------------- #
+    def _ydl_extract(self, url: str, proxy: str | None, browser: str | None):
+        ydl_opts = dict(
+            format=YDL_FORMAT_FILTER,
+            forceipv4=True,
+            quiet=True,
+            retries=5,
+            fragment_retries=5,
+            proxy=proxy or None,
+        )
+        from yt_dlp import YoutubeDL  # 延迟导入：yt-dlp 加载耗时较长
+
+        jar = COOKIE_CACHE.get(browser) if browser else None
+        with YoutubeDL(ydl_opts) as ydl:
+            if jar is not None:
+                # 复用缓存的 Cookie，跳过每次打开/复制/解密浏览器数据库；
+                # 复制到实例自己的 Jar 中，并发的提取各自修改，不影响缓存
+                for cookie in jar:
+                    ydl.cookiejar.set_cookie(copy.copy(cookie))
+            return ydl.extract_info(url, download=False)
+
+    @staticmethod
+    def select_best(info) -> StreamInfo:
+        fmts = info.get("formats", [])
+        v = [f for f in fmts if f.get("vcodec") != "none" and f.get("acodec") == "none"]
+        a = [f for f in fmts if f.get("acodec") != "none" and f.get("vcodec") == "none"]
+        if v:
+            best_v = max(v, key=lambda f: f.get("height") or 0)
+            best_a = max(a, key=lambda f: f.get("abr") or 0) if a else None
+            return StreamInfo(
+                video_url=best_v["url"],
+                audio_url=best_a["url"] if best_a else None,
+                video_headers=best_v.get("http_headers", {}),
+                audio_headers=best_a.get("http_headers", {}) if best_a else None,
+                is_live=bool(info.get("is_live")),
+            )
+
+        # Fall-back：若站点只给单流
+        return StreamInfo(
+            video_url=info["url"],
+            video_headers=info.get("http_headers", {}),
+            is_live=bool(info.get("is_live")),
+        )
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""共享内存帧发布：播放器把裁剪、旋转后的 RGB 帧写入 multiprocessing.shared_memory 环形缓冲区
+
+外部分析进程（OCR、检测等）通过 SharedFrameReader 读取零拷贝 numpy 视图，无需再次解码。
+写入端从不等待读取端；读取过慢时只会跳过帧，不会阻塞播放。
+
+内存布局：
+    全局头  magic(4s) version(I) slots(I) slot_bytes(Q) latest_seq(Q)
+    每个槽  seq_begin(Q) seq_end(Q) pts_ms(d) height(I) width(I) channels(I) dtype(8s) | 数据
+读取时用 seq_begin / seq_end 判断该槽是否在读取过程中被覆盖（seqlock）。
+"""
+
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# ============================== 常量配置 ============================== #
+DEFAULT_SLOTS = 8
+DEFAULT_MAX_FRAME_BYTES = 3840 * 2160 * 3  # 4K RGB
+
+_MAGIC = b"ROIF"
+_VERSION = 1
+_GLOBAL = struct.Struct("<4sIIQQ")
+_SLOT = struct.Struct("<QQdIII8s")
+_LATEST_OFFSET = 4 + 4 + 4 + 8
+_HEADER_ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + _HEADER_ALIGN - 1) // _HEADER_ALIGN * _HEADER_ALIGN
+
+
+_GLOBAL_SIZE = _align(_GLOBAL.size)
+_SLOT_HEADER_SIZE = _align(_SLOT.size)
+
+
+class SharedFrameRing:
+    """写入端：由播放器创建并持有，关闭时释放共享内存"""
+
+    def __init__(self, name: str, slots: int = DEFAULT_SLOTS,
+                 max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES):
+        self.slots = slots
+        self.slot_bytes = max_frame_bytes
+        self._stride = _SLOT_HEADER_SIZE + _align(max_frame_bytes)
+        self._shm = shared_memory.SharedMemory(
+            name=name, create=True, size=_GLOBAL_SIZE + slots * self._stride
+        )
+        _GLOBAL.pack_into(self._shm.buf, 0, _MAGIC, _VERSION, slots, max_frame_bytes, 0)
+        self._seq = 0
+        self._warned_oversize = False
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def publish(self, frame: np.ndarray, pts_ms: float) -> bool:
+        """写入一帧（接受非连续的裁剪视图）；帧超过槽容量时跳过并返回 False"""
+        if frame.nbytes > self.slot_bytes:
+            if not self._warned_oversize:
+                print(f"帧大小 {frame.nbytes} 超过共享内存槽容量 {self.slot_bytes}，跳过发布", file=sys.stderr)
+                self._warned_oversize = True
+            return False
+
+        self._seq += 1
+        seq = self._seq
+        base = _GLOBAL_SIZE + (seq % self.slots) * self._stride
+        h, w = frame.shape[:2]
+        ch = frame.shape[2] if frame.ndim == 3 else 1
+        buf = self._shm.buf
+        # 先标记开始写入，再写数据，最后写结束序号
+        struct.pack_into("<Q", buf, base, seq)
+        dst = np.ndarray(frame.shape, dtype=frame.dtype, buffer=buf, offset=base + _SLOT_HEADER_SIZE)
+        np.copyto(dst, frame)
+        _SLOT.pack_into(buf, base, seq, seq, float(pts_ms), h, w, ch, frame.dtype.str.encode())
+        struct.pack_into("<Q", buf, _LATEST_OFFSET, seq)
+        return True
+
+    def close(self) -> None:
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameReader:
+    """读取端：在分析进程中使用"""
+
+    def __init__(self, name: str):
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._untrack()
+        magic, version, self.slots, self.slot_bytes, _ = _GLOBAL.unpack_from(self._shm.buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise RuntimeError(f"共享内存 {name} 不是帧发布缓冲区")
+        self._stride = _SLOT_HEADER_SIZE + _align(self.slot_bytes)
+
+    def _untrack(self) -> None:
+        """只读挂载的进程退出时不应删除共享内存（Python < 3.13 的 resource_tracker 会误删）"""
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        except Exception:
+            pass
+
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self._shm.buf, _LATEST_OFFSET)[0]
+
+    def read(self, seq: Optional[int] = None, copy: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """读取序号 seq（默认最新）的帧，返回 (seq, pts_ms, frame)
+
+        copy=False 返回零拷贝视图，该视图在写入端绕回同一槽（slots 帧之后）前有效，
+        可用 still_valid(seq) 在使用后确认数据未被覆盖。
+        """
+        seq = self.latest_seq() if seq is None else seq
+        if seq == 0:
+            return None
+        base = _GLOBAL_SIZE + (seq % self.slots) * self._stride
+        begin, end, pts_ms, h, w, ch, dtype = _SLOT.unpack_from(self._shm.buf, base)
+        if begin != seq or end != seq:
+            return None  # 已被覆盖或正在写入
+        shape = (h, w, ch) if ch > 1 else (h, w)
+        view = np.ndarray(shape, dtype=np.dtype(dtype.rstrip(b"\0").decode()),
+                          buffer=self._shm.buf, offset=base + _SLOT_HEADER_SIZE)
+        frame = view.copy() if copy else view
+        if copy and not self.still_valid(seq):
+            return None
+        return seq, pts_ms, frame
+
+    def still_valid(self, seq: int) -> bool:
+        base = _GLOBAL_SIZE + (seq % self.slots) * self._stride
+        begin, end = struct.unpack_from("<QQ", self._shm.buf, base)
+        return begin == seq and end == seq
+
+    def wait_next(self, last_seq: int, timeout: float = 1.0, poll: float = 0.002,
+                  copy: bool = True) -> Optional[Tuple[int, float, np.ndarray]]:
+        """等待比 last_seq 新的帧；跟不上时直接跳到最新一帧"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.latest_seq() > last_seq:
+                item = self.read(copy=copy)
+                if item is not None:
+                    return item
+            time.sleep(poll)
+        return None
+
+    def close(self) -> None:
+        self._shm.close()
+
+
+def main() -> None:
+    """示例消费者：python frame_publisher.py <name> 打印收到的帧信息"""
+    if len(sys.argv) < 2:
+        print("用法: python frame_publisher.py <shared_memory_name>")
+        sys.exit(1)
+    reader = SharedFrameReader(sys.argv[1])
+    last = 0
+    try:
+        while True:
+            item = reader.wait_next(last, copy=False)
+            if item is None:
+                continue
+            last, pts_ms, frame = item
+            print(f"seq={last} pts={pts_ms:.0f}ms shape={frame.shape} dtype={frame.dtype}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""多路监看网格：单进程内显示 N 路视频，各自独立 ROI / 旋转，解码共享一个按核数分配的线程池
+
+每路的刷新帧率按其在窗口内的可见像素缩放，不可见（最小化、窗口未暴露）时完全停止解码。
+用法：python grid.py <source> [<source> ...]    （页面 URL 加 --page 前缀：--page <url>）
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+# local/ 与 stream/ 共用的模块（帧变换、快照等）位于仓库根目录的 common/
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
+
+from live import open_ffmpeg_capture
+from roi_transform import apply_transform, roi_from_label
+from video_label import VideoLabel
+
+# ============================== 常量配置 ============================== #
+GRID_TICK_MS = 10  # 调度周期
+FULL_RATE_PIXELS = 1280 * 720  # 达到该可见像素时按源帧率刷新
+MIN_TILE_FPS = 2.0  # 可见时的最低刷新帧率
+
+
+class TileDecoder:
+    """单路解码状态；decode() 在共享线程池中执行，同一路同时至多一个任务"""
+
+    def __init__(self, source: str, headers: dict = None):
+        self.source = source
+        self.headers = headers  # 页面提取得到的请求头（Referer 等），防盗链的 CDN 需要
+        self.cap = self._open()
+        if not self.cap.isOpened():
+            raise RuntimeError(f"无法打开视频源: {source}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.is_file = os.path.exists(source)
+        self.seekable = self.cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0  # 直播没有总帧数
+        self.resume_ms = 0.0  # 网络流暂停时的位置
+        self.busy = False
+        self.last_read = None  # 上次读帧的 monotonic 时间
+        self.lock = threading.Lock()
+
+    def _open(self) -> cv2.VideoCapture:
+        if self.headers:
+            return open_ffmpeg_capture(self.source, "", self.headers)
+        return cv2.VideoCapture(self.source)
+
+    def decode(self, size, rotation, roi):
+        """读取当前应显示的帧并缩放到瓦片尺寸；落后的帧只 grab 不做颜色转换与缩放"""
+        with self.lock:
+            now = time.monotonic()
+            if self.last_read is not None:
+                # 按源帧率补读期间应播放的帧，保持实时
+                skip = int((now - self.last_read) * self.fps) - 1
+                for _ in range(max(0, min(skip, int(self.fps)))):
+                    self.cap.grab()
+            self.last_read = now
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.is_file:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                return None
+        frame = apply_transform(frame, rotation, roi)
+        h, w = frame.shape[:2]
+        scale = min(size[0] / w, size[1] / h)
+        if scale < 1:
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def pause(self):
+        """不可见期间停止读帧；恢复时本地文件从原位置继续，网络流重新连接到当前位置"""
+        self.last_read = None
+        if not self.is_file:
+            with self.lock:
+                if self.cap.isOpened():
+                    self.resume_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+                self.cap.release()
+
+    def resume(self):
+        if self.is_file:
+            return
+        with self.lock:
+            if not self.cap.isOpened():
+                self.cap = self._open()
+                if self.seekable and self.resume_ms > 0:
+                    self.cap.set(cv2.CAP_PROP_POS_MSEC, self.resume_ms)
+
+    def release(self):
+        with self.lock:
+            self.cap.release()
+
+
+class GridTile(QtWidgets.QWidget):
+    """单个瓦片：VideoLabel 负责 ROI 框选，右键菜单旋转 / 重置"""
+
+    def __init__(self, decoder: TileDecoder, parent=None):
+        super().__init__(parent)
+        self.decoder = decoder
+        self.rotation = 0
+        self.roi = None  # 归一化 ROI
+        self.next_due = 0.0
+        self.paused = False
+
+        self.label = VideoLabel(self)
+        self.label.setMinimumSize(160, 90)
+        self.label.setStyleSheet("background: black;")
+        self.label.roiChanged.connect(self._on_roi_changed)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(1, 1, 1, 1)
+        layout.addWidget(self.label)
+
+        self.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+        rotate = QtWidgets.QAction("旋转 90°", self)
+        rotate.triggered.connect(self._rotate_90)
+        reset = QtWidgets.QAction("重置 ROI", self)
+        reset.triggered.connect(self._reset_roi)
+        self.addAction(rotate)
+        self.addAction(reset)
+
+    def _on_roi_changed(self, rect: QtCore.QRect):
+        if rect.isValid() and not rect.isNull():
+            self.roi = roi_from_label(rect.left(), rect.top(), rect.right(), rect.bottom(),
+                                      self.label.width(), self.label.height())
+        else:
+            self.roi = None
+
+    def _rotate_90(self):
+        self.rotation = (self.rotation + 90) % 360
+
+    def _reset_roi(self):
+        self.roi = None
+        self.label.clear_roi()
+
+    def visible_pixels(self) -> int:
+        """窗口内可见的像素数：隐藏、最小化或窗口未暴露（平台支持时，如被完全遮挡）时为 0；
+        visibleRegion 只反映本窗口内的裁剪，其他顶层窗口造成的部分遮挡不扣除"""
+        window = self.window()
+        if not self.isVisible() or window.isMinimized():
+            return 0
+        handle = window.windowHandle()
+        if handle is not None and not handle.isExposed():
+            return 0
+        region = self.label.visibleRegion()
+        return sum(r.width() * r.height() for r in region.rects())
+
+    def target_interval(self, pixels: int) -> float:
+        fps = self.decoder.fps * min(1.0, pixels / FULL_RATE_PIXELS)
+        return 1.0 / max(MIN_TILE_FPS, min(fps, self.decoder.fps))
+
+
+class GridWindow(QtWidgets.QMainWindow):
+    """网格主窗口：定时为到期的可见瓦片提交解码任务；sources 为 (地址, 请求头或 None) 列表"""
+
+    _frame_ready = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, sources, workers=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"多路监看（{len(sources)} 路）")
+        cv2.setNumThreads(1)  # 并行度由共享线程池提供
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                        thread_name_prefix="grid-decode")
+
+        central = QtWidgets.QWidget(self)
+        grid = QtWidgets.QGridLayout(central)
+        grid.setSpacing(2)
+        grid.setContentsMargins(0, 0, 0, 0)
+        cols = math.ceil(math.sqrt(len(sources)))
+        self._tiles = []
+        for i, (source, headers) in enumerate(sources):
+            tile = GridTile(TileDecoder(source, headers), central)
+            grid.addWidget(tile, i // cols, i % cols)
+            self._tiles.append(tile)
+        self.setCentralWidget(central)
+
+        self._frame_ready.connect(self._show_frame)
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._schedule)
+        self._timer.start(GRID_TICK_MS)
+
+    def _schedule(self):
+        now = time.monotonic()
+        for i, tile in enumerate(self._tiles):
+            pixels = tile.visible_pixels()
+            if pixels == 0:
+                if not tile.paused:
+                    tile.paused = True
+                    self._pool.submit(tile.decoder.pause)
+                continue
+            if tile.paused:
+                tile.paused = False
+                self._pool.submit(tile.decoder.resume)
+            if tile.decoder.busy or now < tile.next_due:
+                continue
+            tile.next_due = now + tile.target_interval(pixels)
+            tile.decoder.busy = True
+            size = (tile.label.width(), tile.label.height())
+            self._pool.submit(self._decode_job, i, size, tile.rotation, tile.roi)
+
+    def _decode_job(self, index, size, rotation, roi):
+        tile = self._tiles[index]
+        try:
+            frame = tile.decoder.decode(size, rotation, roi)
+        except Exception as exc:
+            print(f"第 {index + 1} 路解码失败: {exc}", file=sys.stderr)
+            frame = None
+        finally:
+            tile.decoder.busy = False
+        if frame is not None:
+            self._frame_ready.emit(index, frame)
+
+    def _show_frame(self, index, frame):
+        """GUI 线程：帧已在工作线程中缩放到瓦片尺寸，这里只构造 QImage"""
+        h, w, ch = frame.shape
+        qt_img = QtGui.QImage(frame.data, w, h, ch * w, QtGui.QImage.Format_RGB888)
+        self._tiles[index].label.setPixmap(QtGui.QPixmap.fromImage(qt_img))
+
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        self._timer.stop()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        for tile in self._tiles:
+            tile.decoder.release()
+        event.accept()
+
+
+def main() -> None:
+    app = QtWidgets.QApplication(sys.argv)
+    args = sys.argv[1:]
+    if not args:
+        print("用法: python grid.py <source> [<source> ...]   （页面 URL 写作 --page <url>）")
+        sys.exit(1)
+
+    sources = []
+    while args:
+        arg = args.pop(0)
+        if arg == "--page" and args:
+            from player import _resolve_page
+            video_url, _, headers, _ = _resolve_page(args.pop(0))
+            sources.append((video_url, headers.get("video")))
+        else:
+            sources.append((arg, None))
+
+    window = GridWindow(sources)
+    window.resize(1280, 720)
+    window.show()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
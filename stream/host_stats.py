@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""按主机记录网络状况（RTT、首字节时间、吞吐量、卡顿次数），据此选择 VLC 网络缓存时长
+
+快的 CDN 用更小的缓存以尽早开播；RTT 高、吞吐低或历史上频繁卡顿的主机加大缓存。
+记录保存在本地 JSON 文件中，每个主机只保留最近若干条。
+配置了代理时探测请求也经代理发出（不绕过代理直连 CDN），记录与直连的分开保存；
+TCP 建连只能到代理为止，此时不测 RTT。
+"""
+
+from __future__ import annotations
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.parse as urlparse
+from typing import Dict, Optional
+
+import requests
+
+# ============================== 常量配置 ============================== #
+STATS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "roi-player", "host_stats.json")
+HISTORY_SIZE = 20  # 每个主机保留的记录数
+PROBE_BYTES = 128 * 1024  # 吞吐量探测读取的字节数
+PROBE_TIMEOUT = 5.0
+MIN_CACHING_MS = 300
+MAX_CACHING_MS = 6000
+RTT_MULTIPLIER = 6  # 缓存至少覆盖若干个往返（分段请求、重定向、TLS 会话恢复）
+LOW_THROUGHPUT_BPS = 512 * 1024  # 低于该吞吐量按比例加大缓存
+REBUFFER_PENALTY = 0.5  # 平均每次会话每卡顿一次，缓存增加的比例
+
+
+def host_of(url: str, proxy: Optional[str] = None) -> str:
+    """记录的键：主机；经代理时附上代理地址"""
+    parsed = urlparse.urlparse(url)
+    host = parsed.netloc or parsed.path
+    return f"{host} via {host_of(proxy)}" if proxy else host
+
+
+def measure_rtt(url: str, timeout: float = PROBE_TIMEOUT) -> Optional[float]:
+    """直连的 TCP 建连耗时（毫秒）；DNS 在计时前单独解析。经代理访问时不应调用"""
+    parsed = urlparse.urlparse(url)
+    if not parsed.hostname:
+        return None
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addr = socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)[0]
+        with socket.socket(addr[0], addr[1], addr[2]) as sock:
+            sock.settimeout(timeout)
+            t0 = time.perf_counter()
+            sock.connect(addr[4])
+            return (time.perf_counter() - t0) * 1000
+    except OSError:
+        return None
+
+
+def measure_transfer(url: str, headers: Optional[Dict[str, str]] = None,
+                     nbytes: int = PROBE_BYTES, proxy: Optional[str] = None) -> Dict[str, float]:
+    """Range 请求开头 nbytes 字节（经 proxy 时通过代理）→ {"ttfb_ms", "throughput_bps"}；失败时返回空字典"""
+    req_headers = dict(headers or {})
+    req_headers["Range"] = f"bytes=0-{nbytes - 1}"
+    proxies = {"http": proxy, "https": proxy} if proxy else None
+    try:
+        t0 = time.perf_counter()
+        with requests.get(url, headers=req_headers, stream=True, timeout=PROBE_TIMEOUT,
+                          proxies=proxies) as resp:
+            if not resp.ok:
+                return {}
+            received, t_first = 0, None
+            for chunk in resp.iter_content(chunk_size=16 * 1024):
+                if t_first is None:
+                    t_first = time.perf_counter()
+                received += len(chunk)
+                if received >= nbytes:
+                    break
+            t_end = time.perf_counter()
+    except (requests.RequestException, OSError):
+        return {}
+    if t_first is None:
+        return {}
+    result = {"ttfb_ms": (t_first - t0) * 1000}
+    if t_end > t_first and received > 16 * 1024:
+        result["throughput_bps"] = received / (t_end - t_first)
+    return result
+
+
+class HostStats:
+    """线程安全；record() 后立即写回文件"""
+
+    def __init__(self, path: str = STATS_PATH):
+        self._path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, list] = self._load()
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp = self._path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f)
+            os.replace(tmp, self._path)
+        except OSError as exc:
+            print(f"主机统计保存失败: {exc}", file=sys.stderr)
+
+    def record(self, url: str, proxy: Optional[str] = None, **sample) -> None:
+        sample = {k: round(v, 1) if isinstance(v, float) else v for k, v in sample.items() if v is not None}
+        if not sample:
+            return
+        sample["t"] = int(time.time())
+        with self._lock:
+            history = self._data.setdefault(host_of(url, proxy), [])
+            history.append(sample)
+            del history[:-HISTORY_SIZE]
+            self._save()
+
+    def probe(self, url: str, headers: Optional[Dict[str, str]] = None,
+              proxy: Optional[str] = None) -> Dict[str, float]:
+        """测量首字节时间、吞吐量与（直连时的）RTT 并记录"""
+        result = measure_transfer(url, headers, proxy=proxy)
+        rtt = measure_rtt(url) if not proxy else None
+        if rtt is not None:
+            result["rtt_ms"] = rtt
+        self.record(url, proxy, **result)
+        return result
+
+    def _values(self, host: str, key: str) -> list:
+        with self._lock:
+            return [s[key] for s in self._data.get(host, []) if key in s]
+
+    def caching_ms(self, url: str, default: int, proxy: Optional[str] = None) -> int:
+        """由该主机（经该代理）的历史记录计算缓存时长；没有记录时返回 default"""
+        host = host_of(url, proxy)
+        rtts = self._values(host, "rtt_ms")
+        throughputs = self._values(host, "throughput_bps")
+        rebuffers = self._values(host, "rebuffers")
+        if not (rtts or throughputs or rebuffers):
+            return default
+        # 先得到基准值再按吞吐与卡顿放大，否则 RTT 很小时放大不起作用
+        caching = max(MIN_CACHING_MS, RTT_MULTIPLIER * statistics.median(rtts)) if rtts else default
+        if throughputs:
+            caching *= max(1.0, LOW_THROUGHPUT_BPS / max(statistics.median(throughputs), 1.0))
+        if rebuffers:
+            caching *= 1 + REBUFFER_PENALTY * statistics.mean(rebuffers)
+        return int(min(MAX_CACHING_MS, max(MIN_CACHING_MS, caching)))
+
+    def summary(self, url: str, proxy: Optional[str] = None) -> str:
+        host = host_of(url, proxy)
+        parts = []
+        for key, label in (("rtt_ms", "RTT"), ("ttfb_ms", "首字节"), ("ttff_ms", "首帧")):
+            values = self._values(host, key)
+            if values:
+                parts.append(f"{label} {statistics.median(values):.0f} ms")
+        throughputs = self._values(host, "throughput_bps")
+        if throughputs:
+            parts.append(f"吞吐 {statistics.median(throughputs) / 1024 / 1024:.2f} MB/s")
+        return f"{host}: " + ("，".join(parts) if parts else "无记录")
+
+
+HOST_STATS = HostStats()
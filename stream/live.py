@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""直播低延迟模式：以目标延迟跟随直播边缘，落后时丢帧追赶，落后过多时直接跳到最新分片
+
+延迟估计 = 加入时距直播边缘的距离（HLS 取最新分片时长）+ 之后墙钟流逝与画面时间戳推进之差。
+解码变慢或网络卡顿都会让后一项增大。加入距离是按分片拉流所能达到的下限，
+因此实际追赶目标取 max(目标延迟, 加入距离)。
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+# ============================== 常量配置 ============================== #
+LIVE_TARGET_LATENCY_S = float(os.environ.get("ROI_LIVE_LATENCY", "2.0"))  # 目标延迟
+LIVE_DROP_MARGIN_S = 0.5  # 超出目标该值后开始丢帧追赶
+LIVE_JUMP_MARGIN_S = 4.0  # 超出目标该值后重新连接到最新分片
+LIVE_MAX_DROP_PER_TICK = 5  # 每次刷新最多丢弃的帧数，避免画面长时间不更新
+LIVE_JUMP_GRACE_S = 10.0  # 加入后至少等待该时长（丢帧追赶的机会）才允许重新连接
+# FFmpeg 直播选项：从最新分片开始、关闭输入缓冲
+LIVE_CAPTURE_OPTIONS = "live_start_index;-1|fflags;nobuffer|flags;low_delay"
+LIVE_NETWORK_CACHING_MS = int(os.environ.get("ROI_LIVE_CACHING_MS", "300"))  # VLC 直播缓存
+PLAYLIST_TIMEOUT = 3.0
+
+_env_lock = threading.Lock()
+_EXTINF_RE = re.compile(r"#EXTINF:([\d.]+)")
+
+
+def open_ffmpeg_capture(url: str, options: str, headers: Optional[dict] = None) -> "cv2.VideoCapture":
+    """以 FFmpeg 选项（"键;值|键;值"）打开 url；headers 作为 HTTP 请求头一并传入
+
+    OpenCV 在打开时读取 OPENCV_FFMPEG_CAPTURE_OPTIONS，因此加锁临时设置后恢复。
+    """
+    import cv2  # 延迟导入：VLC 播放路径只需要本模块的常量
+
+    if headers:
+        # 值中的 | 与 \ 需转义，否则会被当作选项分隔符
+        value = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        value = value.replace("\\", "\\\\").replace("|", "\\|")
+        options = "|".join(filter(None, [options, f"headers;{value}"]))
+    with _env_lock:
+        previous = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = options
+        try:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        finally:
+            if previous is None:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            else:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+
+
+def open_live_capture(url: str) -> "cv2.VideoCapture":
+    """以低缓冲选项打开直播流"""
+    import cv2
+
+    cap = open_ffmpeg_capture(url, LIVE_CAPTURE_OPTIONS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 后端支持时生效
+    return cap
+
+
+def hls_edge_offset(url: str, session=None, headers: Optional[dict] = None) -> float:
+    """从最新分片开始播放时距直播边缘的秒数（即最新分片时长）；非 HLS 或获取失败时返回 0"""
+    if ".m3u8" not in url:
+        return 0.0
+    import requests
+    from urllib.parse import urljoin
+
+    getter = session or requests
+    try:
+        text = getter.get(url, headers=headers, timeout=PLAYLIST_TIMEOUT).text
+        if "#EXT-X-STREAM-INF" in text:
+            # 主播放列表：取第一个变体
+            variant = next(line for line in text.splitlines() if line and not line.startswith("#"))
+            text = getter.get(urljoin(url, variant), headers=headers, timeout=PLAYLIST_TIMEOUT).text
+    except Exception:
+        return 0.0
+    durations = _EXTINF_RE.findall(text)
+    return float(durations[-1]) if durations else 0.0
+
+
+class LiveLatencyTracker:
+    """根据画面时间戳与墙钟估计当前延迟，并给出追赶动作"""
+
+    def __init__(self, target_s: float = LIVE_TARGET_LATENCY_S):
+        self.target_s = target_s
+        self.latency_s = 0.0
+        self._join_s = 0.0
+        self._origin = None  # (墙钟, 时间戳毫秒)
+        self._reset_at = time.monotonic()
+
+    def reset(self, join_latency_s: float = 0.0) -> None:
+        """重新连接后调用；join_latency_s 为加入时距直播边缘的估计"""
+        self._join_s = join_latency_s
+        self._origin = None
+        self._reset_at = time.monotonic()
+        self.latency_s = join_latency_s
+
+    @property
+    def effective_target_s(self) -> float:
+        """不低于加入距离：分片时长大于目标延迟时无法追到更低"""
+        return max(self.target_s, self._join_s)
+
+    def update(self, pts_ms: float) -> float:
+        now = time.monotonic()
+        if self._origin is None or pts_ms <= 0:
+            if pts_ms > 0:
+                self._origin = (now, pts_ms)
+            return self.latency_s
+        wall0, pts0 = self._origin
+        self.latency_s = self._join_s + (now - wall0) - (pts_ms - pts0) / 1000
+        return self.latency_s
+
+    def should_jump(self) -> bool:
+        """已开始计时且宽限期内丢帧仍未追上时才重新连接"""
+        if self._origin is None or time.monotonic() - self._reset_at < LIVE_JUMP_GRACE_S:
+            return False
+        return self.latency_s > self.effective_target_s + LIVE_JUMP_MARGIN_S
+
+    def frames_to_drop(self, fps: float) -> int:
+        excess = self.latency_s - self.effective_target_s
+        if excess <= LIVE_DROP_MARGIN_S:
+            return 0
+        return min(LIVE_MAX_DROP_PER_TICK, int(excess * fps))
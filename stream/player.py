@@ -2,89 +2,37 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import threading
+import time
 import cv2
 import os
-from PyQt5 import QtCore, QtGui, QtWidgets, QtMultimedia, QtNetwork
+from PyQt5 import QtCore, QtGui, QtWidgets
 import requests
 
-from buffer_manager import BufferManager
+# local/ 与 stream/ 共用的模块（帧变换、快照等）位于仓库根目录的 common/
+COMMON_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+if COMMON_DIR not in sys.path:
+    sys.path.insert(0, COMMON_DIR)
 
+from prewarm import PREWARMER
+from video_label import VideoLabel
+from roi_transform import rotate_frame, crop_roi, roi_from_label
+from roi_tracker import RoiTracker
+from snapshot import SnapshotWriter, BurstClock
+from pipeline_stats import PipelineStats, StatsOverlay
+import profiling
+from live import LiveLatencyTracker, open_live_capture, hls_edge_offset
+from download_scheduler import DownloadScheduler
+from audio_engine import AudioEngine
+from recorder import StreamRecorder
 
+PAUSE_RELEASE_MS = 10000  # 网络流暂停超过该时长后断开视频连接，停止下载
+# 点播网络流经统一下载器获取（共享连接池与带宽，优先补充快断流的一路；录制也由此旁路）
+UNIFIED_DOWNLOAD = os.environ.get("ROI_UNIFIED_DOWNLOAD", "1") != "0"
+CLOCK_IDLE_MS = 100  # 暂停、不可见或直播时呈现定时器的检查间隔（播放中按下一帧到期时间单次触发）
+RESYNC_MS = 1000  # 视频落后音频超过该值（卡顿、切换后）才 seek，否则逐帧跳过追赶
 
 
-class VideoLabel(QtWidgets.QLabel):
-    """用于显示视频帧并处理鼠标框选"""
-
-    roiChanged = QtCore.pyqtSignal(QtCore.QRect)  # 对外发送 ROI 变化信号
-
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAlignment(QtCore.Qt.AlignCenter)
-        self._rubber_band = QtWidgets.QRubberBand(
-            QtWidgets.QRubberBand.Rectangle, self
-        )
-        self._origin = QtCore.QPoint()
-        self._selecting = False
-        self._roi = None  # type: QtCore.QRect | None
-        self.setMinimumSize(400, 300)  # 设置最小尺寸
-
-    # ------------------------- 鼠标事件 ------------------------- #
-
-    def mousePressEvent(self, event: QtGui.QMouseEvent):
-        if event.button() == QtCore.Qt.LeftButton:
-            self._origin = event.pos()
-            self._rubber_band.setGeometry(QtCore.QRect(self._origin, QtCore.QSize()))
-            self._rubber_band.show()
-            self._selecting = True
-        super().mousePressEvent(event)
-
-    def mouseMoveEvent(self, event: QtGui.QMouseEvent):
-        """鼠标移动事件"""
-        if self._selecting:
-            rect = QtCore.QRect(self._origin, event.pos()).normalized()
-            self._rubber_band.setGeometry(rect)
-        super().mouseMoveEvent(event)
-
-    def mouseReleaseEvent(self, event: QtGui.QMouseEvent):
-        if event.button() == QtCore.Qt.LeftButton and self._selecting:
-            self._selecting = False
-            self._rubber_band.hide()
-            rect = self._rubber_band.geometry()
-            
-            # 过滤过小的 ROI，避免误操作
-            if rect.width() > 10 and rect.height() > 10:
-                # 如果已经有 ROI，计算相对于当前 ROI 的新区域
-                if self._roi:
-                    # 计算选择区域相对于当前 ROI 的相对位置
-                    rel_x = (rect.x() - self._roi.x()) / self._roi.width()
-                    rel_y = (rect.y() - self._roi.y()) / self._roi.height()
-                    rel_w = rect.width() / self._roi.width()
-                    rel_h = rect.height() / self._roi.height()
-                    
-                    # 创建新的相对 ROI
-                    new_rect = QtCore.QRect(
-                        self._roi.x() + int(rel_x * self._roi.width()),
-                        self._roi.y() + int(rel_y * self._roi.height()),
-                        int(rel_w * self._roi.width()),
-                        int(rel_h * self._roi.height())
-                    )
-                    self._roi = new_rect
-                else:
-                    self._roi = rect
-            else:
-                self._roi = None
-                
-            self.roiChanged.emit(self._roi if self._roi else QtCore.QRect())
-        super().mouseReleaseEvent(event)
-
-    # ----------------------- 对外接口 ----------------------- #
-
-    def current_roi(self) -> QtCore.QRect | None:
-        return self._roi
-
-    def clear_roi(self) -> None:
-        self._roi = None
-        self.update()
 
 
 # --------- 可点击跳转的进度条 --------- #
@@ -107,71 +55,96 @@ class VideoSlider(QtWidgets.QSlider):
         super().mousePressEvent(event)
 
 
+# --------- 附加 ROI 视图（画中画 / 独立窗口） --------- #
+class RoiView(QtWidgets.QLabel):
+    """显示同一解码帧中的另一块区域；双击在画中画与独立窗口间切换，右键关闭"""
+
+    closed = QtCore.pyqtSignal(object)
+    docked = QtCore.pyqtSignal()
+
+    PIP_SIZE = QtCore.QSize(240, 135)
+
+    def __init__(self, roi, parent=None):
+        super().__init__(parent)
+        self.roi = roi  # 归一化 ROI（旋转后的完整画面坐标）
+        self._pip_parent = parent
+        self.setAlignment(QtCore.Qt.AlignCenter)
+        self.setStyleSheet("background: black; border: 1px solid rgba(255, 255, 255, 120);")
+        self.resize(self.PIP_SIZE)
+
+    def show_frame(self, frame_rgb):
+        """只对本区域裁剪并缩放到视图尺寸"""
+        crop = crop_roi(frame_rgb, self.roi)
+        h, w = crop.shape[:2]
+        if h == 0 or w == 0:
+            return
+        scale = min(self.width() / w, self.height() / h)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        crop = cv2.resize(crop, size, interpolation=interp)
+        qt_img = QtGui.QImage(crop.data, size[0], size[1], size[0] * 3, QtGui.QImage.Format_RGB888)
+        self.setPixmap(QtGui.QPixmap.fromImage(qt_img))
+
+    def mouseDoubleClickEvent(self, event: QtGui.QMouseEvent):
+        if self.parent() is not None:
+            # 画中画 → 独立窗口
+            self.setParent(None)
+            self.setWindowTitle("ROI 视图")
+            self.resize(480, 270)
+        else:
+            self.setParent(self._pip_parent)
+            self.resize(self.PIP_SIZE)
+            self.docked.emit()  # 通知主窗口重新排布画中画
+        self.show()
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent):
+        if event.button() == QtCore.Qt.RightButton:
+            self.closed.emit(self)
+            self.close()
+            self.deleteLater()
+            return
+        super().mousePressEvent(event)
+
+
 class VideoPlayer(QtWidgets.QMainWindow):
     """主窗口：负责解码、定时刷新与 ROI 裁剪"""
 
-    def __init__(self, video_source: str, headers: dict = None, audio_url: str = None, parent=None):
+    finished = QtCore.pyqtSignal()  # 当前流播放结束
+    nextRequested = QtCore.pyqtSignal()  # 用户请求切到下一项（N 键）
+    _downloadsReady = QtCore.pyqtSignal(object, bool)  # (DownloadScheduler, 是否就绪)，由等待线程发出
+
+    def __init__(self, video_source: str, headers: dict = None, audio_url: str = None, parent=None,
+                 publish: str = None, live: bool = False):
         super().__init__(parent)
         self.setWindowTitle("视频 ROI 工具")
-        self._is_stream = bool(headers)
-        
-        # ---------- 视频解码 ---------- #
-        self._video_source = video_source
-        self._headers = headers
-        self._session = requests.Session()  # 用于重用连接
-        
-        if self._is_stream:
-            # 对于流媒体，首先创建一个session并验证连接
-            if headers and headers.get("video"):
-                self._session.headers.update(headers["video"])
-            response = self._session.get(video_source, stream=True)
-            if not response.ok:
-                raise RuntimeError(f"无法访问视频流: {response.status_code}")
-            
-            self._cap = cv2.VideoCapture(video_source)
-            self._total_frames = 1000  # 默认值
-            self._duration_ms = 40000  # 默认40秒
-        else:
-            self._cap = cv2.VideoCapture(video_source)
-            self._total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self._duration_ms = int(self._total_frames * (1000/25))  # 假设25fps
-            
-        if not self._cap.isOpened():
-            raise RuntimeError(f"无法打开视频源: {video_source}")
-        
-        fps = self._cap.get(cv2.CAP_PROP_FPS) or 25
-        self._interval_ms = int(1000 / fps)
+        self._cap = None
+        self._live = live  # 直播：按目标延迟跟随直播边缘，由定时器而非音频时钟驱动
+        self._live_tracker = LiveLatencyTracker()
+        self._downloads = None  # DownloadScheduler，点播网络流使用
+        self._awaiting_downloads = False  # 下载器尚未就绪，解码器与音频稍后打开
+        self._downloadsReady.connect(self._on_downloads_ready)
+        self._recorder = None  # StreamRecorder，录制中时非空
+
+        # ---------- 共享内存帧发布（可选） ---------- #
+        self._publisher = None
+        if publish:
+            from frame_publisher import SharedFrameRing
+            self._publisher = SharedFrameRing(publish)
+            print(f"帧发布到共享内存: {self._publisher.name}")
 
         # ---------- 音频处理 ---------- #
-        self._media_player = QtMultimedia.QMediaPlayer()
-        if audio_url:
-            # 创建带headers的网络请求
-            if headers and headers.get("audio"):
-                # ----------- 修改后 -----------
-                request = QtNetwork.QNetworkRequest(QtCore.QUrl(audio_url))
-                for k, v in headers["audio"].items():
-                    request.setRawHeader(k.encode(), v.encode())
-
-                # QMediaResource 可以携带完整的 request（含自定义头）
-                media_res   = QtMultimedia.QMediaResource(request)
-                media       = QtMultimedia.QMediaContent(media_res)
-                self._media_player.setMedia(media)        # ✓ 能正确加载
-            else:
-                self._media_player.setMedia(
-                    QtMultimedia.QMediaContent(QtCore.QUrl(audio_url))
-                )
-        else:
-            # 本地文件
-            self._media_player.setMedia(
-                QtMultimedia.QMediaContent(QtCore.QUrl.fromLocalFile(os.path.abspath(video_source)))
-            )
-        
-        self._media_player.setVolume(100)
-        self._media_player.error.connect(self._on_audio_error)
-        # 让音频时钟驱动视频渲染
-        self._media_player.positionChanged.connect(self._on_audio_tick)
-        # 延迟500ms再调用play()，以确保音频输出正确启动
-        QtCore.QTimer.singleShot(500, self._media_player.play)
+        self._audio = AudioEngine(self)
+        self._audio.error.connect(self._on_audio_error)
+        self._audio.finished.connect(self._on_audio_finished)
+
+        self._open_source(video_source, headers, audio_url)
+        self._audio.play()
+        # 音频样本时钟驱动视频呈现：单次定时器，每次按下一帧的到期时间重新设定
+        self._clock_timer = QtCore.QTimer(self)
+        self._clock_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._clock_timer.setSingleShot(True)
+        self._clock_timer.timeout.connect(self._on_clock_tick)
+        self._clock_timer.start(0)
 
         # ---------- UI ---------- #
         self._label = VideoLabel(self)
@@ -182,6 +155,11 @@ class VideoPlayer(QtWidgets.QMainWindow):
         vbox.addWidget(self._label)
         self.setCentralWidget(central)
         self._label.roiChanged.connect(self._on_roi_changed)
+        self._label.extraRoiAdded.connect(self._add_roi_view)
+        self._roi_views = []  # 附加 ROI 视图，共用同一次解码
+        self._stats = PipelineStats()
+        self._stats.extra_provider = self._stats_extra
+        self._stats_overlay = StatsOverlay(self._stats, self._label)
 
         # ---------- 控制面板 ---------- #
         self._control_panel = ControlPanel(self)
@@ -193,34 +171,210 @@ class VideoPlayer(QtWidgets.QMainWindow):
         # 统一使用毫秒作为进度条单位
         self._control_panel._slider.setRange(0, self._duration_ms)
         self._control_panel._slider.sliderMoved.connect(self._on_slider_moved)
+        self._control_panel._slider.setEnabled(not self._live)
 
         # 音量滑条联动
         self._control_panel._volume_slider.valueChanged.connect(self._on_volume_changed)
         
-        # ---------- 定时器播放 ---------- #
-
-        # ---------- 鼠标位置检测定时器 ---------- #
-        self._mouse_check_timer = QtCore.QTimer(self)
-        self._mouse_check_timer.setInterval(100)  # 100ms = 0.1秒
-        self._mouse_check_timer.timeout.connect(self._check_mouse_position)
-        self._mouse_check_timer.start()
+        # ---------- 快捷键 ---------- #
+        QtWidgets.QShortcut(QtGui.QKeySequence("N"), self, activated=self.nextRequested.emit)
+        QtWidgets.QShortcut(QtGui.QKeySequence("T"), self, activated=self._toggle_tracking)
+        # S：源分辨率 ROI 快照；Shift+S：开始 / 停止连拍
+        QtWidgets.QShortcut(QtGui.QKeySequence("S"), self, activated=self._take_snapshot)
+        QtWidgets.QShortcut(QtGui.QKeySequence("Shift+S"), self, activated=self._toggle_burst)
+        # I：显示 / 隐藏管线统计叠加层；Ctrl+J：导出各帧分阶段计时（JSON Lines）
+        QtWidgets.QShortcut(QtGui.QKeySequence("I"), self, activated=self._stats_overlay.toggle)
+        QtWidgets.QShortcut(QtGui.QKeySequence("Ctrl+J"), self, activated=self._export_stats)
+        # Ctrl+P 或 SIGUSR1：开始 / 结束一次诊断采集（cProfile、tracemalloc、线程栈）
+        self._profile = profiling.attach(self)
+        # R：开始 / 结束录制（旁路保存已下载的数据，结束时无损封装）
+        QtWidgets.QShortcut(QtGui.QKeySequence("R"), self, activated=self._toggle_recording)
+        # A：仅音频模式，停止视频下载与解码
+        QtWidgets.QShortcut(QtGui.QKeySequence("A"), self, activated=self._toggle_audio_only)
+        self._snapshots = SnapshotWriter()
+        self._burst = BurstClock()
+        self._last_frame = None  # (BGR 源帧, 毫秒)，快照用
+
+        # ---------- 控制面板显隐：由进入 / 离开事件驱动，无需轮询 ---------- #
+        self._label.installEventFilter(self)
+        self._control_panel.installEventFilter(self)
 
         # ---------- 状态 ---------- #
         self._roi = None  # type: QtCore.QRect | None
         self._rotation = 0  # 当前旋转角度（0/90/180/270）
         self._paused = False  # 播放/暂停状态
+        self._tracker = RoiTracker()  # T 键开启：ROI 跟随目标
+        self._audio_only = False
+        self._release_timer = QtCore.QTimer(self)
+        self._release_timer.setSingleShot(True)
+        self._release_timer.setInterval(PAUSE_RELEASE_MS)
+        self._release_timer.timeout.connect(self._release_video)
+        self._live_timer = QtCore.QTimer(self)
+        self._live_timer.setInterval(self._interval_ms)
+        self._live_timer.timeout.connect(self._live_tick)
+        if self._live:
+            self._live_timer.start()
         
         # 显示并定位控制面板
         self._update_control_panel_position()
 
         # 初始定位但隐藏控制面板
         self._control_panel.show()  # 先显示以便用户知道面板位置
-        QtCore.QTimer.singleShot(2000, self._control_panel.hide)  # 2秒后自动隐藏
+        QtCore.QTimer.singleShot(2000, self._update_panel_visibility)  # 2秒后按鼠标位置决定是否隐藏
+
+    # ---------------- 打开 / 切换视频源 ---------------- #
+
+    def _open_source(self, video_source: str, headers: dict = None, audio_url: str = None):
+        """打开视频解码器并设置音频源；点播网络流先启动统一下载器，就绪后再打开（_on_downloads_ready）"""
+        self._is_stream = bool(headers) or self._live
+        self._video_source = video_source
+        self._headers = headers
+        self._audio_url = audio_url
+
+        if self._is_stream:
+            # 复用提取阶段已预热的连接池（含提取时使用的代理）；Session 按主机共享，请求头逐次传入
+            self._session = PREWARMER.session_for(video_source)
+            # 不等待仍在进行的预取：未完成时由下载器自行请求开头
+            head = PREWARMER.take_prefetched(video_source)
+            if not self._live and UNIFIED_DOWNLOAD:
+                self._start_downloads(video_source, headers, audio_url, head)
+                self._total_frames = 1000  # 默认值
+                self._duration_ms = 40000  # 默认40秒
+                self._interval_ms = int(1000 / 25)
+                return
+            if not head:
+                # 直连播放：预取成功已说明地址可访问，否则先验证一次
+                response = self._session.get(video_source, headers=self._video_headers(), stream=True)
+                response.close()
+                if not response.ok:
+                    raise RuntimeError(f"无法访问视频流: {response.status_code}")
+        self._open_capture(video_source, headers, audio_url)
+
+    def _open_capture(self, video_source: str, headers: dict = None, audio_url: str = None):
+        """打开视频解码器与音频"""
+        # ---------- 视频解码 ---------- #
+        if self._is_stream:
+            if self._live:
+                self._cap = open_live_capture(video_source)
+                self._live_tracker.reset(hls_edge_offset(video_source, self._session, self._video_headers()))
+                self._total_frames = 0
+                self._duration_ms = 0  # 直播无总时长，进度条停用
+            else:
+                self._cap = cv2.VideoCapture(video_source)
+                self._total_frames = 1000  # 默认值
+                self._duration_ms = 40000  # 默认40秒
+        else:
+            self._session = requests.Session()
+            self._cap = cv2.VideoCapture(video_source)
+            self._total_frames = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self._duration_ms = int(self._total_frames * (1000/25))  # 假设25fps
+            
+        if not self._cap.isOpened():
+            raise RuntimeError(f"无法打开视频源: {video_source}")
+        
+        fps = self._cap.get(cv2.CAP_PROP_FPS) or 25
+        self._interval_ms = int(1000 / fps)
+
+        # ---------- 音频源 ---------- #
+        if audio_url:
+            self._audio.open(audio_url, (headers or {}).get("audio"), live=self._live)
+        else:
+            # 本地文件或音视频合一的流：从视频源中解码音轨
+            self._audio.open(video_source, (headers or {}).get("video"), live=self._live)
+
+    def _video_headers(self) -> dict:
+        return (self._headers or {}).get("video") or {}
+
+    def _start_downloads(self, video_source: str, headers: dict, audio_url: str = None, head: bytes = b""):
+        """启动统一下载器（head 为预热阶段取得的视频开头），在后台线程等待各路得到文件大小，
+        结果经 _downloadsReady 交回 GUI 线程；等待期间界面照常响应"""
+        tracks = {"video": (video_source, (headers or {}).get("video") or {})}
+        if audio_url:
+            tracks["audio"] = (audio_url, (headers or {}).get("audio") or {})
+        scheduler = DownloadScheduler(tracks, session=self._session, heads={"video": head})
+        self._downloads = scheduler
+        self._awaiting_downloads = True
+        threading.Thread(target=self._wait_downloads, args=(scheduler,), name="download-ready", daemon=True).start()
+
+    def _wait_downloads(self, scheduler):
+        """在后台线程中等待下载器就绪，结果交回 GUI 线程"""
+        ready = scheduler.wait_ready()
+        try:
+            self._downloadsReady.emit(scheduler, ready)
+        except RuntimeError:
+            pass  # 窗口已销毁
+
+    def _on_downloads_ready(self, scheduler, ok: bool):
+        """解码器与音频改读本机缓存；服务器不支持 Range 或首个分块失败时退回各自直连"""
+        if scheduler is not self._downloads:
+            return  # 等待期间已切换到其他源或窗口已关闭
+        self._awaiting_downloads = False
+        video_source, headers, audio_url = self._video_source, self._headers, self._audio_url
+        if ok:
+            # 解码器与音频都改读本机缓存，不再各自请求 CDN
+            video_source = self._video_source = scheduler.url_for("video")
+            if audio_url:
+                audio_url = scheduler.url_for("audio")
+            headers = {"video": {}, "audio": {}}
+        else:
+            print(f"统一下载不可用，改为直连: {scheduler.errors() or '超时'}", file=sys.stderr)
+            self._close_downloads()
+        try:
+            self._open_capture(video_source, headers, audio_url)
+        except RuntimeError as exc:
+            self._release_video()
+            print(exc, file=sys.stderr)
+            self._label.setText(str(exc))
+            return
+        if self._audio_only:
+            self._release_video()
+        self._sync_controls()
+
+    def _close_downloads(self):
+        self._stop_recording()
+        self._awaiting_downloads = False
+        if self._downloads is not None:
+            self._downloads.close()
+            self._downloads = None
+
+    def load_stream(self, video_source: str, headers: dict = None, audio_url: str = None, live: bool = False):
+        """在同一窗口内切换到新的视频源（播放列表使用），保留 ROI 与旋转设置"""
+        self._audio.stop()
+        if self._cap is not None and self._cap.isOpened():
+            self._cap.release()
+        self._close_downloads()
+        self._live = live
+        self._cap = None
+        self._open_source(video_source, headers, audio_url)
+        if self._audio_only:
+            self._release_video()
+        self._sync_controls()
+        if not self._paused:
+            self._audio.play()
+        self._clock_timer.start(0)
+
+    def _sync_controls(self):
+        """按当前源的时长与帧率更新进度条和直播定时器"""
+        self._control_panel._slider.blockSignals(True)
+        self._control_panel._slider.setRange(0, self._duration_ms)
+        self._control_panel._slider.setValue(0)
+        self._control_panel._slider.setEnabled(not self._live)
+        self._control_panel._slider.blockSignals(False)
+        self._live_timer.setInterval(self._interval_ms)
+        if self._live:
+            self._live_timer.start()
+        else:
+            self._live_timer.stop()
+
+    def _on_audio_finished(self):
+        if self._is_stream:
+            self.finished.emit()
 
     def resizeEvent(self, event):
         """窗口大小改变时重新定位控制面板"""
         super().resizeEvent(event)
         self._update_control_panel_position()
+        self._layout_roi_views()
 
     def _update_control_panel_position(self):
         """更新控制面板位置"""
@@ -235,11 +389,124 @@ class VideoPlayer(QtWidgets.QMainWindow):
 
     def _on_roi_changed(self, rect: QtCore.QRect):
         self._roi = rect if rect.isValid() and not rect.isNull() else None
+        if self._tracker.active:
+            # 跟踪中重新框选：以新区域为目标继续跟踪
+            if self._roi:
+                self._tracker.start(self._normalized_roi())
+            else:
+                self._tracker.stop()
 
     def _reset_roi(self):
+        self._tracker.stop()
         self._roi = None
         self._label.clear_roi()
 
+    def _toggle_tracking(self):
+        """开启 / 关闭 ROI 跟踪（需先框选目标）"""
+        if self._tracker.active:
+            self._tracker.stop()
+            print("ROI 跟踪已关闭")
+        elif self._roi:
+            self._tracker.start(self._normalized_roi())
+            print("ROI 跟踪已开启")
+
+    def _apply_tracked_roi(self):
+        """把跟踪结果（归一化）换算回标签坐标"""
+        roi = self._tracker.current()
+        if roi is None:
+            return
+        lw, lh = self._label.width(), self._label.height()
+        x, y, w, h = roi
+        rect = QtCore.QRect(int(x * lw), int(y * lh), max(1, int(w * lw)), max(1, int(h * lh)))
+        self._roi = rect
+        self._label.set_roi(rect)
+
+    def _normalized_roi(self):
+        """当前 ROI 的归一化表示（旋转后画面坐标，0~1）"""
+        if not self._roi:
+            return None
+        return roi_from_label(
+            self._roi.left(), self._roi.top(), self._roi.right(), self._roi.bottom(),
+            self._label.width(), self._label.height(),
+        )
+
+    # ---------------- 快照 ---------------- #
+
+    def _take_snapshot(self):
+        if self._last_frame is None:
+            return
+        frame, pts_ms = self._last_frame
+        stem = "stream" if self._is_stream else os.path.splitext(os.path.basename(self._video_source))[0]
+        self._snapshots.submit(frame, self._rotation, self._normalized_roi(), stem, pts_ms)
+
+    def _export_stats(self):
+        self._stats.export_jsonl(time.strftime("pipeline_stats_%Y%m%d_%H%M%S.jsonl"))
+
+    def _stats_extra(self) -> dict:
+        """音频缓冲与音视频偏差；经统一下载器时另有各路已缓冲秒数"""
+        extra = {"音频缓冲": f"{self._audio.buffered_ms():.0f} ms"}
+        if self._cap is not None:
+            lag = self._audio.position_ms() - self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            extra["视频落后"] = f"{lag / 1000:+.2f} s"
+        if self._downloads is not None:
+            ahead = self._downloads.buffered_seconds()
+            extra["已缓冲"] = "  ".join(f"{name} {sec:.1f} s" for name, sec in ahead.items())
+        if self._live:
+            extra["直播延迟"] = f"{self._live_tracker.latency_s:.2f} s（目标 {self._live_tracker.effective_target_s:.1f} s）"
+        return extra
+
+    def _toggle_recording(self):
+        if self._recorder is not None:
+            self._stop_recording()
+            return
+        if self._downloads is None:
+            print("当前源不经统一下载器（本地文件、直播或服务器不支持 Range），无法旁路录制", file=sys.stderr)
+            return
+        self._recorder = StreamRecorder(self._downloads.tracks)
+        self._downloads.set_tee(self._recorder.tee)
+        print(f"开始录制 → {self._recorder.output}")
+
+    def _stop_recording(self):
+        if self._recorder is None:
+            return
+        if self._downloads is not None:
+            self._downloads.set_tee(None)
+        recorder, self._recorder = self._recorder, None
+        recorder.stop()  # 写盘与封装在后台完成，不阻塞界面
+        print(f"录制结束，后台写入并封装 → {recorder.output}")
+
+    def _toggle_burst(self):
+        print("连拍开始" if self._burst.toggle() else f"连拍结束（丢弃 {self._snapshots.dropped} 帧）")
+
+    # ---------------- 附加 ROI 视图 ---------------- #
+
+    def _add_roi_view(self, rect: QtCore.QRect):
+        """Shift+框选的区域 → 新的画中画视图"""
+        ex, ey, ew, eh = roi_from_label(rect.left(), rect.top(), rect.right(), rect.bottom(),
+                                        self._label.width(), self._label.height())
+        # 主 ROI 生效时，框选的是放大后的画面，需换算回完整画面
+        base = self._normalized_roi() or (0.0, 0.0, 1.0, 1.0)
+        roi = (base[0] + ex * base[2], base[1] + ey * base[3], ew * base[2], eh * base[3])
+        view = RoiView(roi, self._label)
+        view.closed.connect(self._on_roi_view_closed)
+        view.docked.connect(self._layout_roi_views)
+        self._roi_views.append(view)
+        self._layout_roi_views()
+        view.show()
+
+    def _on_roi_view_closed(self, view):
+        if view in self._roi_views:
+            self._roi_views.remove(view)
+        self._layout_roi_views()
+
+    def _layout_roi_views(self):
+        """画中画视图沿右上角纵向排列"""
+        y = 10
+        for view in self._roi_views:
+            if view.parent() is self._label:
+                view.move(self._label.width() - view.width() - 10, y)
+                y += view.height() + 6
+
     def _rotate_90(self):
         """顺时针旋转 90°"""
         self._rotation = (self._rotation + 90) % 360
@@ -248,20 +515,91 @@ class VideoPlayer(QtWidgets.QMainWindow):
         """暂停/继续播放"""
         self._paused = not self._paused
         if self._paused:
-            self._media_player.pause()
+            self._audio.pause()
             self._control_panel._pause_btn.setText("▶")
+            if self._is_stream:
+                self._release_timer.start()
         else:
-            self._media_player.play()
+            self._release_timer.stop()
+            if self._live:
+                # 直播暂停后不补播积压内容，直接回到直播边缘
+                self._jump_to_live_edge()
+            elif not self._audio_only:
+                self._restore_video()
+            self._audio.play()
+            self._clock_timer.start(0)
             self._control_panel._pause_btn.setText("⏸")
 
+    # ---------------- 视频连接的释放与恢复 ---------------- #
+
+    def _release_video(self):
+        """关闭视频解码器（网络流即断开连接），音频继续播放"""
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _restore_video(self):
+        """重新打开视频并对齐到音频位置"""
+        if self._cap is None and not self._awaiting_downloads:  # 下载器就绪时自行打开
+            if self._live:
+                self._cap = open_live_capture(self._video_source)
+                self._live_tracker.reset(hls_edge_offset(self._video_source, self._session, self._video_headers()))
+                return
+            self._cap = cv2.VideoCapture(self._video_source)
+            self._cap.set(cv2.CAP_PROP_POS_MSEC, self._audio.position_ms())
+
+    # ---------------- 直播：跟随直播边缘 ---------------- #
+
+    def _live_tick(self):
+        """按帧率刷新；延迟超出目标时先丢帧追赶，落后过多则重新连接到最新分片"""
+        if self._cap is None or self._paused or not self._video_visible():
+            return
+        # grab() 只取帧不做颜色转换与显示
+        for _ in range(self._live_tracker.frames_to_drop(1000 / self._interval_ms)):
+            if not self._cap.grab():
+                break
+            self._stats.drop()
+        self._render_frame()
+        if self._cap is None:
+            return
+        self._live_tracker.update(self._cap.get(cv2.CAP_PROP_POS_MSEC))
+        if self._live_tracker.should_jump():
+            self._jump_to_live_edge()
+
+    def _jump_to_live_edge(self):
+        """丢弃已缓冲的内容，音视频都重新连接到最新分片"""
+        self._release_video()
+        if not self._audio_only:
+            self._restore_video()
+        self._stats.cancel()
+        self._audio.seek(None)
+
+    def _toggle_audio_only(self):
+        self._audio_only = not self._audio_only
+        if self._audio_only:
+            self._release_video()
+            self._label.setText("仅音频")
+            print("仅音频模式：已停止视频下载与解码")
+        else:
+            self._restore_video()
+            self._render_frame()
+            print("已恢复视频")
+
     def _on_volume_changed(self, value):
         """处理音量变化"""
-        self._media_player.setVolume(value)
+        self._audio.set_volume(value / 100)
 
     def _on_slider_moved(self, value):
         """统一使用毫秒为单位进行跳转"""
         target_ms = value
-        
+
+        if self._live:
+            return
+        if self._cap is None:
+            # 仅音频 / 暂停释放期间只移动音频位置，恢复视频时自动对齐
+            self._audio.seek(target_ms)
+            return
+
         if self._is_stream:
             # 重新打开视频流
             self._cap.release()
@@ -271,28 +609,31 @@ class VideoPlayer(QtWidgets.QMainWindow):
         else:
             self._cap.set(cv2.CAP_PROP_POS_MSEC, target_ms)
         
-        # 同步音频位置
-        if not self._paused:
-            self._media_player.setPosition(target_ms)
-            self._media_player.play()
-        
+        # 同步音频位置（暂停中 seek 也移动音频，继续时从新位置播放）
+        self._audio.seek(target_ms)
+        self._stats.cancel()
         self._render_frame()
 
     # --------------------- 帧刷新 --------------------- #
 
     def _render_frame(self):
+        if self._cap is None:
+            return
+        stats = self._stats
+        stats.begin()
         ret, frame = self._cap.read()
+        stats.mark("decode")
         if not ret:
+            stats.cancel()
             if not self._is_stream:
                 # 本地文件循环播放
                 self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                self._media_player.setPosition(0)
-                if not self._paused:
-                    self._media_player.play()
+                self._audio.seek(0)
             return
 
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
+        stats.mark("cvtColor")
+
         # 更新进度条
         current_ms = int(self._cap.get(cv2.CAP_PROP_POS_MSEC))
         if current_ms > 0:  # 避免无效值
@@ -300,82 +641,128 @@ class VideoPlayer(QtWidgets.QMainWindow):
             self._control_panel._slider.setValue(current_ms)
             self._control_panel._slider.blockSignals(False)
 
+        # 保留源帧引用供快照使用（read() 每次返回新数组，无需复制）
+        self._last_frame = (frame, current_ms)
+        if self._burst.due(current_ms):
+            self._take_snapshot()
+
         # ----------------------------------------------
         # 旋转与 ROI 裁剪，然后显示到 QLabel
         # ----------------------------------------------
-        if self._rotation == 90:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_90_CLOCKWISE)
-        elif self._rotation == 180:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_180)
-        elif self._rotation == 270:
-            frame_rgb = cv2.rotate(frame_rgb, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        stats.mark("snapshot")
+        frame_rgb = rotate_frame(frame_rgb, self._rotation)
+        stats.mark("rotate")
+
+        if self._tracker.active:
+            self._tracker.feed(frame_rgb)
+            self._apply_tracked_roi()
+
+        # 附加视图各自只裁剪、缩放自己的区域
+        for view in self._roi_views:
+            if view.isVisible():
+                view.show_frame(frame_rgb)
+        stats.mark("views")
 
         if self._roi:
-            h_label, w_label = self._label.height(), self._label.width()
-            y_scale = frame_rgb.shape[0] / h_label
-            x_scale = frame_rgb.shape[1] / w_label
-            x1 = int(self._roi.left() * x_scale)
-            y1 = int(self._roi.top() * y_scale)
-            x2 = int(self._roi.right() * x_scale)
-            y2 = int(self._roi.bottom() * y_scale)
-            frame_rgb = frame_rgb[y1:y2, x1:x2]
+            frame_rgb = crop_roi(frame_rgb, self._normalized_roi())
+            stats.mark("roi")
+
+        if self._publisher is not None:
+            self._publisher.publish(frame_rgb, current_ms)
+            stats.mark("publish")
 
         # 转为 QImage 并显示
         h, w, ch = frame_rgb.shape
         bytes_per_line = ch * w
         qt_img = QtGui.QImage(frame_rgb.data.tobytes(), w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
         pix = QtGui.QPixmap.fromImage(qt_img)
-        self._label.setPixmap(pix.scaled(self._label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
-
-    def _on_audio_tick(self, pos_ms: int):
-        """音频时钟 → 渲染对应时间戳的视频帧"""
-        if self._cap is None:
+        stats.mark("qimage")
+        scaled = pix.scaled(self._label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        stats.mark("scale")
+        self._label.setPixmap(scaled)
+        stats.mark("setPixmap")
+        stats.end()
+
+    def _on_clock_tick(self):
+        """音频样本时钟 → 到时间的下一帧；视频超前（含音频缓冲耗尽）时等待，落后时逐帧跳过
+
+        结束时把单次定时器设到下一帧的到期时间，播放中每帧只唤醒一次 GUI 线程。
+        """
+        if self._live or self._paused or self._cap is None or not self._video_visible():
+            # 直播由 _live_tick 驱动；窗口不可见时不解码，恢复后按时间差追赶
+            self._clock_timer.start(CLOCK_IDLE_MS)
             return
-        delta = abs(self._cap.get(cv2.CAP_PROP_POS_MSEC) - pos_ms)
-        if delta > 80:
-            self._cap.set(cv2.CAP_PROP_POS_MSEC, pos_ms)
-        self._render_frame()
-
-    def _check_mouse_position(self):
-        """检查鼠标位置并控制控制面板的显示"""
-        cursor_pos = QtGui.QCursor.pos()
-        panel_rect = self._control_panel.geometry()
-        video_rect = self._label.geometry()
-        
-        # 将鼠标位置从全局坐标转换为窗口坐标
-        window_pos = self.mapFromGlobal(cursor_pos)
-        
-        # 检查鼠标是否在视频区域内或控制面板区域内
-        if video_rect.contains(window_pos) or panel_rect.contains(window_pos):
-            # 如果鼠标在视频区域或控制面板区域内，显示控制面板
-            if not self._control_panel.isVisible():
-                self._control_panel.show()
-        else:
-            # 如果鼠标不在这些区域内，隐藏控制面板
-            if self._control_panel.isVisible():
-                self._control_panel.hide()
+        clock_ms = self._audio.position_ms()
+        frame_ms = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+        behind = clock_ms - frame_ms
+        if behind >= self._interval_ms:
+            if behind > RESYNC_MS:
+                self._stats.drop(int(behind / self._interval_ms))
+                self._stats.cancel()
+                self._cap.set(cv2.CAP_PROP_POS_MSEC, clock_ms)
+            else:
+                # grab() 跳过已过期的帧，不做颜色转换与显示
+                for _ in range(int(behind / self._interval_ms) - 1):
+                    if not self._cap.grab():
+                        break
+                    self._stats.drop()
+            self._render_frame()
+            if self._cap is None:
+                self._clock_timer.start(CLOCK_IDLE_MS)
+                return
+            new_ms = self._cap.get(cv2.CAP_PROP_POS_MSEC)
+            # 读取失败（流结束或等待数据）时位置不变：一帧后再试，不空转
+            behind = self._audio.position_ms() - new_ms if new_ms != frame_ms else 0
+        # 当前帧的显示时段在 clock = frame_ms + interval 时结束
+        self._clock_timer.start(int(min(max(self._interval_ms - behind, 1), self._interval_ms)))
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QtCore.QEvent.Enter, QtCore.QEvent.Leave):
+            # 从视频区移入面板时 Leave / Enter 相继到达，等两者都处理完再判断
+            QtCore.QTimer.singleShot(0, self._update_panel_visibility)
+        return super().eventFilter(obj, event)
+
+    def _update_panel_visibility(self):
+        """鼠标在视频区域或控制面板上时显示控制面板"""
+        self._control_panel.setVisible(self._label.underMouse() or self._control_panel.underMouse())
+
+    def _video_visible(self) -> bool:
+        """窗口可见、未最小化且未被完全遮挡（平台支持时）"""
+        if not self.isVisible() or self.isMinimized():
+            return False
+        handle = self.windowHandle()
+        return handle is None or handle.isExposed()
 
     # -------------------- 关闭清理 -------------------- #
 
     def closeEvent(self, event: QtGui.QCloseEvent):
         """窗口关闭事件"""
-        self._mouse_check_timer.stop()
+        for view in self._roi_views:
+            view.close()
+        self._tracker.stop()
+        self._snapshots.shutdown()
+        self._profile.stop()
+        self._release_timer.stop()
+        self._live_timer.stop()
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
         if self._cap and self._cap.isOpened():
             self._cap.release()
-        if hasattr(self, '_session'):
-            self._session.close()
+        self._close_downloads()
+        if hasattr(self, '_session') and not self._is_stream:
+            self._session.close()  # 网络流的 Session 由 PREWARMER 按主机共享，不在此关闭
         
-        # 停止并清理音频播放器
-        self._media_player.stop()
-        self._media_player.setMedia(QtMultimedia.QMediaContent())
+        # 停止音频解码与输出
+        self._clock_timer.stop()
+        self._audio.close()
         
         event.accept()
 
     # -------------------- 音频错误处理 -------------------- #
-    def _on_audio_error(self, error):
+    def _on_audio_error(self, error_msg: str):
         """音频错误处理，打印详细错误信息"""
-        error_msg = self._media_player.errorString()
-        print(f"音频播放错误: {error}, {error_msg}")
+        print(f"音频播放错误: {error_msg}")
 
 # 新增控制面板类
 class ControlPanel(QtWidgets.QWidget):
@@ -473,18 +860,46 @@ class ControlPanel(QtWidgets.QWidget):
         painter.drawRoundedRect(self.rect(), 25, 25)
         super().paintEvent(event)
 
+def _resolve_page(page_url: str):
+    """页面 URL → (video_url, audio_url, headers, is_live)；优先使用常驻提取服务"""
+    from extract_daemon import request_stream
+    stream = request_stream(page_url)
+    if stream is None:
+        from extractor import StreamExtractor
+        stream = StreamExtractor(prewarm=True).extract(page_url, None)
+    else:
+        PREWARMER.warm_stream(stream)
+    return (*stream.get_playback_info(), stream.is_live)
+
+
 def main() -> None:
     app = QtWidgets.QApplication(sys.argv)
     
-    if len(sys.argv) < 2:
-        print("用法: python player.py <video_source> [audio_url]")
+    args = sys.argv[1:]
+    publish = None
+    if "--publish" in args:
+        i = args.index("--publish")
+        publish = args[i + 1] if i + 1 < len(args) else "roi_player_frames"
+        del args[i:i + 2]
+    live = "--live" in args
+    if live:
+        args.remove("--live")
+
+    if not args:
+        print("用法: python player.py <video_source> [audio_url] [--publish <shm_name>] [--live]")
+        print("      python player.py --page <page_url> [--publish <shm_name>] [--live]")
+        print("      直播目标延迟由环境变量 ROI_LIVE_LATENCY（秒）设置")
         sys.exit(1)
         
-    video_source = sys.argv[1]
-    audio_url = sys.argv[2] if len(sys.argv) > 2 else None
-    headers = {}
+    if args[0] == "--page" and len(args) > 1:
+        video_source, audio_url, headers, is_live = _resolve_page(args[1])
+        live = live or is_live
+    else:
+        video_source = args[0]
+        audio_url = args[1] if len(args) > 1 else None
+        headers = {}
     
-    player = VideoPlayer(video_source, headers=headers, audio_url=audio_url)
+    player = VideoPlayer(video_source, headers=headers, audio_url=audio_url, publish=publish, live=live)
     player.resize(800, 600)
     player.show()
     
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""播放列表：当前条目播放时，后台提取后续条目并限速预取其开头数据，缩短切换时的起播等待
+
+预取的开头由播放器交给 DownloadScheduler 作为首个分块的前半部分，切换时只需请求其余部分。
+"""
+
+from __future__ import annotations
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from extractor import StreamInfo
+
+# ============================== 常量配置 ============================== #
+PLAYLIST_LOOKAHEAD = 2  # 提前提取的条目数
+PLAYLIST_EXTRACT_WORKERS = 1  # 后台提取/预取并发数，避免与当前流争抢带宽
+PLAYLIST_PREFETCH_RATE = 512 * 1024  # 后续条目预取限速（字节/秒）
+
+
+class PlaylistQueue:
+    """按顺序管理页面 URL；get() 返回某条目的 StreamInfo Future"""
+
+    def __init__(self, page_urls: list[str], proxy: str | None = None,
+                 log: Callable[[str], None] | None = None,
+                 lookahead: int = PLAYLIST_LOOKAHEAD,
+                 workers: int = PLAYLIST_EXTRACT_WORKERS) -> None:
+        if not page_urls:
+            raise ValueError("播放列表为空")
+        self._urls = list(page_urls)
+        self._proxy = proxy
+        self._log = log or (lambda msg: print(msg, file=sys.stderr))
+        self._lookahead = lookahead
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="playlist")
+        self._futures: dict[int, Future] = {}
+        self._extractor = None
+        self._lock = threading.Lock()
+        self.current = 0
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    # ---------------- 调度 ---------------- #
+    def get(self, index: int) -> Future:
+        """返回第 index 项的提取 Future，并安排其后的条目提前提取"""
+        with self._lock:
+            fut = self._schedule(index, prefetch_rate=None)
+            for ahead in range(index + 1, min(index + 1 + self._lookahead, len(self._urls))):
+                self._schedule(ahead, prefetch_rate=PLAYLIST_PREFETCH_RATE)
+            # 丢弃已经播放过的条目，释放其预取数据（被跳过的条目从未被播放器取走）
+            for old in [i for i in self._futures if i < index]:
+                self._release(self._futures.pop(old))
+        return fut
+
+    @staticmethod
+    def _release(fut: Future) -> None:
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            from prewarm import PREWARMER
+            PREWARMER.take_prefetched(fut.result().video_url)
+
+    def advance(self) -> Future | None:
+        """切到下一项；已到末尾时返回 None"""
+        if self.current + 1 >= len(self._urls):
+            return None
+        self.current += 1
+        return self.get(self.current)
+
+    def _schedule(self, index: int, prefetch_rate: float | None) -> Future:
+        fut = self._futures.get(index)
+        if fut is None:
+            fut = self._pool.submit(self._extract_item, index, prefetch_rate)
+            self._futures[index] = fut
+        return fut
+
+    def _extract_item(self, index: int, prefetch_rate: float | None) -> StreamInfo:
+        url = self._urls[index]
+        self._log(f"[{index + 1}/{len(self._urls)}] 提取：{url}")
+        from extract_daemon import request_stream
+        from prewarm import PREWARMER
+
+        stream = request_stream(url, self._proxy)
+        if stream is None:
+            if self._extractor is None:
+                from extractor import StreamExtractor
+                self._extractor = StreamExtractor(log=self._log)
+            stream = self._extractor.extract(url, self._proxy)
+
+        PREWARMER.warm(stream.video_url, stream.video_headers, prefetch=True, max_rate=prefetch_rate,
+                       proxy=self._proxy)
+        if stream.audio_url:
+            PREWARMER.warm(stream.audio_url, stream.audio_headers or {}, proxy=self._proxy)
+        if prefetch_rate is not None:
+            # 后台条目：等预取结束再处理下一项，使预取并发受 workers 限制
+            PREWARMER.wait(stream.video_url)
+        return stream
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
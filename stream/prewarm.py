@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""媒体 CDN 连接预热：提取阶段即完成 DNS / TCP / TLS，并把连接池交给下载器复用"""
+
+from __future__ import annotations
+import socket
+import sys
+import threading
+import time
+import urllib.parse as urlparse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ============================== 常量配置 ============================== #
+PREFETCH_BYTES = 256 * 1024  # 预取所选格式开头的字节数；0 表示只建立连接
+POOL_MAXSIZE = 4  # 每个主机保留的连接数
+WARM_TIMEOUT = 10.0
+ENTRY_TTL_S = 600.0  # 预热记录（代理、未取走的预取数据）的保留时间，过期后在下一次 warm() 时清理
+
+
+class ConnectionPrewarmer:
+    """按主机维护 requests.Session；warm() 在后台线程中建立连接并可选地预取头部数据"""
+
+    def __init__(self, prefetch_bytes: int = PREFETCH_BYTES) -> None:
+        self._prefetch_bytes = prefetch_bytes
+        self._sessions: Dict[tuple, requests.Session] = {}
+        self._prefetched: Dict[str, bytes] = {}
+        self._pending: Dict[str, threading.Event] = {}
+        self._proxies: Dict[str, Optional[str]] = {}  # 预热时使用的代理，播放器取 Session 时沿用
+        self._warmed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # ---------------- 连接池 ---------------- #
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parsed = urlparse.urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def session_for(self, url: str, proxy: Optional[str] = None) -> requests.Session:
+        """返回该主机（经该代理）的共享 Session（已预热时连接直接可用）；proxy 缺省时沿用预热该地址时的代理"""
+        with self._lock:
+            proxy = proxy or self._proxies.get(url)
+            key = (self._host_key(url), proxy)
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                if proxy:
+                    session.proxies = {"http": proxy, "https": proxy}
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+            return session
+
+    # ---------------- 预热 ---------------- #
+    def warm_stream(self, stream, proxy: Optional[str] = None) -> None:
+        """对 StreamInfo 的视频与音频地址并行预热"""
+        self.warm(stream.video_url, stream.video_headers, prefetch=True, proxy=proxy)
+        if stream.audio_url:
+            self.warm(stream.audio_url, stream.audio_headers or {}, prefetch=False, proxy=proxy)
+
+    def warm(self, url: str, headers: Optional[Dict[str, str]] = None, prefetch: bool = False,
+             max_rate: Optional[float] = None, proxy: Optional[str] = None) -> None:
+        """后台预热；max_rate（字节/秒）限制预取速度，避免挤占正在播放的流；proxy 与提取时相同"""
+        with self._lock:
+            self._prune()
+            self._proxies[url] = proxy
+            self._warmed_at[url] = time.monotonic()
+            pending = self._pending.get(url)
+            if pending is not None and not pending.is_set():
+                return
+            done = threading.Event()
+            self._pending[url] = done
+        t = threading.Thread(
+            target=self._warm_worker, args=(url, dict(headers or {}), prefetch, max_rate, proxy, done), daemon=True
+        )
+        t.start()
+
+    def _warm_worker(self, url: str, headers: Dict[str, str], prefetch: bool,
+                     max_rate: Optional[float], proxy: Optional[str], done: threading.Event) -> None:
+        size = self._prefetch_bytes if prefetch and self._prefetch_bytes > 0 else 1
+        try:
+            parsed = urlparse.urlparse(url)
+            # 先解析 DNS，结果会被系统解析缓存复用（经代理时由代理解析）
+            if not proxy:
+                socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+            headers["Range"] = f"bytes=0-{size - 1}"
+            resp = self.session_for(url, proxy).get(url, headers=headers, stream=True, timeout=WARM_TIMEOUT)
+            if resp.status_code == 206:
+                # 读完响应体，连接随即回到池中供下载器复用
+                data = self._read_paced(resp, max_rate) if max_rate else resp.content
+            else:
+                # 服务器忽略 Range：只读所需部分，连接随响应关闭
+                data = resp.raw.read(size) if resp.ok else b""
+                resp.close()
+            if prefetch and size > 1 and data:
+                with self._lock:
+                    if self._pending.get(url) is done:  # 尚未被取走或清理
+                        self._prefetched[url] = data[:size]
+        except Exception as exc:
+            print(f"连接预热失败：{exc}", file=sys.stderr)
+        finally:
+            done.set()
+
+    @staticmethod
+    def _read_paced(resp: requests.Response, max_rate: float) -> bytes:
+        """按 max_rate 限速读完响应体"""
+        chunks, received, start = [], 0, time.monotonic()
+        for chunk in resp.iter_content(chunk_size=16 * 1024):
+            chunks.append(chunk)
+            received += len(chunk)
+            ahead = received / max_rate - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+        return b"".join(chunks)
+
+    def wait(self, url: str, timeout: Optional[float] = None) -> bool:
+        """等待该地址的预热结束；未发起过预热时立即返回 True"""
+        with self._lock:
+            done = self._pending.get(url)
+        return done.wait(timeout) if done is not None else True
+
+    def take_prefetched(self, url: str, wait: float = 0.0) -> bytes:
+        """取走预取的头部数据（只能取一次）并清除该地址的预热记录，之后完成的预取直接丢弃；
+        wait > 0 时最多等待预热完成，GUI 线程上应使用默认的 0"""
+        if wait > 0:
+            self.wait(url, wait)
+        with self._lock:
+            data = self._prefetched.pop(url, b"")
+            self._forget(url)
+            return data
+
+    def _forget(self, url: str) -> None:
+        """调用方须持有 _lock"""
+        self._prefetched.pop(url, None)
+        self._pending.pop(url, None)
+        self._proxies.pop(url, None)
+        self._warmed_at.pop(url, None)
+
+    def _prune(self) -> None:
+        """清除已完成且超过 ENTRY_TTL_S 的预热记录，如从未取走预取的音频地址；调用方须持有 _lock"""
+        now = time.monotonic()
+        for url, warmed_at in list(self._warmed_at.items()):
+            pending = self._pending.get(url)
+            if now - warmed_at > ENTRY_TTL_S and (pending is None or pending.is_set()):
+                self._forget(url)
+
+
+PREWARMER = ConnectionPrewarmer()
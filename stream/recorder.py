@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""旁路录制：把播放时已经下载的字节原样写入本地，结束时用 ffmpeg -c copy 封装为一个文件
+
+不额外请求网络、不重新编码：下载线程把收到的分块交给 tee()，由后台写入线程按偏移量
+写入每路的 .part 文件（分块可能乱序到达）；stop() 立即返回，在后台写完队列后执行
+    ffmpeg -i video.part [-i audio.part] -map 0:v -map 1:a -c copy 输出.mkv
+开始录制时已在缓存中的分块会先补写（等待队列空位，不丢弃），已被淘汰的文件头由下载器
+重新下载；只保存下载过的范围，跳过未播放的部分会在输出中缺失。
+"""
+
+from __future__ import annotations
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterable
+
+# ============================== 常量配置 ============================== #
+RECORD_DIR = "recordings"
+RECORD_CONTAINER = "mkv"  # Matroska 可直接容纳常见的 H.264 / VP9 / AV1 与 AAC / Opus
+RECORD_QUEUE_CHUNKS = 64  # 每路写入队列的分块上限（约 32 MB）；下载线程送入时队列满则丢弃并计数
+FFMPEG_BIN = "ffmpeg"
+
+
+class StreamRecorder:
+    """tee(name, offset, data) 可在任意线程调用；stop() 返回最终文件路径（写盘与封装在后台完成）"""
+
+    def __init__(self, tracks: Iterable[str], stem: str = "stream", out_dir: str = RECORD_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, f"{stem}_{time.strftime('%Y%m%d_%H%M%S')}")
+        self.output = f"{base}.{RECORD_CONTAINER}"
+        self._parts: Dict[str, str] = {name: f"{base}.{name}.part" for name in tracks}
+        self._queues: Dict[str, queue.Queue] = {name: queue.Queue(RECORD_QUEUE_CHUNKS) for name in self._parts}
+        self._files = {name: open(path, "wb") for name, path in self._parts.items()}
+        self.bytes_written = 0
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # 使 tee() 的入队与 stop() 互斥：stop 之后不会再有分块入队
+        self._writer = threading.Thread(target=self._write_loop, name="record-writer", daemon=True)
+        self._writer.start()
+
+    def tee(self, name: str, offset: int, data: bytes, block: bool = False) -> None:
+        """block=True 时等待队列空位直到录制结束（补写已缓存的分块用，不可在下载线程中使用）"""
+        q = self._queues.get(name)
+        if q is None:
+            return
+        while True:
+            with self._lock:
+                if self._stop.is_set():
+                    return  # 录制已结束
+                try:
+                    q.put_nowait((offset, data))
+                    return
+                except queue.Full:
+                    if not block:
+                        self.dropped += 1  # 磁盘跟不上时不拖慢下载与播放
+                        return
+            self._stop.wait(0.02)
+
+    def stop(self) -> str:
+        """结束录制并立即返回；已入队的分块由后台线程写完后封装"""
+        with self._lock:
+            self._stop.set()
+        # 非守护线程：退出程序时等待写盘与封装完成，避免留下残缺文件
+        threading.Thread(target=self._finish, name="record-finish").start()
+        return self.output
+
+    # ---------------- 内部 ---------------- #
+    def _finish(self) -> None:
+        self._writer.join()
+        for f in self._files.values():
+            f.close()
+        print(f"录制写入 {self.bytes_written / 1024 / 1024:.1f} MB，正在封装…", file=sys.stderr)
+        if self.dropped:
+            print(f"录制期间磁盘写入跟不上，丢弃 {self.dropped} 个分块", file=sys.stderr)
+        self._remux()
+
+    def _write_loop(self) -> None:
+        while True:
+            # 先读停止标志再清空：标志置位后不会再有分块入队，本轮清空即写完全部数据
+            stopping = self._stop.is_set()
+            idle = True
+            for name, q in self._queues.items():
+                try:
+                    offset, data = q.get_nowait()
+                except queue.Empty:
+                    continue
+                idle = False
+                f = self._files[name]
+                f.seek(offset)
+                f.write(data)
+                self.bytes_written += len(data)
+            if idle:
+                if stopping:
+                    return  # 队列已清空
+                time.sleep(0.05)
+
+    def _remux(self) -> None:
+        if shutil.which(FFMPEG_BIN) is None:
+            print(f"未找到 ffmpeg，原始数据保留在: {', '.join(self._parts.values())}", file=sys.stderr)
+            return
+        cmd = [FFMPEG_BIN, "-v", "error", "-y"]
+        for path in self._parts.values():
+            cmd += ["-i", path]
+        if len(self._parts) > 1:
+            cmd += ["-map", "0:v:0", "-map", "1:a:0"]
+        cmd += ["-c", "copy", self.output]
+        if subprocess.run(cmd).returncode != 0:
+            print(f"封装失败，原始数据保留在: {', '.join(self._parts.values())}", file=sys.stderr)
+            return
+        for path in self._parts.values():
+            os.remove(path)
+        print(f"录制已保存: {self.output}", file=sys.stderr)
+
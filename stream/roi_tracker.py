@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""轻量 ROI 跟踪：在工作线程中对缩小后的灰度帧做局部模板匹配，让裁剪框跟随目标
+
+只处理每第 N 帧，且输入队列长度为 1（来不及处理的帧直接丢弃），不会拖慢画面显示。
+ROI 使用归一化坐标 (x, y, w, h)，坐标系为旋转后的画面，与 roi_transform 一致。
+"""
+
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from roi_transform import NormRoi
+
+# ============================== 常量配置 ============================== #
+TRACK_EVERY_N = 3  # 每 N 帧跟踪一次
+TRACK_WIDTH = 320  # 跟踪用画面宽度（像素）
+SEARCH_MARGIN = 0.5  # 搜索窗口在 ROI 四周各扩展的比例
+MIN_SCORE = 0.5  # 低于该匹配分数视为丢失，保持原位置
+TEMPLATE_BLEND = 0.1  # 模板缓慢更新，适应外观变化
+SMOOTHING = 0.3  # 输出位置的指数平滑系数（越小越平滑）
+
+
+class RoiTracker:
+    """feed() 在 GUI 线程调用，只做计数与入队；匹配在后台线程完成"""
+
+    def __init__(self, every_n: int = TRACK_EVERY_N):
+        self._every_n = every_n
+        self._count = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending = None  # 待处理的帧（只保留最新一帧）
+        self._template = None  # 缩小后的灰度模板
+        self._target: Optional[NormRoi] = None  # 跟踪结果
+        self._smoothed: Optional[NormRoi] = None
+        self._running = False
+        self._thread = None
+        self.score = 0.0
+
+    # ---------------- 控制 ---------------- #
+    def start(self, roi: NormRoi) -> None:
+        """以 roi 为初始目标开始跟踪（下一帧时截取模板）"""
+        with self._lock:
+            self._target = roi
+            self._smoothed = roi
+            self._template = None
+            self._pending = None
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(target=self._worker, name="roi-tracker", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    @property
+    def active(self) -> bool:
+        return self._running
+
+    # ---------------- 输入 / 输出 ---------------- #
+    def feed(self, frame: np.ndarray) -> None:
+        """提交一帧（RGB，旋转后完整画面）；非第 N 帧或后台繁忙时直接忽略"""
+        self._count += 1
+        if not self._running or self._count % self._every_n:
+            return
+        with self._cond:
+            self._pending = frame
+            self._cond.notify()
+
+    def current(self) -> Optional[NormRoi]:
+        """平滑后的 ROI；每次调用向最新跟踪结果靠近一步"""
+        with self._lock:
+            if self._target is None:
+                return None
+            if self._smoothed is None:
+                self._smoothed = self._target
+            else:
+                self._smoothed = tuple(
+                    s + (t - s) * SMOOTHING for s, t in zip(self._smoothed, self._target)
+                )
+            return self._smoothed
+
+    # ---------------- 后台匹配 ---------------- #
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, self._pending = self._pending, None
+                target, template = self._target, self._template
+            result = self._track(frame, target, template)
+            if result is None:
+                continue
+            with self._lock:
+                if self._target is target:  # 期间未被 start() 重置
+                    self._target, self._template, self.score = result
+
+    @staticmethod
+    def _downscale(frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+        h, w = gray.shape
+        if w > TRACK_WIDTH:
+            gray = cv2.resize(gray, (TRACK_WIDTH, max(1, int(h * TRACK_WIDTH / w))),
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _track(self, frame, target: NormRoi, template):
+        small = self._downscale(frame)
+        H, W = small.shape
+        x, y, w, h = target
+        tw, th = max(4, int(w * W)), max(4, int(h * H))
+        tx, ty = int(x * W), int(y * H)
+
+        if template is None:
+            # 首帧：截取模板
+            template = small[ty:ty + th, tx:tx + tw].astype(np.float32)
+            if template.shape[0] < 4 or template.shape[1] < 4:
+                return None
+            return target, template, 1.0
+
+        th, tw = template.shape
+        mx, my = int(tw * SEARCH_MARGIN), int(th * SEARCH_MARGIN)
+        x0, y0 = max(0, tx - mx), max(0, ty - my)
+        x1, y1 = min(W, tx + tw + mx), min(H, ty + th + my)
+        window = small[y0:y1, x0:x1].astype(np.float32)
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None
+
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(scores)
+        if score < MIN_SCORE:
+            return target, template, score
+
+        nx, ny = x0 + loc[0], y0 + loc[1]
+        patch = small[ny:ny + th, nx:nx + tw].astype(np.float32)
+        template = cv2.addWeighted(template, 1 - TEMPLATE_BLEND, patch, TEMPLATE_BLEND, 0)
+        return (nx / W, ny / H, w, h), template, score
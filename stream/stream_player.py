@@ -1,40 +1,147 @@
-from PyQt5.QtWidgets import QApplication
 import sys
-from web import StreamPlayerApp, StreamInfo
-from player import VideoPlayer
-from tkinter import Tk
-import queue
+import threading
+
+from PyQt5 import QtCore, QtWidgets
+
+from extractor import StreamInfo, valid_page_url, normalize_proxy
+
+DEFAULT_PAGE_URL = "https://www.bilibili.com/video/BV1ks4y1H7Pt?spm_id_from=333.788.recommend_more_video.1&vd_source=89a2f97388b961603f041db847ae1c95"
+
+
+class ExtractDialog(QtWidgets.QDialog):
+    """在 Qt 进程内输入页面 URL 并提取流，无需再启动 Tk；每行一个 URL 即为播放列表"""
+
+    extracted = QtCore.pyqtSignal(object, object)  # PlaylistQueue, 首项 StreamInfo
+    _log_signal = QtCore.pyqtSignal(str)
+    _done_signal = QtCore.pyqtSignal(object)  # StreamInfo | Exception
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Python 视频流播放器")
+        self.resize(720, 360)
+        self._playlist = None
+
+        form = QtWidgets.QFormLayout()
+        self._url_edit = QtWidgets.QPlainTextEdit(DEFAULT_PAGE_URL, self)
+        self._url_edit.setPlaceholderText("每行一个视频页面 URL")
+        self._url_edit.setFixedHeight(80)
+        self._proxy_edit = QtWidgets.QLineEdit(self)
+        self._proxy_edit.setPlaceholderText("可选，例如 127.0.0.1:1080")
+        form.addRow("视频页面 URL：", self._url_edit)
+        form.addRow("代理 URL：", self._proxy_edit)
+
+        self._extract_btn = QtWidgets.QPushButton("提取并播放", self)
+        self._extract_btn.clicked.connect(self._start_extract)
+        self._log_view = QtWidgets.QPlainTextEdit(self)
+        self._log_view.setReadOnly(True)
+
+        vbox = QtWidgets.QVBoxLayout(self)
+        vbox.addLayout(form)
+        vbox.addWidget(self._extract_btn)
+        vbox.addWidget(self._log_view, 1)
+
+        self._log_signal.connect(self._log_view.appendPlainText)
+        self._done_signal.connect(self._on_done)
+
+    def _log(self, msg: str) -> None:
+        """可在任意线程调用，经信号转回 GUI 线程"""
+        print(msg, file=sys.stderr)
+        self._log_signal.emit(msg)
+
+    def _start_extract(self):
+        page_urls = [line.strip() for line in self._url_edit.toPlainText().splitlines() if line.strip()]
+        if not page_urls or not all(valid_page_url(u) for u in page_urls):
+            QtWidgets.QMessageBox.critical(self, "错误", "请输入有效的 http(s) URL")
+            return
+        proxy = normalize_proxy(self._proxy_edit.text())
+        self._extract_btn.setEnabled(False)
+
+        from playlist import PlaylistQueue
+        if self._playlist is not None:
+            self._playlist.shutdown()
+        self._playlist = PlaylistQueue(page_urls, proxy, log=self._log)
+        threading.Thread(target=self._extract_worker, daemon=True).start()
+
+    def _extract_worker(self):
+        try:
+            self._done_signal.emit(self._playlist.get(0).result())
+        except Exception as exc:
+            self._done_signal.emit(exc)
+
+    def _on_done(self, item):
+        self._extract_btn.setEnabled(True)
+        if isinstance(item, Exception):
+            self._log(f"提取失败: {item}")
+            QtWidgets.QMessageBox.critical(self, "提取失败", str(item))
+            return
+        self.extracted.emit(self._playlist, item)
+        self.accept()
+
+
+class PlaylistController(QtCore.QObject):
+    """播放结束或按 N 键时切到下一项；下一项尚未提取完成时在后台等待"""
+
+    _ready = QtCore.pyqtSignal(object)  # StreamInfo | Exception | None（已取消）
+
+    def __init__(self, player, playlist, parent=None):
+        super().__init__(parent)
+        self._player = player
+        self._playlist = playlist
+        self._switching = False
+        player.finished.connect(self.next)
+        player.nextRequested.connect(self.next)
+        self._ready.connect(self._on_ready)
+
+    def next(self):
+        if self._switching:
+            return
+        fut = self._playlist.advance()
+        if fut is None:
+            print("播放列表已结束", file=sys.stderr)
+            return
+        self._switching = True
+        fut.add_done_callback(self._on_future_done)
+
+    def _on_future_done(self, fut):
+        """在提取线程中调用，结果经信号交回 GUI 线程；被取消（播放列表已关闭）时发出 None"""
+        self._ready.emit(None if fut.cancelled() else fut.exception() or fut.result())
+
+    def _on_ready(self, item):
+        self._switching = False
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            print(f"提取失败，跳过: {item}", file=sys.stderr)
+            self.next()
+            return
+        video_url, audio_url, headers = item.get_playback_info()
+        self._player.load_stream(video_url, headers=headers, audio_url=audio_url, live=item.is_live)
+
+
+def play_stream(stream_info: StreamInfo):
+    """使用player.py播放提取到的流（OpenCV 等重模块在此时才加载）"""
+    from player import VideoPlayer
 
-def play_stream(stream_info: StreamInfo) -> None:
-    """使用player.py播放web.py提取的流"""
     video_url, audio_url, headers = stream_info.get_playback_info()
-    
-    app = QApplication(sys.argv)
-    player = VideoPlayer(video_url, headers=headers, audio_url=audio_url)
+    player = VideoPlayer(video_url, headers=headers, audio_url=audio_url, live=stream_info.is_live)
     player.resize(800, 600)
     player.show()
-    sys.exit(app.exec())
+    return player
+
 
 def main():
-    # 先用web.py提取流
-    root = Tk()
-    stream_queue = queue.SimpleQueue()
-    app = StreamPlayerApp(root, stream_queue)
-    
-    def check_queue():
-        try:
-            item = stream_queue.get_nowait()
-            if isinstance(item, Exception):
-                print(f"提取失败: {item}")
-                root.destroy()
-                return
-            root.destroy()
-            play_stream(item)
-        except queue.Empty:
-            root.after(100, check_queue)
-    
-    root.after(100, check_queue)
-    root.mainloop()
+    app = QtWidgets.QApplication(sys.argv)
+    dialog = ExtractDialog()
+    keep = []  # 持有播放窗口与控制器引用，防止被回收
+
+    def on_extracted(playlist, stream):
+        player = play_stream(stream)
+        keep.extend([player, PlaylistController(player, playlist)])
+
+    dialog.extracted.connect(on_extracted)
+    if dialog.exec() != QtWidgets.QDialog.Accepted:
+        sys.exit(0)
+    sys.exit(app.exec())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""视频显示标签：显示帧并处理鼠标框选 ROI；只依赖 PyQt5，播放器与多路网格共用"""
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class VideoLabel(QtWidgets.QLabel):
+    """用于显示视频帧并处理鼠标框选"""
+
+    roiChanged = QtCore.pyqtSignal(QtCore.QRect)  # 对外发送 ROI 变化信号
+    extraRoiAdded = QtCore.pyqtSignal(QtCore.QRect)  # Shift+框选：新增一个附加 ROI 视图
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAlignment(QtCore.Qt.AlignCenter)
+        self._rubber_band = QtWidgets.QRubberBand(
+            QtWidgets.QRubberBand.Rectangle, self
+        )
+        self._origin = QtCore.QPoint()
+        self._selecting = False
+        self._roi = None  # type: QtCore.QRect | None
+        self.setMinimumSize(400, 300)  # 设置最小尺寸
+
+    # ------------------------- 鼠标事件 ------------------------- #
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent):
+        if event.button() == QtCore.Qt.LeftButton:
+            self._origin = event.pos()
+            self._rubber_band.setGeometry(QtCore.QRect(self._origin, QtCore.QSize()))
+            self._rubber_band.show()
+            self._selecting = True
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event: QtGui.QMouseEvent):
+        """鼠标移动事件"""
+        if self._selecting:
+            rect = QtCore.QRect(self._origin, event.pos()).normalized()
+            self._rubber_band.setGeometry(rect)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event: QtGui.QMouseEvent):
+        if event.button() == QtCore.Qt.LeftButton and self._selecting:
+            self._selecting = False
+            self._rubber_band.hide()
+            rect = self._rubber_band.geometry()
+
+            # Shift+框选不改变主 ROI，而是新增附加视图
+            if event.modifiers() & QtCore.Qt.ShiftModifier:
+                if rect.width() > 10 and rect.height() > 10:
+                    self.extraRoiAdded.emit(rect)
+                super().mouseReleaseEvent(event)
+                return
+            
+            # 过滤过小的 ROI，避免误操作
+            if rect.width() > 10 and rect.height() > 10:
+                # 如果已经有 ROI，计算相对于当前 ROI 的新区域
+                if self._roi:
+                    # 计算选择区域相对于当前 ROI 的相对位置
+                    rel_x = (rect.x() - self._roi.x()) / self._roi.width()
+                    rel_y = (rect.y() - self._roi.y()) / self._roi.height()
+                    rel_w = rect.width() / self._roi.width()
+                    rel_h = rect.height() / self._roi.height()
+                    
+                    # 创建新的相对 ROI
+                    new_rect = QtCore.QRect(
+                        self._roi.x() + int(rel_x * self._roi.width()),
+                        self._roi.y() + int(rel_y * self._roi.height()),
+                        int(rel_w * self._roi.width()),
+                        int(rel_h * self._roi.height())
+                    )
+                    self._roi = new_rect
+                else:
+                    self._roi = rect
+            else:
+                self._roi = None
+                
+            self.roiChanged.emit(self._roi if self._roi else QtCore.QRect())
+        super().mouseReleaseEvent(event)
+
+    # ----------------------- 对外接口 ----------------------- #
+
+    def current_roi(self) -> QtCore.QRect | None:
+        return self._roi
+
+    def set_roi(self, rect: QtCore.QRect) -> None:
+        """由程序（如跟踪）更新 ROI，不发出 roiChanged"""
+        self._roi = rect
+
+    def clear_roi(self) -> None:
+        self._roi = None
+        self.update()
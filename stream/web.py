@@ -8,45 +8,38 @@ import platform
 import re
 import sys
 import threading
+import time
 import traceback
-import urllib.parse as urlparse
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from tkinter import Tk, ttk, scrolledtext, messagebox, LEFT, BOTH, END, NORMAL, DISABLED, SUNKEN
 
 import queue
 import subprocess
-from yt_dlp import YoutubeDL
 
-try:
-    import vlc  # type: ignore
-except ImportError as e:
-    print("python-vlc 未安装或 VLC 本体缺失。")
-    raise
+from extractor import StreamInfo, StreamExtractor, valid_page_url, normalize_proxy
+from extract_daemon import request_stream
+from live import LIVE_NETWORK_CACHING_MS
+from host_stats import HOST_STATS
 
 # ============================== 常量配置 ============================== #
-BROWSER_CANDIDATES: list[str | None] = ["chrome", "edge", "safari", "firefox", None]
-YDL_FORMAT_FILTER = "(bv*+ba/b)[vcodec!*=av01][vcodec!*=hev1][vcodec!*=hvc]"  # 略去 AV1 / HEVC
-NETWORK_CACHING_MS = 1500  # VLC 缓存时长
-PROXY_DEFAULT_SCHEME = "socks5://"
+# VLC 缓存时长：点播按主机历史自适应，无记录时用该默认值；设置环境变量即固定为该值。
+# 直播改用 LIVE_NETWORK_CACHING_MS（环境变量 ROI_LIVE_CACHING_MS）
+NETWORK_CACHING_MS = int(os.environ.get("ROI_NETWORK_CACHING_MS", "1500"))
+CACHING_FIXED = "ROI_NETWORK_CACHING_MS" in os.environ
+
 
-# ============================== 数据结构 ============================== #
 @dataclass
-class StreamInfo:
-    video_url: str
-    audio_url: str | None = None 
-    video_headers: dict[str, str] = field(default_factory=dict)
-    audio_headers: dict[str, str] | None = None
-
-    def get_playback_info(self) -> tuple[str, str | None, dict]:
-        """返回播放器需要的信息"""
-        return (
-            self.video_url,
-            self.audio_url,
-            {
-                "video": self.video_headers,
-                "audio": self.audio_headers if self.audio_headers else {}
-            }
-        )
+class _StartupTrace:
+    """一次播放的启动计时（monotonic 秒）；VLC 事件回调在其内部线程中更新"""
+    url: str
+    t_play: float
+    proxy: str | None = None  # 提取时使用的代理；主机记录按是否经代理分开
+    extract_s: float | None = None
+    t_first_byte: float | None = None  # 首个 MediaPlayerBuffering 事件：输入开始有数据
+    t_first_frame: float | None = None  # MediaPlayerVout：首帧已送到视频输出
+    rebuffers: int = 0
+    stalled: bool = False
+
 
 # ============================== GUI 主类 ============================== #
 class StreamPlayerApp:
@@ -57,6 +50,16 @@ class StreamPlayerApp:
 
         # ====== 队列初始化 ====== #
         self.stream_queue = queue_obj if queue_obj is not None else queue.SimpleQueue()
+        self._events: queue.SimpleQueue = queue.SimpleQueue()  # VLC / 提取线程 → GUI 线程的日志
+        self._extract_t0: float | None = None
+        self._extract_s: float | None = None
+        self._proxy: str | None = None
+        self._trace: _StartupTrace | None = None
+        self._trace_headers: dict[str, str] = {}
+
+        # ====== 提取器 ====== #
+        # 提取在工作线程（及其浏览器线程池）里进行，日志经队列交回 Tk 线程写入
+        self._extractor = StreamExtractor(log=self._events.put)
 
         # ====== VLC 初始化 ====== #
         self.vlc_instance: vlc.Instance | None = None
@@ -65,15 +68,25 @@ class StreamPlayerApp:
 
         # ====== UI ====== #
         self._build_widgets()
+        self.master.after(150, self._process_queue)
 
     # --------------------------- VLC --------------------------- #
     def _init_vlc(self) -> None:
+        # 仅在走 VLC 播放路径时才加载 python-vlc
+        try:
+            import vlc  # type: ignore
+        except ImportError:
+            print("python-vlc 未安装或 VLC 本体缺失。")
+            raise
         try:
             opts = [f"--network-caching={NETWORK_CACHING_MS}"]
             if platform.system() == "Darwin":
                 opts.append("--vout=macosx")
             self.vlc_instance = vlc.Instance(*opts)
             self.vlc_player = self.vlc_instance.media_player_new()
+            events = self.vlc_player.event_manager()
+            events.event_attach(vlc.EventType.MediaPlayerBuffering, self._on_vlc_buffering)
+            events.event_attach(vlc.EventType.MediaPlayerVout, self._on_vlc_vout)
         except Exception as exc:
             self._fatal_error("VLC 初始化失败", exc)
 
@@ -121,11 +134,10 @@ class StreamPlayerApp:
             messagebox.showerror("错误", "请输入有效的 http(s) URL")
             return
 
-        proxy = self.proxy_entry.get().strip()
-        if proxy and "://" not in proxy:
-            proxy = PROXY_DEFAULT_SCHEME + proxy
+        proxy = self._proxy = normalize_proxy(self.proxy_entry.get())
 
         self._log(f"开始提取：{page_url}")
+        self._extract_t0 = time.monotonic()
         self.extract_btn.config(state=DISABLED); self.stop_btn.config(state=NORMAL)
 
         t = threading.Thread(target=self._extract_worker, args=(page_url, proxy), daemon=True)
@@ -133,61 +145,31 @@ class StreamPlayerApp:
 
     def _extract_worker(self, url: str, proxy: str | None) -> None:
         try:
-            self.stream_queue.put(self._extract_stream(url, proxy))
+            # 优先交给常驻提取服务，未运行时退回本进程提取
+            stream = request_stream(url, proxy)
+            if stream is not None:
+                self._events.put("已由常驻提取服务完成提取")
+            else:
+                stream = self._extract_stream(url, proxy)
+            self._extract_s = time.monotonic() - self._extract_t0
+            self.stream_queue.put(stream)
         except Exception as exc:
             self.stream_queue.put(exc)
 
     def _extract_stream(self, page_url: str, proxy: str | None) -> StreamInfo:
-        last_err: Exception | None = None
-        for browser in BROWSER_CANDIDATES:
-            try:
-                self._log(f"尝试 {browser or '无 Cookie'} …")
-                info = self._ydl_extract(page_url, proxy, browser)
-                return self._select_best(info)
-            except Exception as e:
-                last_err = e
-                self._log(f"提取失败：{e}")
-                continue
-        raise RuntimeError(f"全部提取方式失败：{last_err}") from last_err
-
-    # ---------------- yt-dlp ---------------- #
-    def _ydl_extract(self, url: str, proxy: str | None, browser: str | None):
-        ydl_opts = dict(
-            format=YDL_FORMAT_FILTER,
-            forceipv4=True,
-            quiet=True,
-            retries=5,
-            fragment_retries=5,
-            proxy=proxy or None,
-        )
-        if browser:
-            ydl_opts["cookiesfrombrowser"] = (browser,)
-        with YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(url, download=False)
+        return self._extractor.extract(page_url, proxy)
 
     @staticmethod
     def _select_best(info) -> StreamInfo:
-        fmts = info.get("formats", [])
-        v = [f for f in fmts if f.get("vcodec") != "none" and f.get("acodec") == "none"]
-        a = [f for f in fmts if f.get("acodec") != "none" and f.get("vcodec") == "none"]
-        if v:
-            best_v = max(v, key=lambda f: f.get("height") or 0)
-            best_a = max(a, key=lambda f: f.get("abr") or 0) if a else None
-            return StreamInfo(
-                video_url=best_v["url"],
-                audio_url=best_a["url"] if best_a else None,
-                video_headers=best_v.get("http_headers", {}),
-                audio_headers=best_a.get("http_headers", {}) if best_a else None,
-            )
-
-        # Fall-back：若站点只给单流
-        return StreamInfo(
-            video_url=info["url"],
-            video_headers=info.get("http_headers", {}),
-        )
+        return StreamExtractor.select_best(info)
 
     # ---------------- 播放 ---------------- #
     def _process_queue(self) -> None:
+        while True:
+            try:
+                self._log(self._events.get_nowait())
+            except queue.Empty:
+                break
         try:
             item = self.stream_queue.get_nowait()
         except queue.Empty:
@@ -203,6 +185,11 @@ class StreamPlayerApp:
         self.master.after(150, self._process_queue)
 
     def _play(self, s: StreamInfo) -> None:
+        self._finish_trace()
+        if self._extract_s is not None:
+            self._log(f"提取耗时 {self._extract_s:.2f} s")
+        caching = self._caching_ms(s)
+        self._log(f"网络缓存 {caching} ms（{HOST_STATS.summary(s.video_url, self._proxy)}）")
         # macOS 上避免 python-vlc 导致的崩溃，使用外部 VLC CLI 播放
         if platform.system() == "Darwin":
             self._log("macOS: 使用外部 VLC 播放器以规避绑定崩溃")
@@ -213,7 +200,11 @@ class StreamPlayerApp:
             # 附加音频 slave
             if s.audio_url:
                 cmd.append(f"--input-slave={s.audio_url}")
+            cmd.append(f"--network-caching={caching}")
             subprocess.Popen(cmd)
+            # 外部进程无法获得首帧事件，只在后台更新主机记录
+            threading.Thread(target=HOST_STATS.probe, args=(s.video_url, s.video_headers, self._proxy),
+                             daemon=True).start()
             return
 
         if not self.vlc_player:
@@ -232,9 +223,16 @@ class StreamPlayerApp:
             else:
                 m = self.vlc_instance.media_new(s.video_url)
                 self._add_http_headers(m, s.video_headers)
+            # 按流覆盖实例级缓存：直播只保留很小的缓冲，紧跟直播边缘
+            m.add_option(f":network-caching={caching}")
+            if s.is_live:
+                m.add_option(f":live-caching={caching}")
+                self._log("直播模式")
 
             self.vlc_player.set_media(m)
             self._embed_player()
+            self._trace = _StartupTrace(s.video_url, time.monotonic(), self._extract_s, self._proxy)
+            self._trace_headers = s.video_headers
             self.vlc_player.play()
             self._log("开始播放 ✓")
         except Exception as exc:
@@ -246,6 +244,57 @@ class StreamPlayerApp:
                 self._fatal_error("播放失败", exc2)
                 self._reset_ui()
 
+    def _caching_ms(self, s: StreamInfo) -> int:
+        if s.is_live:
+            return LIVE_NETWORK_CACHING_MS
+        if CACHING_FIXED:
+            return NETWORK_CACHING_MS
+        return HOST_STATS.caching_ms(s.video_url, NETWORK_CACHING_MS, self._proxy)
+
+    # ---------------- 启动计时（VLC 事件，在 VLC 线程中回调） ---------------- #
+    def _on_vlc_buffering(self, event) -> None:
+        trace = self._trace
+        if trace is None:
+            return
+        now = time.monotonic()
+        if trace.t_first_byte is None:
+            trace.t_first_byte = now
+            self._events.put(f"首字节（VLC 开始缓冲）{now - trace.t_play:.2f} s")
+        if trace.t_first_frame is None:
+            return
+        # 首帧之后缓冲进度低于 100% 即为一次卡顿
+        if event.u.new_cache < 100 and not trace.stalled:
+            trace.stalled = True
+            trace.rebuffers += 1
+            self._events.put(f"卡顿 #{trace.rebuffers}")
+        elif event.u.new_cache >= 100:
+            trace.stalled = False
+
+    def _on_vlc_vout(self, event) -> None:
+        trace = self._trace
+        if trace is None or trace.t_first_frame is not None or event.u.new_count < 1:
+            return
+        trace.t_first_frame = time.monotonic()
+        total = trace.t_first_frame - trace.t_play + (trace.extract_s or 0)
+        self._events.put(f"首帧 {trace.t_first_frame - trace.t_play:.2f} s（含提取共 {total:.2f} s）")
+        # 起播之后再探测 RTT 与吞吐量，不与启动争抢带宽
+        threading.Thread(target=HOST_STATS.probe, args=(trace.url, self._trace_headers, trace.proxy),
+                         daemon=True).start()
+
+    def _finish_trace(self) -> None:
+        """播放结束或切换时把本次启动与卡顿情况写入主机记录"""
+        trace, self._trace = self._trace, None
+        if trace is None or trace.t_first_frame is None:
+            return
+        HOST_STATS.record(
+            trace.url,
+            trace.proxy,
+            extract_ms=trace.extract_s * 1000 if trace.extract_s is not None else None,
+            vlc_first_byte_ms=(trace.t_first_byte - trace.t_play) * 1000 if trace.t_first_byte else None,
+            ttff_ms=(trace.t_first_frame - trace.t_play) * 1000,
+            rebuffers=trace.rebuffers,
+        )
+
     def _add_http_headers(self, media: vlc.Media, headers: dict[str, str]) -> None:
         """
         给 VLC Media 对象附加 HTTP 请求头，解决 Bilibili 等站点 403 问题
@@ -272,13 +321,7 @@ class StreamPlayerApp:
 
     @staticmethod
     def _valid_url(text: str) -> bool:
-        if not text:
-            return False
-        try:
-            parsed = urlparse.urlparse(text)
-            return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
-        except Exception:
-            return False
+        return valid_page_url(text)
 
     # ---------------- 日志 & 异常 ---------------- #
     def _log(self, msg: str) -> None:
@@ -301,10 +344,12 @@ class StreamPlayerApp:
     def _stop_play(self) -> None:
         if self.vlc_player and self.vlc_player.is_playing():
             self.vlc_player.stop()
+        self._finish_trace()
         self._reset_ui()
         self._log("播放已停止。")
 
     def _on_close(self) -> None:
+        self._finish_trace()
         try:
             if self.vlc_player:
                 self.vlc_player.release()